@@ -7,7 +7,9 @@ from app.api.endpoints import (
     duts,
     auth,
     uploads,
-    db_admin
+    db_admin,
+    analytics,
+    specifications
 )
 
 api_router = APIRouter()
@@ -19,5 +21,7 @@ api_router.include_router(test_cases.router, prefix="/test-cases", tags=["Test C
 api_router.include_router(test_run_templates.router, prefix="/test-run-templates", tags=["Test Run Templates"])
 api_router.include_router(test_runs.router, prefix="/test-runs", tags=["Test Runs"])
 api_router.include_router(duts.router, prefix="/duts", tags=["DUTs & Capabilities"])
+api_router.include_router(specifications.router, prefix="/specifications", tags=["Specifications & Requirements"])
 api_router.include_router(uploads.router, prefix="/uploads", tags=["File Uploads"])
-api_router.include_router(db_admin.router, prefix="/admin", tags=["Database Administration"])
\ No newline at end of file
+api_router.include_router(db_admin.router, prefix="/admin", tags=["Database Administration"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
\ No newline at end of file
@@ -1,7 +1,13 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, Security, status
+from fastapi.security import APIKeyHeader
 from sqlmodel import Session
 from app.db.database import get_session
-from app.core.auth import get_current_user
+from app.db.events import get_table_versions
+from app.core.api_keys import UPLOAD_SCOPE, authenticate_api_key
+from app.core.auth import get_current_user, optional_oauth2_scheme
+from app.core.etag import etag_matches, make_etag
+from app.core.streaming import accepts_ndjson
 from app.models.base import TestOperator
 
 # Dependency for authenticated endpoints
@@ -20,4 +26,54 @@ def get_admin_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions",
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+# API keys are sent in this header, as an alternative to a bearer token
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Dependency for upload endpoints: an API key with the upload scope or a bearer token
+async def get_upload_user(
+    api_key: Optional[str] = Security(api_key_header),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    session: Session = Depends(get_session)
+) -> TestOperator:
+    if api_key:
+        user = authenticate_api_key(session, api_key, UPLOAD_SCOPE)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key",
+            )
+        return user
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token, session)
+
+# Dependency for conditional GETs on endpoints that read the given tables. Names
+# may hold path parameters, e.g. "test_runs/{run_id}" for one run's own counter
+def table_etag(*tables: str):
+    def check_etag(
+        request: Request,
+        response: Response,
+        session: Session = Depends(get_session)
+    ):
+        # One small lookup decides whether the endpoint needs to run at all
+        versions = get_table_versions(session, [table.format(**request.path_params) for table in tables])
+        parts = [request.url.path, request.url.query]
+        if accepts_ndjson(request.headers.get("accept")):
+            # Streamed NDJSON is a different representation of the same resource
+            parts.append("ndjson")
+        etag = make_etag(versions, *parts)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": "no-cache"}
+            )
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept"
+    return check_etag
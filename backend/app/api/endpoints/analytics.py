@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+from typing import Optional
+from app.db.database import get_session
+from app.core.analytics import FLAKY_HISTORY_LIMIT, find_flaky_test_cases, reset_flaky_state
+from app.models.schemas import StandardResponse
+from app.api.deps import get_current_active_user, get_admin_user
+
+router = APIRouter()
+
+
+@router.get("/flaky-tests", response_model=dict)
+def get_flaky_tests(
+    dut_id: Optional[int] = None,
+    window: int = Query(20, ge=2, le=FLAKY_HISTORY_LIMIT),
+    min_runs: int = Query(5, ge=2),
+    limit: int = Query(50, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get test cases ranked by how often they flip between pass and fail on the same DUT"""
+    flaky = find_flaky_test_cases(
+        session,
+        dut_id=dut_id,
+        window=window,
+        min_runs=min_runs,
+        limit=limit
+    )
+    
+    return {
+        "window": window,
+        "min_runs": min_runs,
+        "test_cases": flaky
+    }
+
+
+@router.post("/flaky-tests/reset", response_model=StandardResponse)
+def reset_flaky_tests(
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Discard the flaky test state so it is rebuilt from all results"""
+    reset_flaky_state(session)
+    
+    return {
+        "success": True,
+        "message": "Flaky test analytics will be rebuilt on the next request",
+        "data": None
+    }
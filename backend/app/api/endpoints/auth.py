@@ -1,14 +1,19 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from app.core.auth import (
-    authenticate_user, create_access_token, get_password_hash,
+    authenticate_user_async, create_access_token, get_password_hash_async,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.core.api_keys import create_api_key
 from app.db.database import get_session
-from app.models.base import TestOperator, Company
-from app.models.schemas import Token, TestOperatorCreate, TestOperatorRead, TestOperatorUpdate, StandardResponse
+from app.models.base import ApiKey, TestOperator, Company
+from app.models.schemas import (
+    Token, TestOperatorCreate, TestOperatorRead, TestOperatorUpdate,
+    ApiKeyCreate, ApiKeyCreated, ApiKeyRead, StandardResponse
+)
 from app.api.deps import get_current_active_user, get_admin_user
 
 router = APIRouter()
@@ -21,7 +26,7 @@ async def login_for_access_token(
 ):
     """Login and get access token"""
     print(f"Login attempt for user: {form_data.username}")
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user_async(session, form_data.username, form_data.password)
     if not user:
         print(f"Authentication failed for user: {form_data.username}")
         raise HTTPException(
@@ -61,7 +66,7 @@ async def register_user(
             raise HTTPException(status_code=404, detail="Company not found")
     
     # Hash the password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     
     # Create the user
     db_user = TestOperator(
@@ -80,7 +85,7 @@ async def register_user(
     return db_user
 
 
-@router.get("/users", response_model=list[TestOperatorRead])
+@router.get("/users", response_model=List[TestOperatorRead])
 async def get_users(
     skip: int = 0,
     limit: int = 100,
@@ -120,7 +125,7 @@ async def update_user(
     
     # Update password if provided
     if user_update.password:
-        user_update.hashed_password = get_password_hash(user_update.password)
+        user_update.hashed_password = await get_password_hash_async(user_update.password)
         user_update.password = None
     
     # Update other attributes
@@ -153,7 +158,75 @@ async def delete_user(
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # The user's API keys go with it
+    for api_key in session.exec(select(ApiKey).where(ApiKey.operator_id == user_id)).all():
+        session.delete(api_key)
     session.delete(db_user)
     session.commit()
     
-    return {"success": True, "message": f"User {user_id} deleted successfully", "data": None}
\ No newline at end of file
+    return {"success": True, "message": f"User {user_id} deleted successfully", "data": None}
+
+
+@router.post("/api-keys", response_model=ApiKeyCreated)
+async def create_user_api_key(
+    api_key: ApiKeyCreate,
+    session: Session = Depends(get_session),
+    current_user: TestOperator = Depends(get_current_active_user)
+):
+    """
+    Create an API key for uploading results (admins may create one for
+    another user). The key is only returned by this call.
+    """
+    operator_id = current_user.id
+    if api_key.operator_id is not None and api_key.operator_id != current_user.id:
+        if current_user.access_rights != "admin":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+        if not session.get(TestOperator, api_key.operator_id):
+            raise HTTPException(status_code=404, detail="User not found")
+        operator_id = api_key.operator_id
+    if api_key.expires_in_days is not None and api_key.expires_in_days < 1:
+        raise HTTPException(status_code=400, detail="expires_in_days must be at least 1")
+    
+    db_api_key, key = create_api_key(
+        session, operator_id, api_key.name, expires_in_days=api_key.expires_in_days
+    )
+    session.commit()
+    session.refresh(db_api_key)
+    
+    return ApiKeyCreated(**db_api_key.dict(exclude={"key_hash"}), key=key)
+
+
+@router.get("/api-keys", response_model=List[ApiKeyRead])
+async def get_user_api_keys(
+    operator_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+    current_user: TestOperator = Depends(get_current_active_user)
+):
+    """Get your API keys; admins get everyone's, optionally for one user"""
+    query = select(ApiKey).order_by(ApiKey.id)
+    
+    if current_user.access_rights != "admin":
+        query = query.where(ApiKey.operator_id == current_user.id)
+    elif operator_id is not None:
+        query = query.where(ApiKey.operator_id == operator_id)
+    
+    return session.exec(query).all()
+
+
+@router.delete("/api-keys/{key_id}", response_model=StandardResponse)
+async def revoke_user_api_key(
+    key_id: int,
+    session: Session = Depends(get_session),
+    current_user: TestOperator = Depends(get_current_active_user)
+):
+    """Revoke an API key (your own, or any as admin); it stops working immediately"""
+    api_key = session.get(ApiKey, key_id)
+    if not api_key or (api_key.operator_id != current_user.id and current_user.access_rights != "admin"):
+        raise HTTPException(status_code=404, detail="API key not found")
+    
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow().isoformat()
+        session.add(api_key)
+        session.commit()
+    
+    return {"success": True, "message": f"API key {key_id} revoked", "data": None}
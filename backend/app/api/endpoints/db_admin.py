@@ -7,6 +7,10 @@ import os
 import tempfile
 
 from app.db.database import get_session, export_db_to_json, import_db_from_json
+from app.core.archive import archive_old_runs
+from app.core.auth import identity_cache, password_pool
+from app.core.cache import response_cache
+from app.core.run_summary import rebuild_run_summaries
 from app.api.deps import get_admin_user
 from app.models.schemas import StandardResponse
 
@@ -97,4 +101,73 @@ async def backup_database_cli(
         "success": True,
         "message": f"Database successfully backed up to {output_file}",
         "data": None
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/archive", response_model=StandardResponse)
+def archive_database(
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Move old test runs and their results to the Parquet archive"""
+    counts = archive_old_runs(session, older_than_days=older_than_days, batch_size=batch_size)
+    
+    return {
+        "success": True,
+        "message": f"Archived {counts['archived_runs']} test runs with {counts['archived_results']} results",
+        "data": counts
+    }
+
+
+@router.post("/rebuild-run-summaries", response_model=StandardResponse)
+def rebuild_run_summaries_endpoint(
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Recount the pass/fail/other totals of every test run"""
+    count = rebuild_run_summaries(session)
+    
+    return {
+        "success": True,
+        "message": f"Rebuilt summary counters for {count} test runs",
+        "data": {"test_runs": count}
+    }
+
+
+@router.get("/cache-stats", response_model=StandardResponse)
+def get_cache_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """Get hit/miss statistics of the response cache"""
+    return {
+        "success": True,
+        "message": "Response cache statistics",
+        "data": response_cache.stats()
+    }
+
+
+@router.post("/cache-clear", response_model=StandardResponse)
+def clear_cache(
+    current_user: dict = Depends(get_admin_user)
+):
+    """Drop all cached responses"""
+    response_cache.clear()
+    
+    return {"success": True, "message": "Response cache cleared", "data": None}
+
+
+@router.get("/auth-stats", response_model=StandardResponse)
+def get_auth_stats(
+    current_user: dict = Depends(get_admin_user)
+):
+    """Get password hashing pool load (running, queued, rejected) and identity cache statistics"""
+    return {
+        "success": True,
+        "message": "Authentication statistics",
+        "data": {
+            "password_hashing": password_pool.stats(),
+            "identity_cache": identity_cache.stats()
+        }
+    }
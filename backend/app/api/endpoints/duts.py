@@ -1,19 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.db.database import get_session
+from app.core.bulk import MAX_BULK_ITEMS, bulk_write
+from app.core.cache import cached_response
+from app.core.cascade import delete_capabilities, delete_duts
 from app.models.base import DUT, Capability, DUTCapability
 from app.models.schemas import (
     DUTCreate,
     DUTRead,
     DUTUpdate,
     DUTWithCapabilities,
+    DUTCapabilityMatrix,
     CapabilityCreate,
     CapabilityRead,
     CapabilityUpdate,
+    BulkResponse,
     StandardResponse
 )
-from app.api.deps import get_current_active_user, get_admin_user
+from app.api.deps import get_current_active_user, get_admin_user, table_etag
 
 router = APIRouter()
 
@@ -33,7 +38,38 @@ def create_dut(
     return db_dut
 
 
-@router.get("/", response_model=List[DUTRead])
+@router.post("/bulk", response_model=BulkResponse)
+def bulk_write_duts(
+    items: List[Dict[str, Any]] = Body(...),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create (items without "id") or update (items with "id") many DUTs in one transaction"""
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items can be written at once")
+    
+    written = bulk_write(session, DUT, items, DUTCreate, DUTUpdate)
+    session.commit()
+    return written["response"]
+
+
+@router.post("/capabilities/bulk", response_model=BulkResponse)
+def bulk_write_capabilities(
+    items: List[Dict[str, Any]] = Body(...),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create (items without "id") or update (items with "id") many capabilities in one transaction"""
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items can be written at once")
+    
+    written = bulk_write(session, Capability, items, CapabilityCreate, CapabilityUpdate)
+    session.commit()
+    return written["response"]
+
+
+@router.get("/", response_model=List[DUTRead], dependencies=[Depends(table_etag("duts"))])
+@cached_response("duts", model=DUTRead)
 def get_duts(
     skip: int = 0,
     limit: int = 100,
@@ -44,7 +80,61 @@ def get_duts(
     return duts
 
 
-@router.get("/{dut_id}", response_model=DUTWithCapabilities)
+@router.get(
+    "/capability-matrix", response_model=DUTCapabilityMatrix,
+    dependencies=[Depends(table_etag("duts", "capabilities", "dut_capabilities"))]
+)
+def get_capability_matrix(
+    session: Session = Depends(get_session)
+):
+    """Get all DUTs, all capabilities and which DUT has which, in one response"""
+    duts = session.exec(select(DUT).order_by(DUT.id)).all()
+    capabilities = session.exec(select(Capability).order_by(Capability.id)).all()
+    
+    # Each DUT lists the positions of its capabilities instead of repeating them
+    position = {capability.id: i for i, capability in enumerate(capabilities)}
+    indexes = {dut.id: [] for dut in duts}
+    links = session.exec(
+        select(DUTCapability.dut_id, DUTCapability.capability_id)
+        .order_by(DUTCapability.dut_id, DUTCapability.capability_id)
+    ).all()
+    for dut_id, capability_id in links:
+        if dut_id in indexes and capability_id in position:
+            indexes[dut_id].append(position[capability_id])
+    
+    return {
+        "duts": duts,
+        "capabilities": capabilities,
+        "capability_indexes": [indexes[dut.id] for dut in duts]
+    }
+
+
+# Declared before /{dut_id} so "capabilities" is not taken for a DUT ID
+@router.get(
+    "/capabilities", response_model=List[CapabilityRead],
+    dependencies=[Depends(table_etag("capabilities"))]
+)
+@cached_response("capabilities", model=CapabilityRead)
+def get_capabilities(
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    """Get all capabilities, optionally filtered by category"""
+    query = select(Capability)
+    
+    if category:
+        query = query.where(Capability.category == category)
+    
+    capabilities = session.exec(query.offset(skip).limit(limit)).all()
+    return capabilities
+
+
+@router.get(
+    "/{dut_id}", response_model=DUTWithCapabilities,
+    dependencies=[Depends(table_etag("duts", "capabilities", "dut_capabilities"))]
+)
 def get_dut(
     dut_id: int,
     session: Session = Depends(get_session)
@@ -54,20 +144,19 @@ def get_dut(
     if not dut:
         raise HTTPException(status_code=404, detail="DUT not found")
     
-    # Get capabilities for this DUT
-    capabilities = []
-    dut_capabilities = session.exec(
-        select(DUTCapability).where(DUTCapability.dut_id == dut_id)
+    # Get capabilities for this DUT in a single join
+    capabilities = session.exec(
+        select(Capability)
+        .join(DUTCapability, DUTCapability.capability_id == Capability.id)
+        .where(DUTCapability.dut_id == dut_id)
+        .order_by(Capability.id)
     ).all()
     
-    for link in dut_capabilities:
-        capability = session.get(Capability, link.capability_id)
-        if capability:
-            capabilities.append(capability)
-    
-    # Create response object
-    result = DUTWithCapabilities.from_orm(dut)
-    result.capabilities = capabilities
+    # Create response object; dut.capabilities holds the link rows, not capabilities
+    result = DUTWithCapabilities(
+        **DUTRead.from_orm(dut).dict(),
+        capabilities=[CapabilityRead.from_orm(capability) for capability in capabilities]
+    )
     
     return result
 
@@ -101,21 +190,14 @@ def delete_dut(
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_admin_user)
 ):
-    """Delete a DUT"""
+    """Delete a DUT and its capability links; its test runs are kept without a DUT"""
     dut = session.get(DUT, dut_id)
     if not dut:
         raise HTTPException(status_code=404, detail="DUT not found")
     
-    # First delete DUT-capability links
-    session.exec(
-        select(DUTCapability).where(DUTCapability.dut_id == dut_id)
-    ).delete()
-    
-    # Then delete the DUT
-    session.delete(dut)
-    session.commit()
+    counts = delete_duts(session, [dut_id])
     
-    return {"success": True, "message": f"DUT {dut_id} deleted successfully", "data": None}
+    return {"success": True, "message": f"DUT {dut_id} deleted successfully", "data": counts}
 
 
 @router.post("/{dut_id}/capabilities/{capability_id}", response_model=StandardResponse)
@@ -203,24 +285,11 @@ def create_capability(
     return db_capability
 
 
-@router.get("/capabilities", response_model=List[CapabilityRead])
-def get_capabilities(
-    skip: int = 0,
-    limit: int = 100,
-    category: Optional[str] = None,
-    session: Session = Depends(get_session)
-):
-    """Get all capabilities, optionally filtered by category"""
-    query = select(Capability)
-    
-    if category:
-        query = query.where(Capability.category == category)
-    
-    capabilities = session.exec(query.offset(skip).limit(limit)).all()
-    return capabilities
-
-
-@router.get("/capabilities/{capability_id}", response_model=CapabilityRead)
+@router.get(
+    "/capabilities/{capability_id}", response_model=CapabilityRead,
+    dependencies=[Depends(table_etag("capabilities"))]
+)
+@cached_response("capabilities", model=CapabilityRead)
 def get_capability(
     capability_id: int,
     session: Session = Depends(get_session)
@@ -266,13 +335,7 @@ def delete_capability(
     if not capability:
         raise HTTPException(status_code=404, detail="Capability not found")
     
-    # First delete DUT-capability links
-    session.exec(
-        select(DUTCapability).where(DUTCapability.capability_id == capability_id)
-    ).delete()
-    
-    # Then delete the capability
-    session.delete(capability)
-    session.commit()
+    # Delete the capability together with its DUT links
+    delete_capabilities(session, [capability_id])
     
     return {"success": True, "message": f"Capability {capability_id} deleted successfully", "data": None}
\ No newline at end of file
@@ -0,0 +1,378 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, select
+from typing import List, Optional
+from app.db.database import get_session
+from app.core.cascade import delete_requirements, delete_specifications
+from app.core.coverage import (
+    coverage_percent, get_coverage, get_requirement_coverage, rebuild_coverage, reset_coverage,
+    specifications_of_requirements
+)
+from app.models.base import (
+    DUT, Requirement, RequirementSpecification, RequirementTestCase, Specification, TestCase
+)
+from app.models.schemas import (
+    SpecificationCreate,
+    SpecificationRead,
+    SpecificationUpdate,
+    SpecificationWithRequirements,
+    SpecificationCoverageRead,
+    SpecificationCoverageDetail,
+    RequirementCreate,
+    RequirementRead,
+    RequirementUpdate,
+    RequirementDetail,
+    StandardResponse
+)
+from app.api.deps import get_current_active_user, get_admin_user, table_etag
+
+router = APIRouter()
+
+
+def _requirement_read(requirement: Requirement) -> RequirementRead:
+    # Built by alias: validating the ORM object would drop "Field"
+    return RequirementRead.parse_obj({
+        "id": requirement.id,
+        "Field": requirement.field,
+        "name": requirement.name,
+        "description": requirement.description
+    })
+
+
+def _get_specification(session: Session, specification_id: int) -> Specification:
+    specification = session.get(Specification, specification_id)
+    if not specification:
+        raise HTTPException(status_code=404, detail="Specification not found")
+    return specification
+
+
+def _get_requirement(session: Session, requirement_id: int) -> Requirement:
+    requirement = session.get(Requirement, requirement_id)
+    if not requirement:
+        raise HTTPException(status_code=404, detail="Requirement not found")
+    return requirement
+
+
+# Specification Endpoints
+@router.post("/", response_model=SpecificationRead)
+def create_specification(
+    specification: SpecificationCreate,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create a new specification"""
+    db_specification = Specification.from_orm(specification)
+    session.add(db_specification)
+    session.commit()
+    session.refresh(db_specification)
+    return db_specification
+
+
+@router.get(
+    "/", response_model=List[SpecificationRead],
+    dependencies=[Depends(table_etag("specifications"))]
+)
+def get_specifications(
+    skip: int = 0,
+    limit: int = 100,
+    session: Session = Depends(get_session)
+):
+    """Get all specifications"""
+    return session.exec(select(Specification).offset(skip).limit(limit)).all()
+
+
+# Declared before /{specification_id} so "coverage" and "requirements" are not taken for IDs
+@router.get("/coverage", response_model=List[SpecificationCoverageRead])
+def get_all_coverage(
+    dut_id: Optional[int] = None,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get the coverage rollups of every specification, optionally on one DUT"""
+    return get_coverage(session, dut_id=dut_id)
+
+
+@router.post("/coverage/rebuild", response_model=StandardResponse)
+def rebuild_all_coverage(
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Discard the coverage rollups and rebuild them from the current links and results"""
+    reset_coverage(session)
+    rebuild_coverage(session, session.exec(select(Specification.id)).all())
+    session.commit()
+    
+    return {"success": True, "message": "Coverage rollups rebuilt", "data": None}
+
+
+# Requirement Endpoints
+@router.post("/requirements", response_model=RequirementRead)
+def create_requirement(
+    requirement: RequirementCreate,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create a new requirement"""
+    # Built from field names: from_orm would look for the "Field" alias and drop it
+    db_requirement = Requirement(**requirement.dict())
+    session.add(db_requirement)
+    session.commit()
+    session.refresh(db_requirement)
+    return _requirement_read(db_requirement)
+
+
+@router.get(
+    "/requirements", response_model=List[RequirementRead],
+    dependencies=[Depends(table_etag("requirements"))]
+)
+def get_requirements(
+    skip: int = 0,
+    limit: int = 100,
+    field: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    """Get all requirements, optionally filtered by field"""
+    query = select(Requirement)
+    
+    if field:
+        query = query.where(Requirement.field == field)
+    
+    requirements = session.exec(query.offset(skip).limit(limit)).all()
+    return [_requirement_read(requirement) for requirement in requirements]
+
+
+@router.get(
+    "/requirements/{requirement_id}", response_model=RequirementDetail,
+    dependencies=[Depends(table_etag("requirements", "requirement_specifications", "requirement_test_cases"))]
+)
+def get_requirement(
+    requirement_id: int,
+    session: Session = Depends(get_session)
+):
+    """Get a specific requirement by ID, with its specifications and linked test case IDs"""
+    requirement = _get_requirement(session, requirement_id)
+    
+    specifications = session.exec(
+        select(Specification)
+        .join(RequirementSpecification, RequirementSpecification.specification_id == Specification.id)
+        .where(RequirementSpecification.requirement_id == requirement_id)
+        .order_by(Specification.id)
+    ).all()
+    test_case_ids = session.exec(
+        select(RequirementTestCase.test_case_id)
+        .where(RequirementTestCase.requirement_id == requirement_id)
+        .order_by(RequirementTestCase.test_case_id)
+    ).all()
+    
+    result = RequirementDetail(**_requirement_read(requirement).dict(by_alias=True))
+    result.specifications = [SpecificationRead.from_orm(specification) for specification in specifications]
+    result.test_case_ids = test_case_ids
+    return result
+
+
+@router.patch("/requirements/{requirement_id}", response_model=RequirementRead)
+def update_requirement(
+    requirement_id: int,
+    requirement: RequirementUpdate,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Update a requirement"""
+    db_requirement = _get_requirement(session, requirement_id)
+    
+    for key, value in requirement.dict(exclude_unset=True).items():
+        setattr(db_requirement, key, value)
+    
+    session.add(db_requirement)
+    session.commit()
+    session.refresh(db_requirement)
+    return _requirement_read(db_requirement)
+
+
+@router.delete("/requirements/{requirement_id}", response_model=StandardResponse)
+def delete_requirement(
+    requirement_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Delete a requirement and its specification and test case links"""
+    _get_requirement(session, requirement_id)
+    delete_requirements(session, [requirement_id])
+    
+    return {"success": True, "message": f"Requirement {requirement_id} deleted successfully", "data": None}
+
+
+@router.post("/requirements/{requirement_id}/test-cases/{test_case_id}", response_model=StandardResponse)
+def link_test_case(
+    requirement_id: int,
+    test_case_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Link a test case to a requirement, so its results count towards the requirement's coverage"""
+    _get_requirement(session, requirement_id)
+    if not session.get(TestCase, test_case_id):
+        raise HTTPException(status_code=404, detail="Test case not found")
+    
+    if session.get(RequirementTestCase, (requirement_id, test_case_id)):
+        return {"success": True, "message": "Test case already linked to requirement", "data": None}
+    
+    session.add(RequirementTestCase(requirement_id=requirement_id, test_case_id=test_case_id))
+    session.flush()
+    rebuild_coverage(session, specifications_of_requirements(session, [requirement_id]))
+    session.commit()
+    
+    return {"success": True, "message": "Test case linked to requirement", "data": None}
+
+
+@router.delete("/requirements/{requirement_id}/test-cases/{test_case_id}", response_model=StandardResponse)
+def unlink_test_case(
+    requirement_id: int,
+    test_case_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Remove a test case from a requirement"""
+    link = session.get(RequirementTestCase, (requirement_id, test_case_id))
+    if not link:
+        raise HTTPException(status_code=404, detail="Test case not linked to this requirement")
+    
+    session.delete(link)
+    session.flush()
+    rebuild_coverage(session, specifications_of_requirements(session, [requirement_id]))
+    session.commit()
+    
+    return {"success": True, "message": "Test case removed from requirement", "data": None}
+
+
+@router.get(
+    "/{specification_id}", response_model=SpecificationWithRequirements,
+    dependencies=[Depends(table_etag("specifications", "requirements", "requirement_specifications"))]
+)
+def get_specification(
+    specification_id: int,
+    session: Session = Depends(get_session)
+):
+    """Get a specific specification by ID, including its requirements"""
+    specification = _get_specification(session, specification_id)
+    
+    requirements = session.exec(
+        select(Requirement)
+        .join(RequirementSpecification, RequirementSpecification.requirement_id == Requirement.id)
+        .where(RequirementSpecification.specification_id == specification_id)
+        .order_by(Requirement.id)
+    ).all()
+    
+    result = SpecificationWithRequirements.from_orm(specification)
+    result.requirements = [_requirement_read(requirement) for requirement in requirements]
+    return result
+
+
+@router.patch("/{specification_id}", response_model=SpecificationRead)
+def update_specification(
+    specification_id: int,
+    specification: SpecificationUpdate,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Update a specification"""
+    db_specification = _get_specification(session, specification_id)
+    
+    for key, value in specification.dict(exclude_unset=True).items():
+        setattr(db_specification, key, value)
+    
+    session.add(db_specification)
+    session.commit()
+    session.refresh(db_specification)
+    return db_specification
+
+
+@router.delete("/{specification_id}", response_model=StandardResponse)
+def delete_specification(
+    specification_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Delete a specification and its requirement links; the requirements are kept"""
+    _get_specification(session, specification_id)
+    delete_specifications(session, [specification_id])
+    
+    return {"success": True, "message": f"Specification {specification_id} deleted successfully", "data": None}
+
+
+@router.post("/{specification_id}/requirements/{requirement_id}", response_model=StandardResponse)
+def add_requirement_to_specification(
+    specification_id: int,
+    requirement_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Add a requirement to a specification"""
+    _get_specification(session, specification_id)
+    _get_requirement(session, requirement_id)
+    
+    if session.get(RequirementSpecification, (requirement_id, specification_id)):
+        return {"success": True, "message": "Requirement already added to specification", "data": None}
+    
+    session.add(RequirementSpecification(requirement_id=requirement_id, specification_id=specification_id))
+    session.flush()
+    rebuild_coverage(session, [specification_id])
+    session.commit()
+    
+    return {"success": True, "message": "Requirement added to specification", "data": None}
+
+
+@router.delete("/{specification_id}/requirements/{requirement_id}", response_model=StandardResponse)
+def remove_requirement_from_specification(
+    specification_id: int,
+    requirement_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Remove a requirement from a specification"""
+    link = session.get(RequirementSpecification, (requirement_id, specification_id))
+    if not link:
+        raise HTTPException(status_code=404, detail="Requirement not linked to this specification")
+    
+    session.delete(link)
+    session.flush()
+    rebuild_coverage(session, [specification_id])
+    session.commit()
+    
+    return {"success": True, "message": "Requirement removed from specification", "data": None}
+
+
+@router.get("/{specification_id}/coverage", response_model=List[SpecificationCoverageRead])
+def get_specification_coverage(
+    specification_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get a specification's coverage rollup on every DUT it has results on"""
+    _get_specification(session, specification_id)
+    return get_coverage(session, specification_id=specification_id)
+
+
+@router.get("/{specification_id}/coverage/{dut_id}", response_model=SpecificationCoverageDetail)
+def get_specification_coverage_on_dut(
+    specification_id: int,
+    dut_id: int,
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Get a specification's coverage on one DUT, requirement by requirement"""
+    _get_specification(session, specification_id)
+    if not session.get(DUT, dut_id):
+        raise HTTPException(status_code=404, detail="DUT not found")
+    
+    requirements = get_requirement_coverage(session, specification_id, dut_id)
+    passing = sum(1 for requirement in requirements if requirement["passing"])
+    
+    return {
+        "specification_id": specification_id,
+        "dut_id": dut_id,
+        "requirement_count": len(requirements),
+        "tested_count": sum(1 for requirement in requirements if requirement["tested_test_cases"]),
+        "passing_count": passing,
+        "coverage": coverage_percent(passing, len(requirements)),
+        "requirements": requirements
+    }
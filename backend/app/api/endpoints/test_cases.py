@@ -1,19 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.db.database import get_session
+from app.core.bulk import MAX_BULK_ITEMS, bulk_write
+from app.core.cascade import delete_test_cases
+from app.core.content_hash import CONTENT_HASH_FIELDS, update_content_hashes
+from app.core.case_history import get_test_case_history, iter_test_case_history, parse_history_cursor
+from app.core.projection import parse_fields
+from app.core.search import search_test_cases
+from app.core.streaming import iter_rows, ndjson_response, wants_ndjson
 from app.models.base import TestCase, TestSuite
 from app.models.schemas import (
     TestCaseCreate,
     TestCaseRead,
+    TestCaseListItem,
     TestCaseUpdate,
     TestCaseWithSuite,
+    TestCaseSearchResult,
+    TestCaseHistory,
+    BulkResponse,
     StandardResponse
 )
-from app.api.deps import get_current_active_user, get_admin_user
+from app.api.deps import get_current_active_user, get_admin_user, table_etag
 
 router = APIRouter()
 
+# Large text columns left out of test case lists unless requested with fields=
+DEFERRED_TEST_CASE_FIELDS = ("description", "steps", "precondition", "material")
+
 
 @router.post("/", response_model=TestCaseRead)
 def create_test_case(
@@ -34,24 +48,92 @@ def create_test_case(
     return db_test_case
 
 
-@router.get("/", response_model=List[TestCaseRead])
+@router.post("/bulk", response_model=BulkResponse)
+def bulk_write_test_cases(
+    items: List[Dict[str, Any]] = Body(...),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Create (items without "id") or update (items with "id") many test cases
+    in one transaction; returns the status of each item
+    """
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items can be written at once")
+    
+    written = bulk_write(
+        session, TestCase, items, TestCaseCreate, TestCaseUpdate,
+        references={"test_suite_id": TestSuite},
+        snapshot_columns=CONTENT_HASH_FIELDS
+    )
+    update_content_hashes(session, written["created"], written["updated"])
+    session.commit()
+    return written["response"]
+
+
+@router.get(
+    "/", response_model=List[TestCaseListItem], response_model_exclude_unset=True,
+    dependencies=[Depends(table_etag("test_cases"))]
+)
 def get_test_cases(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     test_suite_id: Optional[int] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
+    ndjson: bool = Depends(wants_ndjson),
     session: Session = Depends(get_session)
 ):
-    """Get all test cases, optionally filtered by test suite"""
-    query = select(TestCase)
+    """
+    Get all test cases, optionally filtered by test suite and a full-text search.
+    Only the columns listed in fields (comma separated) are returned; by default
+    all but description, steps, precondition and material. With
+    Accept: application/x-ndjson the test cases are streamed one per line.
+    """
+    try:
+        columns = parse_fields(fields, TestCase.__table__, deferred=DEFERRED_TEST_CASE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = select(*(TestCase.__table__.c[name] for name in columns))
+    
+    if search:
+        # Keep the ranking order of the full-text search
+        hits = search_test_cases(session, search, test_suite_id=test_suite_id, skip=skip, limit=limit)
+        ids = [hit["id"] for hit in hits]
+        rows = {row["id"]: row for row in session.execute(query.where(TestCase.id.in_(ids))).mappings()}
+        rows = [dict(rows[case_id]) for case_id in ids if case_id in rows]
+        return ndjson_response(rows, headers=response.headers) if ndjson else rows
     
     if test_suite_id is not None:
         query = query.where(TestCase.test_suite_id == test_suite_id)
     
-    test_cases = session.exec(query.offset(skip).limit(limit)).all()
-    return test_cases
+    query = query.order_by(TestCase.id).offset(skip).limit(limit)
+    if ndjson:
+        return ndjson_response(iter_rows(session.get_bind(), query), headers=response.headers)
+    rows = session.execute(query).mappings().all()
+    return [dict(row) for row in rows]
+
+
+@router.get(
+    "/search", response_model=List[TestCaseSearchResult],
+    dependencies=[Depends(table_etag("test_cases"))]
+)
+def search_test_cases_endpoint(
+    q: str,
+    skip: int = 0,
+    limit: int = 50,
+    test_suite_id: Optional[int] = None,
+    session: Session = Depends(get_session)
+):
+    """Full-text search over test case IDs, titles, descriptions, steps and preconditions"""
+    return search_test_cases(session, q, test_suite_id=test_suite_id, skip=skip, limit=limit)
 
 
-@router.get("/{case_id}", response_model=TestCaseWithSuite)
+@router.get(
+    "/{case_id}", response_model=TestCaseWithSuite,
+    dependencies=[Depends(table_etag("test_cases", "test_suites"))]
+)
 def get_test_case(
     case_id: int,
     session: Session = Depends(get_session)
@@ -63,6 +145,38 @@ def get_test_case(
     return test_case
 
 
+@router.get(
+    "/{case_id}/history", response_model=TestCaseHistory,
+    dependencies=[Depends(table_etag("test_case_results", "test_runs", "duts", "test_operators", "archived_test_runs"))]
+)
+def get_test_case_history_endpoint(
+    case_id: int,
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    ndjson: bool = Depends(wants_ndjson),
+    session: Session = Depends(get_session)
+):
+    """
+    Get a test case's results across test runs, newest first; pass next_cursor
+    as before for the next page. With Accept: application/x-ndjson the whole
+    history is streamed one result per line, without paging.
+    """
+    if not session.get(TestCase, case_id):
+        raise HTTPException(status_code=404, detail="Test case not found")
+    
+    try:
+        cursor = parse_history_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+    
+    if ndjson:
+        return ndjson_response(
+            iter_test_case_history(session.get_bind(), case_id, before=cursor), headers=response.headers
+        )
+    return get_test_case_history(session, case_id, before=cursor, limit=limit)
+
+
 @router.patch("/{case_id}", response_model=TestCaseRead)
 def update_test_case(
     case_id: int,
@@ -98,12 +212,11 @@ def delete_test_case(
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_admin_user)
 ):
-    """Delete a test case"""
+    """Delete a test case with its results and template links"""
     test_case = session.get(TestCase, case_id)
     if not test_case:
         raise HTTPException(status_code=404, detail="Test case not found")
     
-    session.delete(test_case)
-    session.commit()
+    counts = delete_test_cases(session, [case_id])
     
-    return {"success": True, "message": f"Test case {case_id} deleted successfully", "data": None}
\ No newline at end of file
+    return {"success": True, "message": f"Test case {case_id} deleted successfully", "data": counts}
\ No newline at end of file
@@ -1,16 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, literal
 from sqlmodel import Session, select
 from typing import List, Optional
 from app.db.database import get_session
-from app.models.base import TestRunTemplate, TestCase, TestRunTemplateTestCase
+from app.core.analytics import log_new_results
+from app.core.cache import cached_response
+from app.core.cascade import delete_test_run_templates
+from app.core.result_utils import PENDING_RESULT
+from app.core.run_summary import record_results
+from app.db.events import mark_tables_changed
+from app.models.base import DUT, TestRunTemplate, TestCase, TestRunTemplateTestCase, TestRun, TestCaseResult, TestOperator
 from app.models.schemas import (
     TestRunTemplateCreate,
     TestRunTemplateRead,
     TestRunTemplateUpdate,
     TestRunTemplateWithCases,
+    TestRunTemplateInstantiate,
+    TestRunRead,
     StandardResponse
 )
-from app.api.deps import get_current_active_user, get_admin_user
+from app.api.deps import get_current_active_user, get_admin_user, table_etag
+from datetime import datetime
 
 router = APIRouter()
 
@@ -29,7 +39,11 @@ def create_test_run_template(
     return db_template
 
 
-@router.get("/", response_model=List[TestRunTemplateRead])
+@router.get(
+    "/", response_model=List[TestRunTemplateRead],
+    dependencies=[Depends(table_etag("test_run_templates"))]
+)
+@cached_response("test_run_templates", model=TestRunTemplateRead)
 def get_test_run_templates(
     skip: int = 0,
     limit: int = 100,
@@ -40,7 +54,10 @@ def get_test_run_templates(
     return templates
 
 
-@router.get("/{template_id}", response_model=TestRunTemplateWithCases)
+@router.get(
+    "/{template_id}", response_model=TestRunTemplateWithCases,
+    dependencies=[Depends(table_etag("test_run_templates", "test_run_template_test_cases", "test_cases"))]
+)
 def get_test_run_template(
     template_id: int,
     session: Session = Depends(get_session)
@@ -50,17 +67,14 @@ def get_test_run_template(
     if not template:
         raise HTTPException(status_code=404, detail="Test run template not found")
     
-    # Get test cases for this template
-    test_cases = []
-    template_cases = session.exec(
-        select(TestRunTemplateTestCase).where(TestRunTemplateTestCase.template_id == template_id)
+    # Get test cases for this template in a single join
+    test_cases = session.exec(
+        select(TestCase)
+        .join(TestRunTemplateTestCase, TestRunTemplateTestCase.test_case_id == TestCase.id)
+        .where(TestRunTemplateTestCase.template_id == template_id)
+        .order_by(TestCase.id)
     ).all()
     
-    for link in template_cases:
-        test_case = session.get(TestCase, link.test_case_id)
-        if test_case:
-            test_cases.append(test_case)
-    
     # Add test cases to template response
     result = TestRunTemplateWithCases.from_orm(template)
     result.test_cases = test_cases
@@ -68,6 +82,60 @@ def get_test_run_template(
     return result
 
 
+@router.post("/{template_id}/instantiate", response_model=TestRunRead)
+def instantiate_test_run_template(
+    template_id: int,
+    run: TestRunTemplateInstantiate,
+    session: Session = Depends(get_session),
+    current_user: TestOperator = Depends(get_current_active_user)
+):
+    """Create a test run from a template, with a pending result for each of its test cases"""
+    template = session.get(TestRunTemplate, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Test run template not found")
+    
+    # Verify operator exists, defaulting to the current user
+    operator_id = run.operator_id if run.operator_id is not None else current_user.id
+    if not session.get(TestOperator, operator_id):
+        raise HTTPException(status_code=404, detail="Operator not found")
+    
+    # Verify DUT exists if one is given
+    if run.dut_id is not None and not session.get(DUT, run.dut_id):
+        raise HTTPException(status_code=404, detail="DUT not found")
+    
+    db_test_run = TestRun(
+        status=run.status,
+        name=run.name or template.name,
+        description=run.description if run.description is not None else template.description,
+        run_date=run.run_date or datetime.utcnow().isoformat(),
+        dut_id=run.dut_id,
+        operator_id=operator_id
+    )
+    session.add(db_test_run)
+    session.flush()
+    
+    # Copy the template's test cases into results with one INSERT ... SELECT
+    inserted = session.execute(
+        insert(TestCaseResult).from_select(
+            ["result", "test_run_id", "test_case_id"],
+            select(
+                literal(PENDING_RESULT),
+                literal(db_test_run.id),
+                TestRunTemplateTestCase.test_case_id
+            ).where(TestRunTemplateTestCase.template_id == template_id)
+        )
+    ).rowcount
+    mark_tables_changed(session, TestCaseResult.__tablename__, run_ids=[db_test_run.id])
+    record_results(session, db_test_run.id, [PENDING_RESULT] * inserted)
+    log_new_results(session, session.exec(
+        select(TestCaseResult.id).where(TestCaseResult.test_run_id == db_test_run.id)
+    ).all())
+    
+    session.commit()
+    session.refresh(db_test_run)
+    return db_test_run
+
+
 @router.patch("/{template_id}", response_model=TestRunTemplateRead)
 def update_test_run_template(
     template_id: int,
@@ -102,14 +170,8 @@ def delete_test_run_template(
     if not template:
         raise HTTPException(status_code=404, detail="Test run template not found")
     
-    # First delete template-test case links
-    session.exec(
-        select(TestRunTemplateTestCase).where(TestRunTemplateTestCase.template_id == template_id)
-    ).delete()
-    
-    # Then delete the template
-    session.delete(template)
-    session.commit()
+    # Delete the template together with its test case links
+    delete_test_run_templates(session, [template_id])
     
     return {"success": True, "message": f"Test run template {template_id} deleted successfully", "data": None}
 
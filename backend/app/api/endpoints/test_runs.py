@@ -1,23 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.db.database import get_session
+from app.core.analytics import log_new_results, mark_cases_stale, mark_results_stale
+from app.core.archive import ArchiveFileMissing, load_archived_run
+from app.core.blob_store import BLOB_FIELDS, delete_orphan_blobs, offload_result_payloads, read_result_payload
+from app.core.bulk import MAX_BULK_ITEMS, bulk_write
+from app.core.cache import cached_response
+from app.core.cascade import (
+    BACKGROUND_DELETE_THRESHOLD, DELETING_STATUS, delete_test_runs, delete_test_runs_in_background
+)
+from app.core.export import EXPORT_FORMATS, export_test_runs
+from app.core.projection import parse_fields
+from app.core.result_utils import result_category
+from app.core.run_matrix import build_regression_matrix
+from app.core.run_summary import record_result, record_results
+from app.core.streaming import iter_rows, ndjson_response, wants_ndjson
+from app.db.events import ALL_TEST_RUNS
 from app.models.base import TestRun, TestCase, TestCaseResult, TestOperator
 from app.models.schemas import (
     TestRunCreate, 
     TestRunRead, 
     TestRunUpdate, 
     TestRunWithResults,
+    TestOperatorRead,
     TestCaseResultCreate,
     TestCaseResultRead,
     TestCaseResultUpdate,
+    BulkResponse,
     StandardResponse
 )
-from app.api.deps import get_current_active_user, get_admin_user
+from app.api.deps import get_current_active_user, get_admin_user, get_upload_user, table_etag
 from datetime import datetime
 
 router = APIRouter()
 
+# Upper bound on the number of runs in one regression matrix
+MAX_MATRIX_RUNS = 200
+
+# Upper bound on the number of runs in one export
+MAX_EXPORT_RUNS = 200
+
+# Runs in these states no longer change, so their detail responses are cached
+FINISHED_RUN_STATUSES = {"Completed", "Failed", "Cancelled"}
+
+# Change counters a run's detail depends on: its own, not every write to runs and results
+RUN_DETAIL_TABLES = (ALL_TEST_RUNS, "test_runs/{run_id}", "test_operators", "archived_test_runs")
+
+
+# Result columns always returned in run detail, and the large ones only sent when asked for
+REQUIRED_RESULT_FIELDS = ("id", "result", "test_case_id", "test_run_id")
+DEFERRED_RESULT_FIELDS = ("logs", "artifacts")
+
+
+def _is_finished(test_run) -> bool:
+    status = test_run["status"] if isinstance(test_run, dict) else test_run.status
+    return status in FINISHED_RUN_STATUSES
+
+
+def _operator_read(operator: Optional[TestOperator]) -> Optional[Dict[str, Any]]:
+    # Plain data, as the response cache must not hold ORM instances. Built by
+    # alias: validating the ORM object would drop "Access_Rights"
+    if operator is None:
+        return None
+    return TestOperatorRead.parse_obj({
+        "id": operator.id,
+        "name": operator.name,
+        "mail": operator.mail,
+        "login": operator.login,
+        "Access_Rights": operator.access_rights,
+        "company_id": operator.company_id
+    }).dict(by_alias=True)
+
+
+def _export_response(session: Session, run_ids: List[int], export_format: str, filename: str) -> StreamingResponse:
+    """Stream an export of the given runs' results as a file download"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format, use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    found = set(session.exec(select(TestRun.id).where(TestRun.id.in_(run_ids))).all())
+    missing = [run_id for run_id in run_ids if run_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Test runs not found: {missing}")
+    
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        export_test_runs(session.get_bind(), run_ids, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
+
 
 # Test Runs Endpoints
 @router.post("/", response_model=TestRunRead)
@@ -40,6 +115,7 @@ def create_test_run(
     
     # Create any test case results provided
     if test_run.test_case_results:
+        created_results = []
         for result in test_run.test_case_results:
             # Verify test case exists
             test_case = session.get(TestCase, result.test_case_id)
@@ -55,15 +131,18 @@ def create_test_run(
                 test_case_id=result.test_case_id,
                 test_run_id=db_test_run.id
             )
+            offload_result_payloads(session, db_result)
             session.add(db_result)
+            created_results.append(db_result.result)
         
+        record_results(session, db_test_run.id, created_results)
         session.commit()
         session.refresh(db_test_run)
     
     return db_test_run
 
 
-@router.get("/", response_model=List[TestRunRead])
+@router.get("/", response_model=List[TestRunRead], dependencies=[Depends(table_etag("test_runs"))])
 def get_test_runs(
     skip: int = 0,
     limit: int = 100,
@@ -83,17 +162,113 @@ def get_test_runs(
     return test_runs
 
 
-@router.get("/{run_id}", response_model=TestRunWithResults)
+@router.get(
+    "/matrix", response_model=dict,
+    dependencies=[Depends(table_etag("test_runs", "test_case_results", "test_cases"))]
+)
+def get_regression_matrix(
+    run_ids: List[int] = Query(...),
+    session: Session = Depends(get_session)
+):
+    """Get a test case x run result matrix for several runs, in the given order"""
+    # Drop duplicates but keep the requested order
+    run_ids = list(dict.fromkeys(run_ids))
+    if len(run_ids) > MAX_MATRIX_RUNS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MATRIX_RUNS} test runs can be compared")
+    
+    runs = {run.id: run for run in session.exec(select(TestRun).where(TestRun.id.in_(run_ids))).all()}
+    missing = [run_id for run_id in run_ids if run_id not in runs]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Test runs not found: {missing}")
+    
+    return build_regression_matrix(session, [runs[run_id] for run_id in run_ids])
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_test_runs_endpoint(
+    run_ids: List[int] = Query(...),
+    export_format: str = Query("csv", alias="format"),
+    session: Session = Depends(get_session)
+):
+    """Download the results of several test runs as one csv, xlsx or parquet file"""
+    run_ids = list(dict.fromkeys(run_ids))
+    if len(run_ids) > MAX_EXPORT_RUNS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXPORT_RUNS} test runs can be exported")
+    
+    return _export_response(session, run_ids, export_format, "test-runs")
+
+
+@router.get(
+    "/{run_id}", response_model=TestRunWithResults, response_model_exclude_unset=True,
+    dependencies=[Depends(table_etag(*RUN_DETAIL_TABLES))]
+)
+@cached_response(*RUN_DETAIL_TABLES, when=_is_finished)
 def get_test_run(
     run_id: int,
+    response: Response,
+    result_fields: Optional[str] = None,
+    ndjson: bool = Depends(wants_ndjson),
     session: Session = Depends(get_session)
 ):
-    """Get a specific test run by ID, including test case results"""
+    """
+    Get a specific test run by ID, including test case results. Results carry
+    the columns listed in result_fields (comma separated); by default all but
+    logs and artifacts, which can be fetched per result.
+    
+    With Accept: application/x-ndjson only the results are returned, streamed
+    one per line straight from a database cursor.
+    """
+    try:
+        columns = parse_fields(
+            result_fields, TestCaseResult.__table__,
+            required=REQUIRED_RESULT_FIELDS, deferred=DEFERRED_RESULT_FIELDS
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     test_run = session.get(TestRun, run_id)
     if not test_run:
+        # Fall back to the cold-storage archive for old runs
+        try:
+            archived_run = load_archived_run(session, run_id)
+        except ArchiveFileMissing:
+            raise HTTPException(status_code=410, detail="Test run is archived but its archive files are missing")
+        if archived_run:
+            archived_run["test_case_results"] = [
+                {name: result.get(name) for name in columns}
+                for result in archived_run["test_case_results"]
+            ]
+            if ndjson:
+                return ndjson_response(archived_run["test_case_results"], headers=response.headers)
+            return archived_run
         raise HTTPException(status_code=404, detail="Test run not found")
     
-    return test_run
+    # Select only the requested result columns
+    query = (
+        select(*(TestCaseResult.__table__.c[name] for name in columns))
+        .where(TestCaseResult.test_run_id == run_id)
+        .order_by(TestCaseResult.id)
+    )
+    if ndjson:
+        return ndjson_response(iter_rows(session.get_bind(), query), headers=response.headers)
+    results = session.execute(query).mappings().all()
+    
+    return {
+        **TestRunRead.from_orm(test_run).dict(),
+        "operator": _operator_read(test_run.operator),
+        "test_case_results": [dict(result) for result in results],
+        "archived": False
+    }
+
+
+@router.get("/{run_id}/export", response_class=StreamingResponse)
+def export_test_run(
+    run_id: int,
+    export_format: str = Query("csv", alias="format"),
+    session: Session = Depends(get_session)
+):
+    """Download the results of a test run as a csv, xlsx or parquet file"""
+    return _export_response(session, [run_id], export_format, f"test-run-{run_id}")
 
 
 @router.patch("/{run_id}", response_model=TestRunRead)
@@ -116,9 +291,19 @@ def update_test_run(
     
     # Update attributes
     test_run_data = test_run.dict(exclude_unset=True)
+    old_dut_id = db_test_run.dut_id
     for key, value in test_run_data.items():
         setattr(db_test_run, key, value)
     
+    if db_test_run.dut_id != old_dut_id:
+        # The run's results move from one DUT's flaky history to the other's
+        case_ids = session.exec(
+            select(TestCaseResult.test_case_id).where(TestCaseResult.test_run_id == run_id).distinct()
+        ).all()
+        mark_cases_stale(
+            session, [(dut_id, case_id) for dut_id in (old_dut_id, db_test_run.dut_id) for case_id in case_ids]
+        )
+    
     session.add(db_test_run)
     session.commit()
     session.refresh(db_test_run)
@@ -128,31 +313,40 @@ def update_test_run(
 @router.delete("/{run_id}", response_model=StandardResponse)
 def delete_test_run(
     run_id: int,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_admin_user)
 ):
-    """Delete a test run and its results"""
+    """
+    Delete a test run and its results, in batches. Runs with many results are
+    marked as deleting and removed by a background task.
+    """
     test_run = session.get(TestRun, run_id)
     if not test_run:
         raise HTTPException(status_code=404, detail="Test run not found")
     
-    # Delete test case results first
-    session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == run_id)).delete()
-    
-    # Delete test run
-    session.delete(test_run)
-    session.commit()
+    if test_run.total_count > BACKGROUND_DELETE_THRESHOLD:
+        test_run.status = DELETING_STATUS
+        session.add(test_run)
+        session.commit()
+        background_tasks.add_task(delete_test_runs_in_background, session.get_bind(), [run_id])
+        return {"success": True, "message": f"Test run {run_id} is being deleted", "data": {"background": True}}
     
-    return {"success": True, "message": f"Test run {run_id} deleted successfully", "data": None}
+    counts = delete_test_runs(session, [run_id])
+    return {"success": True, "message": f"Test run {run_id} deleted successfully", "data": counts}
 
 
-@router.get("/compare/{run_id1}/{run_id2}", response_model=dict)
+@router.get(
+    "/compare/{run_id1}/{run_id2}", response_model=dict,
+    dependencies=[Depends(table_etag("test_runs", "test_case_results", "test_cases"))]
+)
 def compare_test_runs(
     run_id1: int,
     run_id2: int,
+    only_differences: bool = False,
     session: Session = Depends(get_session)
 ):
-    """Compare results from two test runs"""
+    """Compare results from two test runs, optionally listing only the test cases that differ"""
     # Get both test runs
     test_run1 = session.get(TestRun, run_id1)
     test_run2 = session.get(TestRun, run_id2)
@@ -160,16 +354,29 @@ def compare_test_runs(
     if not test_run1 or not test_run2:
         raise HTTPException(status_code=404, detail="One or both test runs not found")
     
-    # Collect results for both runs
-    results1 = session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == run_id1)).all()
-    results2 = session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == run_id2)).all()
+    # Load both result sets with their test case titles in one query
+    rows = session.exec(
+        select(
+            TestCaseResult.test_run_id,
+            TestCaseResult.test_case_id,
+            TestCaseResult.result,
+            TestCase.title
+        )
+        .join(TestCase, TestCase.id == TestCaseResult.test_case_id)
+        .where(TestCaseResult.test_run_id.in_([run_id1, run_id2]))
+        .order_by(TestCaseResult.id)
+    ).all()
     
     # Map test case IDs to results for easier comparison
-    results1_map = {result.test_case_id: result for result in results1}
-    results2_map = {result.test_case_id: result for result in results2}
-    
-    # Get all test case IDs from both runs
-    all_test_case_ids = set(results1_map.keys()) | set(results2_map.keys())
+    results1_map = {}
+    results2_map = {}
+    titles = {}
+    for test_run_id, test_case_id, result, title in rows:
+        titles[test_case_id] = title
+        if test_run_id == run_id1:
+            results1_map[test_case_id] = result
+        if test_run_id == run_id2:
+            results2_map[test_case_id] = result
     
     # Compare results
     comparison = {
@@ -179,49 +386,35 @@ def compare_test_runs(
         "test_cases": []
     }
     
-    for test_case_id in all_test_case_ids:
-        test_case = session.get(TestCase, test_case_id)
-        if not test_case:
-            continue
-        
+    # Calculate statistics for each run
+    for run_key, results_map in (("run1", results1_map), ("run2", results2_map)):
+        stats = comparison[run_key]
+        for result in results_map.values():
+            stats["total"] += 1
+            stats[f"{result_category(result)}_count"] += 1
+    
+    for test_case_id in sorted(titles):
         result1 = results1_map.get(test_case_id)
         result2 = results2_map.get(test_case_id)
         
-        # Calculate statistics for run1
-        if result1:
-            comparison["run1"]["total"] += 1
-            if result1.result.lower() == "pass":
-                comparison["run1"]["pass_count"] += 1
-            elif result1.result.lower() == "fail":
-                comparison["run1"]["fail_count"] += 1
-            else:
-                comparison["run1"]["other_count"] += 1
-        
-        # Calculate statistics for run2
-        if result2:
-            comparison["run2"]["total"] += 1
-            if result2.result.lower() == "pass":
-                comparison["run2"]["pass_count"] += 1
-            elif result2.result.lower() == "fail":
-                comparison["run2"]["fail_count"] += 1
-            else:
-                comparison["run2"]["other_count"] += 1
-        
         # Check for differences
-        if result1 and result2 and result1.result != result2.result:
+        if result1 is not None and result2 is not None and result1 != result2:
             comparison["differences"].append({
                 "test_case_id": test_case_id,
-                "test_case_title": test_case.title,
-                "run1_result": result1.result,
-                "run2_result": result2.result
+                "test_case_title": titles[test_case_id],
+                "run1_result": result1,
+                "run2_result": result2
             })
         
+        if only_differences and result1 == result2:
+            continue
+        
         # Add to test cases list
         comparison["test_cases"].append({
             "test_case_id": test_case_id,
-            "test_case_title": test_case.title,
-            "run1_result": result1.result if result1 else None,
-            "run2_result": result2.result if result2 else None
+            "test_case_title": titles[test_case_id],
+            "run1_result": result1,
+            "run2_result": result2
         })
     
     return comparison
@@ -248,14 +441,76 @@ def create_test_case_result(
     
     # Create test case result
     db_result = TestCaseResult.from_orm(result)
+    offload_result_payloads(session, db_result)
     session.add(db_result)
+    record_result(session, db_result.test_run_id, db_result.result)
     session.commit()
     session.refresh(db_result)
     
     return db_result
 
 
-@router.get("/results/{result_id}", response_model=TestCaseResultRead)
+@router.post("/results/bulk", response_model=BulkResponse)
+def bulk_write_test_case_results(
+    items: List[Dict[str, Any]] = Body(...),
+    session: Session = Depends(get_session),
+    current_user: dict = Depends(get_upload_user)
+):
+    """
+    Create (items without "id") or update (items with "id") many test case
+    results in one transaction; returns the status of each item
+    """
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items can be written at once")
+    
+    def offload(values: Dict[str, Any]) -> Dict[str, Any]:
+        # Large logs/artifacts go to the blob store, as for single results
+        fields = [field for field in BLOB_FIELDS if field in values]
+        if not fields:
+            return values
+        result = offload_result_payloads(session, TestCaseResult(**values), fields)
+        for field in fields:
+            for column in (field, f"{field}_hash", f"{field}_size"):
+                values[column] = getattr(result, column)
+        return values
+    
+    written = bulk_write(
+        session, TestCaseResult, items, TestCaseResultCreate, TestCaseResultUpdate,
+        references={"test_case_id": TestCase, "test_run_id": TestRun},
+        snapshot_columns=("test_run_id", "test_case_id", "result"),
+        prepare=offload,
+        run_column="test_run_id"
+    )
+    
+    # Keep run summary counters in step, with one UPDATE per run and sign,
+    # queue new results and flag edited ones for the flaky test and coverage analytics
+    added, removed = {}, {}
+    stale = set()
+    for row in written["created"]:
+        added.setdefault(row["test_run_id"], []).append(row["result"])
+    for previous, values in written["updated"]:
+        current = {**previous, **values}
+        if (current["test_run_id"], current["result"]) != (previous["test_run_id"], previous["result"]):
+            removed.setdefault(previous["test_run_id"], []).append(previous["result"])
+            added.setdefault(current["test_run_id"], []).append(current["result"])
+        if current != previous:
+            stale.add((previous["test_run_id"], previous["test_case_id"]))
+            stale.add((current["test_run_id"], current["test_case_id"]))
+    for run_id, results in removed.items():
+        record_results(session, run_id, results, sign=-1)
+    for run_id, results in added.items():
+        record_results(session, run_id, results)
+    log_new_results(session, [row["id"] for row in written["created"]])
+    mark_results_stale(session, stale)
+    
+    session.commit()
+    return written["response"]
+
+
+@router.get(
+    "/results/{result_id}", response_model=TestCaseResultRead,
+    dependencies=[Depends(table_etag("test_case_results"))]
+)
 def get_test_case_result(
     result_id: int,
     session: Session = Depends(get_session)
@@ -268,6 +523,38 @@ def get_test_case_result(
     return result
 
 
+@router.get(
+    "/results/{result_id}/logs", response_class=PlainTextResponse,
+    dependencies=[Depends(table_etag("test_case_results"))]
+)
+def get_test_case_result_logs(
+    result_id: int,
+    session: Session = Depends(get_session)
+):
+    """Get the full logs of a test case result"""
+    result = session.get(TestCaseResult, result_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Test case result not found")
+    
+    return read_result_payload(session, result, "logs") or ""
+
+
+@router.get(
+    "/results/{result_id}/artifacts", response_class=PlainTextResponse,
+    dependencies=[Depends(table_etag("test_case_results"))]
+)
+def get_test_case_result_artifacts(
+    result_id: int,
+    session: Session = Depends(get_session)
+):
+    """Get the full artifacts of a test case result"""
+    result = session.get(TestCaseResult, result_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Test case result not found")
+    
+    return read_result_payload(session, result, "artifacts") or ""
+
+
 @router.patch("/results/{result_id}", response_model=TestCaseResultRead)
 def update_test_case_result(
     result_id: int,
@@ -292,10 +579,24 @@ def update_test_case_result(
         if not test_run:
             raise HTTPException(status_code=404, detail="Test run not found")
     
+    # Keep run summary counters in step with result/run changes
+    old_run_id, old_case_id, old_result = db_result.test_run_id, db_result.test_case_id, db_result.result
+    
     # Update attributes
     result_data = result.dict(exclude_unset=True)
     for key, value in result_data.items():
         setattr(db_result, key, value)
+    offload_result_payloads(session, db_result, result_data.keys())
+    
+    if (db_result.test_run_id, db_result.result) != (old_run_id, old_result):
+        record_result(session, old_run_id, old_result, sign=-1)
+        record_result(session, db_result.test_run_id, db_result.result)
+    
+    # Flaky test and coverage analytics only fold in new results: flag edits
+    if (db_result.test_run_id, db_result.test_case_id, db_result.result) != (old_run_id, old_case_id, old_result):
+        mark_results_stale(
+            session, [(old_run_id, old_case_id), (db_result.test_run_id, db_result.test_case_id)]
+        )
     
     session.add(db_result)
     session.commit()
@@ -315,7 +616,10 @@ def delete_test_case_result(
     if not result:
         raise HTTPException(status_code=404, detail="Test case result not found")
     
+    record_result(session, result.test_run_id, result.result, sign=-1)
+    mark_results_stale(session, [(result.test_run_id, result.test_case_id)])
     session.delete(result)
+    delete_orphan_blobs(session, [result.logs_hash, result.artifacts_hash])
     session.commit()
     
     return {"success": True, "message": f"Test case result {result_id} deleted successfully", "data": None}
\ No newline at end of file
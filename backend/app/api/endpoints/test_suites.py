@@ -2,14 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from typing import List
 from app.db.database import get_session
+from app.core.cache import cached_response
+from app.core.cascade import delete_test_suites
+from app.core.content_hash import diff_test_suites
 from app.models.base import TestSuite
 from app.models.schemas import (
     TestSuiteCreate,
     TestSuiteRead,
     TestSuiteUpdate,
+    TestSuiteDiff,
     StandardResponse
 )
-from app.api.deps import get_current_active_user, get_admin_user
+from app.api.deps import get_current_active_user, get_admin_user, table_etag
 
 router = APIRouter()
 
@@ -28,7 +32,11 @@ def create_test_suite(
     return db_test_suite
 
 
-@router.get("/", response_model=List[TestSuiteRead])
+@router.get(
+    "/", response_model=List[TestSuiteRead],
+    dependencies=[Depends(table_etag("test_suites"))]
+)
+@cached_response("test_suites", model=TestSuiteRead)
 def get_test_suites(
     skip: int = 0,
     limit: int = 100,
@@ -39,7 +47,11 @@ def get_test_suites(
     return test_suites
 
 
-@router.get("/{suite_id}", response_model=TestSuiteRead)
+@router.get(
+    "/{suite_id}", response_model=TestSuiteRead,
+    dependencies=[Depends(table_etag("test_suites"))]
+)
+@cached_response("test_suites", model=TestSuiteRead)
 def get_test_suite(
     suite_id: int,
     session: Session = Depends(get_session)
@@ -51,6 +63,24 @@ def get_test_suite(
     return test_suite
 
 
+@router.get(
+    "/{base_suite_id}/diff/{suite_id}", response_model=TestSuiteDiff,
+    dependencies=[Depends(table_etag("test_suites", "test_cases"))]
+)
+@cached_response("test_suites", "test_cases")
+def get_test_suite_diff(
+    base_suite_id: int,
+    suite_id: int,
+    session: Session = Depends(get_session)
+):
+    """Get the test cases added, removed and modified between two suites (e.g. two versions of one suite)"""
+    for test_suite_id in (base_suite_id, suite_id):
+        if not session.get(TestSuite, test_suite_id):
+            raise HTTPException(status_code=404, detail=f"Test suite {test_suite_id} not found")
+    
+    return diff_test_suites(session, base_suite_id, suite_id)
+
+
 @router.patch("/{suite_id}", response_model=TestSuiteRead)
 def update_test_suite(
     suite_id: int,
@@ -80,12 +110,11 @@ def delete_test_suite(
     session: Session = Depends(get_session),
     current_user: dict = Depends(get_admin_user)
 ):
-    """Delete a test suite"""
+    """Delete a test suite with its test cases and their results"""
     test_suite = session.get(TestSuite, suite_id)
     if not test_suite:
         raise HTTPException(status_code=404, detail="Test suite not found")
     
-    session.delete(test_suite)
-    session.commit()
+    counts = delete_test_suites(session, [suite_id])
     
-    return {"success": True, "message": f"Test suite {suite_id} deleted successfully", "data": None}
\ No newline at end of file
+    return {"success": True, "message": f"Test suite {suite_id} deleted successfully", "data": counts}
\ No newline at end of file
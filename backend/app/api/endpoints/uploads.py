@@ -4,9 +4,11 @@ from typing import List, Optional
 from app.db.database import get_session
 from app.core.file_utils import process_upload_file
 from app.core.test_case_utils import create_or_find_test_case
+from app.core.blob_store import offload_result_payloads
+from app.core.run_summary import record_results
 from app.models.base import TestCase, TestRun, TestCaseResult, TestOperator, TestSuite
 from app.models.schemas import StandardResponse, FileUploadResponse
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, get_upload_user
 import os
 import json
 import pandas as pd
@@ -20,7 +22,7 @@ async def upload_test_results(
     operator_id: int = None,
     test_run_name: Optional[str] = None,
     session: Session = Depends(get_session),
-    current_user: dict = Depends(get_current_active_user)
+    current_user: dict = Depends(get_upload_user)
 ):
     """Upload test results from a file (JSON or Excel)"""
     if not file:
@@ -67,6 +69,7 @@ async def upload_test_results(
         
         # Process results based on file format
         test_case_results_count = 0
+        imported_results = []
         
         # Assume a specific structure in the file
         if file_ext == "json":
@@ -176,7 +179,9 @@ async def upload_test_results(
                         comment=item.get("comment"),
                         artifacts=item.get("artifacts")
                     )
+                    offload_result_payloads(session, result)
                     session.add(result)
+                    imported_results.append(result.result)
                     test_case_results_count += 1
         
         elif file_ext in ["xlsx", "xls"]:
@@ -223,9 +228,12 @@ async def upload_test_results(
                         comment=item.get("comment", None),
                         artifacts=item.get("artifacts", None)
                     )
+                    offload_result_payloads(session, result)
                     session.add(result)
+                    imported_results.append(result.result)
                     test_case_results_count += 1
         
+        record_results(session, test_run.id, imported_results)
         session.commit()
         
         return {
@@ -250,6 +258,7 @@ async def import_local_file(
     test_run_name: Optional[str] = None,
     data: dict = None,
     session: Session = Depends(get_session),
+    # Reads files on the server, so API keys (which only upload) are not accepted here
     current_user: dict = Depends(get_current_active_user)
 ):
     # Check if parameters were sent in the body
@@ -311,6 +320,7 @@ async def import_local_file(
         
         # Process results
         test_case_results_count = 0
+        imported_results = []
         
         # Process based on file format and structure
         if file_ext == "json":
@@ -420,9 +430,12 @@ async def import_local_file(
                         comment=item.get("comment"),
                         artifacts=item.get("artifacts")
                     )
+                    offload_result_payloads(session, result)
                     session.add(result)
+                    imported_results.append(result.result)
                     test_case_results_count += 1
         
+        record_results(session, test_run.id, imported_results)
         session.commit()
         
         return {
@@ -0,0 +1,383 @@
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.core.result_utils import PENDING_RESULT, result_category
+from app.db.events import mark_tables_changed
+from app.models.base import (
+    AnalyticsNewResult, AnalyticsStaleCase, FlakyCaseState, TestCase, TestCaseResult, TestRun
+)
+
+# Number of most recent runs kept per DUT and test case; caps the usable window
+FLAKY_HISTORY_LIMIT = int(os.getenv("FLAKY_HISTORY_LIMIT", "100"))
+# Number of new results folded into the state per batch
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "10000"))
+# Keys per IN (...) list when claiming a batch, well below the bound parameter limits
+CLAIM_CHUNK_SIZE = 5000
+
+FLAKY_JOB = "flaky_cases"
+
+# One character per run in FlakyCaseState.history
+HISTORY_CODES = {"pass": "P", "fail": "F", "other": "O"}
+
+# New results are queued by the transaction that inserts them, so a refresh
+# sees exactly the committed results it has not folded in yet. A result id
+# watermark cannot do that: SQLite reuses the ids of deleted rows, and
+# PostgreSQL transactions commit sequence values out of order.
+new_results = AnalyticsNewResult.__table__
+stale_cases = AnalyticsStaleCase.__table__
+
+# Incremental jobs told about DUT/test case pairs whose results changed. The
+# first one, the flaky test state, passes the pairs it updated on to the rest.
+_stale_jobs: List[str] = [FLAKY_JOB]
+
+# Serializes flaky state refreshes within a process; claiming the batch does it across processes
+_refresh_lock = threading.Lock()
+
+
+def _upsert(session: Session, table, rows: List[Dict[str, Any]], keys: List[str], set_: Dict[str, Any]):
+    """Insert rows, or apply `set_` (nothing if empty) where a row with the same keys exists"""
+    if not rows:
+        return
+    connection = session.connection()
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        index_elements = [table.c[key] for key in keys]
+        statement = dialect_insert(table)
+        if set_:
+            statement = statement.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+        connection.execute(statement, rows)
+        return
+    for row in rows:
+        condition = [table.c[key] == row[key] for key in keys]
+        exists = connection.execute(select(table.c[keys[0]]).where(*condition)).first()
+        if exists is None:
+            connection.execute(table.insert().values(row))
+        elif set_:
+            connection.execute(update(table).where(*condition).values(set_))
+
+
+def log_new_results(session: Session, result_ids: Iterable[Optional[int]]):
+    """
+    Queue newly inserted results for the flaky test state, in the inserting
+    transaction. Results added through the ORM are queued by the flush
+    listener below; Core INSERTs call this with the new ids.
+    """
+    rows = [{"result_id": result_id} for result_id in set(result_ids) if result_id is not None]
+    if rows:
+        session.connection().execute(insert(new_results), rows)
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _log_flushed_results(session, flush_context):
+    """Queue the results an ORM flush inserted"""
+    log_new_results(session, [instance.id for instance in session.new if isinstance(instance, TestCaseResult)])
+
+
+def track_stale_cases(name: str):
+    """Have mark_cases_stale also flag pairs for another incremental job"""
+    if name not in _stale_jobs:
+        _stale_jobs.append(name)
+
+
+def mark_cases_stale(
+    session: Session,
+    pairs: Iterable[Tuple[Optional[int], Optional[int]]],
+    jobs: Optional[Iterable[str]] = None
+):
+    """
+    Flag DUT/test case pairs whose existing results were edited, moved or
+    deleted (in the caller's transaction), so every incremental job, or the
+    given ones, rebuilds them on its next refresh. Pairs without a DUT or
+    test case are ignored.
+
+    Flagging an already flagged pair bumps its stamp, so a refresh that read
+    the older flag does not clear the newer one.
+    """
+    rows = [
+        {"job": job, "dut_id": dut_id, "test_case_id": test_case_id, "stamp": 0}
+        for dut_id, test_case_id in set(pairs)
+        if dut_id is not None and test_case_id is not None
+        for job in (_stale_jobs if jobs is None else jobs)
+    ]
+    if rows:
+        _upsert(session, stale_cases, rows, ["job", "dut_id", "test_case_id"], {"stamp": stale_cases.c.stamp + 1})
+        mark_tables_changed(session, AnalyticsStaleCase.__tablename__)
+
+
+def mark_results_stale(session: Session, run_cases: Iterable[Tuple[Optional[int], Optional[int]]]):
+    """mark_cases_stale for results given as (test_run_id, test_case_id), on their runs' DUTs"""
+    run_cases = set(run_cases)
+    run_ids = {run_id for run_id, _ in run_cases if run_id is not None}
+    if not run_ids:
+        return
+    duts = dict(session.exec(select(TestRun.id, TestRun.dut_id).where(TestRun.id.in_(run_ids))).all())
+    mark_cases_stale(session, [(duts.get(run_id), test_case_id) for run_id, test_case_id in run_cases])
+
+
+def get_stale_cases(session: Session, name: str, limit: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """(dut_id, test_case_id, stamp) of the pairs flagged for an incremental job"""
+    query = (
+        select(AnalyticsStaleCase.dut_id, AnalyticsStaleCase.test_case_id, AnalyticsStaleCase.stamp)
+        .where(AnalyticsStaleCase.job == name)
+        .order_by(AnalyticsStaleCase.dut_id, AnalyticsStaleCase.test_case_id)
+    )
+    if limit:
+        query = query.limit(limit)
+    return session.exec(query).all()
+
+
+def claim_stale_cases(session: Session, name: str, stale: List[Tuple[int, int, int]]) -> bool:
+    """
+    Drop the flags a job is about to deal with (in the caller's transaction).
+    Returns False when some of them were cleared by a concurrent refresh, or
+    raised again since they were read; the caller then rolls back and leaves
+    them to the next refresh. The DELETE holds the flags until commit, so of
+    two refreshes reading the same flags only one gets to do the work.
+    """
+    return _delete_claimed(
+        session,
+        delete(stale_cases).where(stale_cases.c.job == name),
+        tuple_(stale_cases.c.dut_id, stale_cases.c.test_case_id, stale_cases.c.stamp),
+        [tuple(row) for row in stale]
+    )
+
+
+def _delete_claimed(session: Session, statement, key, values: List[Any]) -> bool:
+    """Run a DELETE for the given key values, in chunks, and report whether it found all of them"""
+    deleted = 0
+    for start in range(0, len(values), CLAIM_CHUNK_SIZE):
+        deleted += session.execute(
+            statement.where(key.in_(values[start:start + CLAIM_CHUNK_SIZE]))
+        ).rowcount
+    return deleted == len(values)
+
+
+def _load_states(session: Session, keys: set) -> Dict[Tuple[int, int], FlakyCaseState]:
+    """Existing state of the given DUT/test case pairs"""
+    states = {}
+    for dut_id in {dut_id for dut_id, _ in keys}:
+        for state in session.exec(
+            select(FlakyCaseState).where(FlakyCaseState.dut_id == dut_id)
+        ).all():
+            if (state.dut_id, state.test_case_id) in keys:
+                states[(state.dut_id, state.test_case_id)] = state
+    return states
+
+
+def _append_result(state: FlakyCaseState, test_run_id: int, result: str):
+    code = HISTORY_CODES[result_category(result)]
+    if state.last_run_id == test_run_id and state.history:
+        # Several results for the case in one run: the latest counts
+        history = state.history[:-1] + code
+    else:
+        history = state.history + code
+    state.history = history[-FLAKY_HISTORY_LIMIT:]
+    state.last_run_id = test_run_id
+
+
+def _rebuild_states(session: Session, keys: set):
+    """Replay the results of the given pairs into fresh histories, leaving out those still queued"""
+    states = _load_states(session, keys)
+    for state in states.values():
+        state.history = ""
+        state.last_run_id = None
+
+    for dut_id, test_case_id, test_run_id, result in session.exec(
+        select(TestRun.dut_id, TestCaseResult.test_case_id, TestCaseResult.test_run_id, TestCaseResult.result)
+        .join(TestRun, TestRun.id == TestCaseResult.test_run_id)
+        .outerjoin(AnalyticsNewResult, AnalyticsNewResult.result_id == TestCaseResult.id)
+        .where(TestRun.dut_id.in_({dut_id for dut_id, _ in keys}))
+        .where(TestCaseResult.test_case_id.in_({test_case_id for _, test_case_id in keys}))
+        .where(AnalyticsNewResult.result_id.is_(None))
+        .order_by(TestCaseResult.id)
+    ).all():
+        if (dut_id, test_case_id) not in keys or result == PENDING_RESULT:
+            continue
+        state = states.get((dut_id, test_case_id))
+        if not state:
+            state = states[(dut_id, test_case_id)] = FlakyCaseState(dut_id=dut_id, test_case_id=test_case_id)
+        _append_result(state, test_run_id, result)
+
+    for state in states.values():
+        if state.history:
+            session.add(state)
+        elif state in session:
+            # No results left for the pair
+            session.delete(state)
+
+
+def refresh_flaky_state(session: Session, batch_size: Optional[int] = None) -> int:
+    """
+    Fold the queued new test case results into the per DUT and test case
+    history strings, after rebuilding the pairs whose results were edited,
+    moved or deleted since. Returns the number of new results processed.
+
+    Only queued results (and those of flagged pairs) are read, so a refresh
+    costs time proportional to what changed since the last one, not to the
+    whole history. Results of runs without a DUT and the pending
+    placeholders of runs created from templates are skipped. The pairs
+    updated are flagged for the jobs built on this state (coverage).
+
+    There is a single writer at a time: a lock within the process, and a
+    claim on each batch across processes. A refresh that loses the claim
+    stops; the winner's state is as current as its own would have been.
+    """
+    batch_size = batch_size or ANALYTICS_BATCH_SIZE
+    processed = 0
+
+    with _refresh_lock:
+        while True:
+            stale = get_stale_cases(session, FLAKY_JOB, limit=batch_size)
+            result_ids = session.exec(
+                select(AnalyticsNewResult.result_id).order_by(AnalyticsNewResult.result_id).limit(batch_size)
+            ).all()
+            if not stale and not result_ids:
+                break
+            claimed = _delete_claimed(session, delete(new_results), new_results.c.result_id, list(result_ids))
+            if not claimed or not claim_stale_cases(session, FLAKY_JOB, stale):
+                session.rollback()
+                break
+
+            # Claimed results are no longer queued, so a rebuilt pair already includes them
+            rebuilt = {(dut_id, test_case_id) for dut_id, test_case_id, _ in stale}
+            if rebuilt:
+                _rebuild_states(session, rebuilt)
+
+            rows = session.exec(
+                select(TestRun.dut_id, TestCaseResult.test_case_id, TestCaseResult.test_run_id, TestCaseResult.result)
+                .join(TestRun, TestRun.id == TestCaseResult.test_run_id)
+                .where(TestCaseResult.id.in_(result_ids))
+                .order_by(TestCaseResult.id)
+            ).all() if result_ids else []
+
+            # Load the existing state of every other DUT/test case pair in this batch
+            keys = {(dut_id, test_case_id) for dut_id, test_case_id, _, _ in rows
+                    if dut_id is not None and test_case_id is not None} - rebuilt
+            states = _load_states(session, keys)
+
+            for dut_id, test_case_id, test_run_id, result in rows:
+                # Placeholders of runs created from templates are no verdict; the one written later is
+                if (dut_id, test_case_id) not in keys or result == PENDING_RESULT:
+                    continue
+                state = states.get((dut_id, test_case_id))
+                if not state:
+                    state = FlakyCaseState(dut_id=dut_id, test_case_id=test_case_id)
+                    states[(dut_id, test_case_id)] = state
+                _append_result(state, test_run_id, result)
+
+            session.add_all(states.values())
+            mark_cases_stale(session, rebuilt | keys, jobs=_stale_jobs[1:])
+            mark_tables_changed(session, AnalyticsStaleCase.__tablename__)
+            session.commit()
+            processed += len(result_ids)
+
+    return processed
+
+
+def reset_flaky_state(session: Session):
+    """Drop the accumulated state and flag every DUT/test case pair, so the next refresh rebuilds it from scratch"""
+    with _refresh_lock:
+        session.execute(delete(FlakyCaseState))
+        session.execute(delete(new_results))
+        session.execute(delete(stale_cases).where(stale_cases.c.job == FLAKY_JOB))
+        session.execute(insert(stale_cases).from_select(
+            ["job", "dut_id", "test_case_id", "stamp"],
+            select(literal(FLAKY_JOB), TestRun.dut_id, TestCaseResult.test_case_id, literal(0))
+            .join(TestRun, TestRun.id == TestCaseResult.test_run_id)
+            .where(TestRun.dut_id.is_not(None), TestCaseResult.test_case_id.is_not(None))
+            .distinct()
+        ))
+        mark_tables_changed(session, FlakyCaseState.__tablename__, AnalyticsStaleCase.__tablename__)
+        session.commit()
+
+
+def flaky_stats(history: str) -> Dict[str, Any]:
+    """Flip rate, failure rate and streaks for a history string, oldest run first"""
+    runs = len(history)
+    fails = history.count("F")
+    passes = history.count("P")
+
+    # Flips are pass/fail changes between consecutive decisive runs
+    decisive = history.replace("O", "")
+    flips = sum(1 for previous, current in zip(decisive, decisive[1:]) if previous != current)
+
+    last = history[-1:] or None
+    streak = len(history) - len(history.rstrip(last)) if last else 0
+
+    longest_fail = 0
+    current = 0
+    for code in history:
+        current = current + 1 if code == "F" else 0
+        longest_fail = max(longest_fail, current)
+
+    return {
+        "runs": runs,
+        "pass_count": passes,
+        "fail_count": fails,
+        "flips": flips,
+        "flip_rate": round(flips / (len(decisive) - 1), 4) if len(decisive) > 1 else 0.0,
+        "failure_rate": round(fails / runs, 4) if runs else 0.0,
+        "current_streak": {"result": last, "length": streak},
+        "longest_fail_streak": longest_fail
+    }
+
+
+def find_flaky_test_cases(
+    session: Session,
+    dut_id: Optional[int] = None,
+    window: int = 20,
+    min_runs: int = 5,
+    limit: int = 50
+) -> List[Dict[str, Any]]:
+    """
+    Rank test cases by how often they flip between pass and fail over the
+    last `window` runs on the same DUT. Cases that never flipped are left out.
+    """
+    refresh_flaky_state(session)
+    window = min(window, FLAKY_HISTORY_LIMIT)
+
+    query = select(FlakyCaseState)
+    if dut_id is not None:
+        query = query.where(FlakyCaseState.dut_id == dut_id)
+
+    ranked = []
+    for state in session.exec(query).all():
+        history = state.history[-window:]
+        if len(history) < min_runs:
+            continue
+        stats = flaky_stats(history)
+        if not stats["flips"]:
+            continue
+        ranked.append({
+            "dut_id": state.dut_id,
+            "test_case_id": state.test_case_id,
+            "last_run_id": state.last_run_id,
+            "history": history,
+            **stats
+        })
+
+    ranked.sort(key=lambda item: (item["flip_rate"], item["failure_rate"], item["runs"]), reverse=True)
+    ranked = ranked[:limit]
+
+    # Single batched lookup for test case identifiers and titles
+    titles = {
+        test_case_id: (case_id, title)
+        for test_case_id, case_id, title in session.exec(
+            select(TestCase.id, TestCase.case_id, TestCase.title)
+            .where(TestCase.id.in_([item["test_case_id"] for item in ranked]))
+        ).all()
+    }
+    for item in ranked:
+        item["case_id"], item["test_case_title"] = titles.get(item["test_case_id"], (None, None))
+
+    return ranked
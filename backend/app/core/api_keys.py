@@ -0,0 +1,89 @@
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.auth import SECRET_KEY
+from app.models.base import ApiKey, TestOperator
+
+# Server-side key for the HMAC of stored API keys; a leaked api_keys table is useless without it
+API_KEY_HMAC_SECRET = os.getenv("API_KEY_HMAC_SECRET", SECRET_KEY).encode("utf-8")
+
+# Keys look like qa_<prefix>_<secret>; the prefix finds the row through its index
+API_KEY_MARKER = "qa"
+API_KEY_PREFIX_BYTES = 6
+API_KEY_SECRET_BYTES = 32
+
+# The only scope so far: result ingestion (file uploads and bulk result writes)
+UPLOAD_SCOPE = "uploads"
+
+
+def hash_api_key(key: str) -> str:
+    """HMAC-SHA256 of a full API key"""
+    return hmac.new(API_KEY_HMAC_SECRET, key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _key_prefix(key: str) -> Optional[str]:
+    parts = key.split("_", 2)
+    if len(parts) != 3 or parts[0] != API_KEY_MARKER or not parts[1] or not parts[2]:
+        return None
+    return parts[1]
+
+
+def create_api_key(
+    session: Session,
+    operator_id: int,
+    name: str,
+    scope: str = UPLOAD_SCOPE,
+    expires_in_days: Optional[int] = None
+) -> Tuple[ApiKey, str]:
+    """
+    Create an API key for an operator (committed by the caller). Returns the
+    stored row and the key itself, which is not kept and cannot be shown again.
+    """
+    prefix = secrets.token_hex(API_KEY_PREFIX_BYTES)
+    key = f"{API_KEY_MARKER}_{prefix}_{secrets.token_urlsafe(API_KEY_SECRET_BYTES)}"
+    now = datetime.utcnow()
+    api_key = ApiKey(
+        operator_id=operator_id,
+        name=name,
+        prefix=prefix,
+        key_hash=hash_api_key(key),
+        scope=scope,
+        created_at=now.isoformat(),
+        expires_at=(now + timedelta(days=expires_in_days)).isoformat() if expires_in_days else None
+    )
+    session.add(api_key)
+    return api_key, key
+
+
+def authenticate_api_key(session: Session, key: str, scope: str) -> Optional[TestOperator]:
+    """
+    Operator owning a valid, unrevoked and unexpired API key with the given
+    scope, or None. One indexed lookup by prefix, then a constant-time
+    comparison of HMACs; no password hashing involved.
+    """
+    prefix = _key_prefix(key)
+    if prefix is None:
+        return None
+
+    row = session.exec(
+        select(ApiKey, TestOperator)
+        .join(TestOperator, TestOperator.id == ApiKey.operator_id)
+        .where(ApiKey.prefix == prefix)
+    ).first()
+    if row is None:
+        return None
+    api_key, operator = row
+
+    if not hmac.compare_digest(api_key.key_hash, hash_api_key(key)):
+        return None
+    if api_key.revoked_at is not None or api_key.scope != scope:
+        return None
+    if api_key.expires_at is not None and api_key.expires_at <= datetime.utcnow().isoformat():
+        return None
+    return operator
@@ -0,0 +1,267 @@
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Integer, Table, delete
+from sqlmodel import Session, select
+
+from app.db.events import mark_tables_changed
+from app.models.base import ArchivedBlob, ArchivedTestCaseRun, ArchivedTestRun, TestRun, TestCaseResult
+
+# Archive location and defaults, overridable from the environment
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_MAX_AGE_DAYS = int(os.getenv("ARCHIVE_MAX_AGE_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+
+# Result columns referencing the blob store, kept in the archived files
+BLOB_HASH_COLUMNS = ("logs_hash", "artifacts_hash")
+
+
+class ArchiveFileMissing(Exception):
+    """Raised when a run is indexed as archived but its Parquet file cannot be read"""
+
+
+def _arrow_schema(table: Table) -> pa.Schema:
+    """Build a fixed Arrow schema from a table so every partition file matches"""
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _parse_run_date(run_date: Optional[str]) -> Optional[date]:
+    """Parse the date part of an ISO run date, or None if it is not one"""
+    try:
+        return date.fromisoformat(run_date[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _partition_for(run_date: str) -> str:
+    """Hive-style partition directory for a run, one per run month"""
+    return f"run_month={run_date[:7]}"
+
+
+def _run_file(archive_dir: str, kind: str, partition: str, run_id: int) -> Path:
+    return Path(archive_dir) / kind / partition / f"run-{run_id}.parquet"
+
+
+def _read_run_file(path: Path) -> List[Dict[str, Any]]:
+    try:
+        return pq.read_table(path).to_pylist()
+    except OSError as e:
+        # FileNotFoundError, or pyarrow's ArrowIOError (an OSError alias)
+        raise ArchiveFileMissing(f"Archived file {path} cannot be read: {e}") from e
+
+
+def _write_parquet(rows: List[Dict[str, Any]], table: Table, path: Path):
+    """Write rows to a Parquet file using the table's schema"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrow_table = pa.Table.from_pylist(rows, schema=_arrow_schema(table))
+    pq.write_table(arrow_table, path)
+
+
+def archive_old_runs(
+    session: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    archive_dir: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Move test runs older than the given age, and their results, into
+    partitioned Parquet files and delete them from the database.
+
+    Runs are processed in batches; each batch is written to disk before its
+    rows are deleted and committed, so an interrupted job can simply be rerun.
+    Runs without a parseable run_date are never archived.
+    """
+    older_than_days = ARCHIVE_MAX_AGE_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    archive_dir = archive_dir or ARCHIVE_DIR
+
+    cutoff = date.today() - timedelta(days=older_than_days)
+    candidates = session.exec(
+        select(TestRun.id, TestRun.run_date)
+        .where(TestRun.run_date.is_not(None))
+        .where(TestRun.run_date < cutoff.isoformat())
+        .order_by(TestRun.id)
+    ).all()
+    # String comparison pre-filters; parsing weeds out non-ISO dates
+    run_ids = []
+    for run_id, run_date in candidates:
+        parsed = _parse_run_date(run_date)
+        if parsed and parsed < cutoff:
+            run_ids.append(run_id)
+
+    runs_table = TestRun.__table__
+    results_table = TestCaseResult.__table__
+    archived_runs = 0
+    archived_results = 0
+
+    for start in range(0, len(run_ids), batch_size):
+        batch = run_ids[start:start + batch_size]
+
+        runs = session.execute(
+            runs_table.select().where(runs_table.c.id.in_(batch))
+        ).mappings().all()
+        results = session.execute(
+            results_table.select()
+            .where(results_table.c.test_run_id.in_(batch))
+            .order_by(results_table.c.id)
+        ).mappings().all()
+
+        results_by_run = defaultdict(list)
+        for row in results:
+            results_by_run[row["test_run_id"]].append(dict(row))
+
+        archived_at = datetime.utcnow().isoformat()
+        for run in runs:
+            partition = _partition_for(run["run_date"])
+            run_results = results_by_run[run["id"]]
+            _write_parquet(
+                [dict(run)], runs_table,
+                _run_file(archive_dir, "test_runs", partition, run["id"])
+            )
+            _write_parquet(
+                run_results, results_table,
+                _run_file(archive_dir, "test_case_results", partition, run["id"])
+            )
+            session.merge(ArchivedTestRun(
+                id=run["id"],
+                run_date=run["run_date"],
+                partition=partition,
+                result_count=len(run_results),
+                archived_at=archived_at
+            ))
+            for test_case_id in {row["test_case_id"] for row in run_results if row["test_case_id"] is not None}:
+                session.merge(ArchivedTestCaseRun(test_case_id=test_case_id, test_run_id=run["id"]))
+            for digest in {row[column] for row in run_results for column in BLOB_HASH_COLUMNS if row[column]}:
+                session.merge(ArchivedBlob(hash=digest))
+
+        # Remove the batch from the hot tables
+        session.execute(delete(TestCaseResult).where(TestCaseResult.test_run_id.in_(batch)))
+        session.execute(delete(TestRun).where(TestRun.id.in_(batch)))
+        mark_tables_changed(session, TestCaseResult.__tablename__, TestRun.__tablename__, run_ids=batch)
+        session.commit()
+
+        archived_runs += len(runs)
+        archived_results += len(results)
+
+    return {"archived_runs": archived_runs, "archived_results": archived_results}
+
+
+def rebuild_archive_index(session: Session, archive_dir: Optional[str] = None) -> int:
+    """
+    Rebuild the archived_test_case_runs and archived_blobs indexes from the
+    archived result files (committed by the caller). Returns the number of
+    runs indexed.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    session.execute(delete(ArchivedTestCaseRun))
+    session.execute(delete(ArchivedBlob))
+    digests = set()
+    indexed = 0
+    for run_id, partition in session.exec(select(ArchivedTestRun.id, ArchivedTestRun.partition)).all():
+        path = _run_file(archive_dir, "test_case_results", partition, run_id)
+        try:
+            # Files written before the blob store have no hash columns
+            columns = [name for name in ("test_case_id", *BLOB_HASH_COLUMNS) if name in pq.read_schema(path).names]
+            rows = pq.read_table(path, columns=columns).to_pylist()
+        except OSError:
+            continue
+        session.add_all(
+            ArchivedTestCaseRun(test_case_id=test_case_id, test_run_id=run_id)
+            for test_case_id in {row["test_case_id"] for row in rows} if test_case_id is not None
+        )
+        digests.update(row.get(column) for row in rows for column in BLOB_HASH_COLUMNS)
+        indexed += 1
+    session.add_all(ArchivedBlob(hash=digest) for digest in digests if digest)
+    mark_tables_changed(session, ArchivedTestCaseRun.__tablename__, ArchivedBlob.__tablename__)
+    return indexed
+
+
+def load_archived_run(
+    session: Session,
+    run_id: int,
+    archive_dir: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Load an archived test run and its results, or None if it is not archived.
+    Raises ArchiveFileMissing if the run is indexed but its files are gone.
+    """
+    archived = session.get(ArchivedTestRun, run_id)
+    if not archived:
+        return None
+
+    archive_dir = archive_dir or ARCHIVE_DIR
+    runs = _read_run_file(_run_file(archive_dir, "test_runs", archived.partition, run_id))
+    if not runs:
+        return None
+
+    run = runs[0]
+    run["test_case_results"] = _read_run_file(
+        _run_file(archive_dir, "test_case_results", archived.partition, run_id)
+    )
+    run["archived"] = True
+    return run
+
+
+def load_archived_case_results(
+    session: Session,
+    test_case_id: int,
+    before: Optional[Tuple[int, int]] = None,
+    limit: Optional[int] = 100,
+    archive_dir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Archived results of one test case, newest run first, each with its run's
+    fields under "test_run". `before` is a (test_run_id, result id) keyset
+    cursor; a limit of None returns them all.
+
+    The archived_test_case_runs index names the runs holding results of the
+    case, so only their files are opened: a page reads at most limit + 1
+    runs, however large the archive. Runs whose files are gone are skipped.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    query = (
+        select(ArchivedTestRun.id, ArchivedTestRun.partition)
+        .join(ArchivedTestCaseRun, ArchivedTestCaseRun.test_run_id == ArchivedTestRun.id)
+        .where(ArchivedTestCaseRun.test_case_id == test_case_id)
+        .order_by(ArchivedTestRun.id.desc())
+    )
+    if before:
+        query = query.where(ArchivedTestRun.id <= before[0])
+    if limit is not None:
+        # Every run holds at least one result; the cursor's run may hold no more
+        query = query.limit(limit + 1)
+
+    results = []
+    for run_id, partition in session.exec(query).all():
+        if limit is not None and len(results) >= limit:
+            break
+        try:
+            runs = _read_run_file(_run_file(archive_dir, "test_runs", partition, run_id))
+            rows = _read_run_file(_run_file(archive_dir, "test_case_results", partition, run_id))
+        except ArchiveFileMissing:
+            continue
+        rows = [
+            {field: row.get(field) for field in ("id", "test_run_id", "test_case_id", "result", "comment")}
+            for row in rows
+            if row.get("test_case_id") == test_case_id and (not before or (run_id, row["id"]) < before)
+        ]
+        rows.sort(key=lambda row: row["id"], reverse=True)
+        for row in rows:
+            row["test_run"] = runs[0] if runs else {}
+        results.extend(rows)
+
+    return results[:limit] if limit is not None else results
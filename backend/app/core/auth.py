@@ -1,11 +1,16 @@
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import Session, select
+from app.core.cache import ResponseCache
+from app.core.hash_pool import HashPool, HashPoolFull
 from app.db.database import get_session
+from app.db.events import on_tables_committed
 from app.models.base import TestOperator
 from app.models.schemas import TokenData
 
@@ -14,11 +19,32 @@ SECRET_KEY = "dev_secret_key_change_in_production"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Identity cache: token subject -> user, so authenticated requests skip the user query
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "1024"))
+
+# Tables whose writes can change who a token belongs to or what it may do
+IDENTITY_TABLES = ("test_operators", "companies")
+
+# Password hashing pool: bcrypt threads, and how many hashes may run or wait at once
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
 # Password context for hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+password_pool = HashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same scheme for endpoints that also accept API keys, where a missing token is not an error yet
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+identity_cache = ResponseCache(max_entries=IDENTITY_CACHE_MAX_ENTRIES, ttl=IDENTITY_CACHE_TTL_SECONDS)
+
+# Committed user or company writes drop every cached identity; other
+# processes pick the change up when the TTL expires
+on_tables_committed(identity_cache.invalidate_tables)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -31,8 +57,28 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(session: Session, username: str, password: str) -> Optional[TestOperator]:
-    """Authenticate a user by username and password"""
+async def _run_in_password_pool(function, *args):
+    try:
+        return await password_pool.run(function, *args)
+    except HashPoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password checks in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password pool, without blocking the event loop"""
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password pool, without blocking the event loop"""
+    return await _run_in_password_pool(get_password_hash, password)
+
+
+def _find_user_with_password(session: Session, username: str) -> Optional[TestOperator]:
     user = session.exec(select(TestOperator).where(TestOperator.login == username)).first()
     if not user:
         return None
@@ -41,6 +87,15 @@ def authenticate_user(session: Session, username: str, password: str) -> Optiona
     if not hasattr(user, 'hashed_password') or not user.hashed_password:
         print("User found but has no hashed_password field")
         return None
+    
+    return user
+
+
+def authenticate_user(session: Session, username: str, password: str) -> Optional[TestOperator]:
+    """Authenticate a user by username and password"""
+    user = _find_user_with_password(session, username)
+    if not user:
+        return None
         
     if not verify_password(password, user.hashed_password):
         print("Password verification failed")
@@ -49,6 +104,23 @@ def authenticate_user(session: Session, username: str, password: str) -> Optiona
     return user
 
 
+async def authenticate_user_async(session: Session, username: str, password: str) -> Optional[TestOperator]:
+    """Authenticate a user by username and password, checking the password on the password pool"""
+    user = _find_user_with_password(session, username)
+    if not user:
+        return None
+    
+    # End the read transaction first, so waiting logins do not hold on to pooled connections
+    session.expunge(user)
+    session.rollback()
+    
+    if not await verify_password_async(password, user.hashed_password):
+        print("Password verification failed")
+        return None
+    
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -58,6 +130,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def get_cached_identity(login: str) -> Optional[TestOperator]:
+    """
+    User for a token subject from the identity cache, or None on a miss.
+
+    Every call gets its own detached copy, so a request can read it, or
+    merge it into its session, without affecting other requests.
+    """
+    values = identity_cache.get(login)
+    if values is None:
+        return None
+    user = TestOperator(**values)
+    make_transient_to_detached(user)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
 ) -> TestOperator:
@@ -76,7 +163,14 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = session.exec(select(TestOperator).where(TestOperator.login == token_data.username)).first()
+    user = get_cached_identity(token_data.username)
     if user is None:
-        raise credentials_exception
+        user = session.exec(select(TestOperator).where(TestOperator.login == token_data.username)).first()
+        if user is None:
+            raise credentials_exception
+        identity_cache.set(
+            token_data.username,
+            {column.key: getattr(user, column.key) for column in TestOperator.__table__.columns},
+            IDENTITY_TABLES
+        )
     return user
\ No newline at end of file
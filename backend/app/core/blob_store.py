@@ -0,0 +1,118 @@
+import hashlib
+import os
+import zlib
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.db.events import mark_tables_changed
+from app.models.base import ArchivedBlob, Blob, TestCaseResult
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available as a fallback
+    zstandard = None
+
+# Values larger than this many bytes are moved out of the result row
+BLOB_INLINE_THRESHOLD = int(os.getenv("BLOB_INLINE_THRESHOLD", "1024"))
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "10"))
+
+# Result columns that may be offloaded to the blob store
+BLOB_FIELDS = ("logs", "artifacts")
+
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    """Compress data with zstd when available, zlib otherwise"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    """Decompress data stored with the given codec"""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this blob")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return data
+
+
+def put_blob(session: Session, text: str) -> Tuple[str, int]:
+    """Store text in the blob store, deduplicated by content hash"""
+    data = text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+
+    if not session.get(Blob, digest):
+        codec, compressed = _compress(data)
+        session.add(Blob(hash=digest, size=len(data), codec=codec, data=compressed))
+
+    return digest, len(data)
+
+
+def get_blob(session: Session, digest: str) -> Optional[str]:
+    """Fetch and decompress a blob, or None if it does not exist"""
+    blob = session.get(Blob, digest)
+    if not blob:
+        return None
+    return _decompress(blob.codec, blob.data).decode("utf-8")
+
+
+def delete_orphan_blobs(session: Session, digests: Iterable[Optional[str]]) -> int:
+    """
+    Delete the given blobs unless a result or an archived result still
+    references them (in the caller's transaction). Returns the number deleted.
+    """
+    digests = {digest for digest in digests if digest}
+    if not digests:
+        return 0
+
+    referenced = set(session.exec(select(ArchivedBlob.hash).where(ArchivedBlob.hash.in_(digests))).all())
+    for field in BLOB_FIELDS:
+        column = getattr(TestCaseResult, f"{field}_hash")
+        referenced.update(session.exec(select(column).where(column.in_(digests)).distinct()).all())
+
+    orphans = digests - referenced
+    if not orphans:
+        return 0
+    deleted = session.execute(delete(Blob).where(Blob.hash.in_(orphans))).rowcount
+    mark_tables_changed(session, Blob.__tablename__)
+    return deleted
+
+
+def offload_result_payloads(
+    session: Session,
+    result: TestCaseResult,
+    fields: Iterable[str] = BLOB_FIELDS
+) -> TestCaseResult:
+    """
+    Move large logs/artifacts of a result into the blob store.
+
+    Only the given fields are considered, so partial updates leave untouched
+    payloads alone. Small values stay inline and drop any stale blob reference.
+    """
+    for field in fields:
+        if field not in BLOB_FIELDS:
+            continue
+
+        value = getattr(result, field)
+        if value is not None and len(value.encode("utf-8")) > BLOB_INLINE_THRESHOLD:
+            digest, size = put_blob(session, value)
+            setattr(result, field, None)
+            setattr(result, f"{field}_hash", digest)
+            setattr(result, f"{field}_size", size)
+        else:
+            setattr(result, f"{field}_hash", None)
+            setattr(result, f"{field}_size", None)
+
+    return result
+
+
+def read_result_payload(session: Session, result: TestCaseResult, field: str) -> Optional[str]:
+    """Return a result's logs/artifacts, whether stored inline or as a blob"""
+    digest = getattr(result, f"{field}_hash")
+    if digest:
+        return get_blob(session, digest)
+    return getattr(result, field)
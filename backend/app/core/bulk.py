@@ -0,0 +1,167 @@
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, update
+from sqlmodel import Session, SQLModel, select
+
+from app.db.events import mark_tables_changed
+
+# Upper bound on the number of items in one bulk request
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "10000"))
+
+# Ids per IN (...) lookup, well below the bound parameter limits of SQLite and PostgreSQL
+LOOKUP_BATCH_SIZE = 5000
+
+
+def _validation_error(error: ValidationError) -> str:
+    """First validation error of an item as "field: message\""""
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def _existing_ids(session: Session, model: Type[SQLModel], ids: Iterable[Any]) -> set:
+    ids = list(set(ids))
+    found = set()
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        found.update(session.exec(
+            select(model.id).where(model.id.in_(ids[start:start + LOOKUP_BATCH_SIZE]))
+        ).all())
+    return found
+
+
+def _snapshot(session: Session, model: Type[SQLModel], ids: List[int], columns: Iterable[str]) -> Dict[int, Dict[str, Any]]:
+    """Current values of the given columns for each existing id"""
+    table = model.__table__
+    rows = {}
+    for start in range(0, len(ids), LOOKUP_BATCH_SIZE):
+        for row in session.execute(
+            select(table.c.id, *(table.c[name] for name in columns))
+            .where(table.c.id.in_(ids[start:start + LOOKUP_BATCH_SIZE]))
+        ).mappings():
+            rows[row["id"]] = dict(row)
+    return rows
+
+
+def bulk_write(
+    session: Session,
+    model: Type[SQLModel],
+    items: List[Dict[str, Any]],
+    create_schema: Type[BaseModel],
+    update_schema: Type[BaseModel],
+    references: Optional[Dict[str, Type[SQLModel]]] = None,
+    snapshot_columns: Iterable[str] = (),
+    prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    run_column: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Create items without an "id" and update items with one, in the caller's
+    transaction (not committed here).
+
+    Everything is validated before anything is written: item schemas, that
+    updated rows exist, and that the ids in `references` (field -> model)
+    point at existing rows, with one query per table. Valid items are then
+    written with one executemany INSERT ... RETURNING and one executemany
+    UPDATE; invalid ones are reported and skipped.
+
+    `run_column` names the column holding each row's test run (it must be
+    among `snapshot_columns`), so only the runs written to count as changed.
+
+    Returns the per-item statuses under "response", plus the "created" rows
+    (with their new ids) and the "updated" (previous values of
+    `snapshot_columns`, new values) pairs for callers that keep derived data
+    in step.
+    """
+    references = references or {}
+    statuses: List[Dict[str, Any]] = []
+    creates: List[Tuple[int, Dict[str, Any]]] = []
+    updates: List[Tuple[int, int, Dict[str, Any]]] = []
+
+    def fail(index: int, error: str, item_id: Optional[int] = None):
+        statuses[index] = {"index": index, "status": "error", "id": item_id, "error": error}
+
+    for index, item in enumerate(items):
+        statuses.append({"index": index, "status": None, "id": None, "error": None})
+        if not isinstance(item, dict):
+            fail(index, "Item must be an object")
+            continue
+        data = dict(item)
+        item_id = data.pop("id", None)
+        try:
+            if item_id is None:
+                creates.append((index, create_schema.parse_obj(data).dict()))
+            else:
+                updates.append((index, int(item_id), update_schema.parse_obj(data).dict(exclude_unset=True)))
+        except ValidationError as e:
+            fail(index, _validation_error(e), item_id)
+        except (TypeError, ValueError):
+            fail(index, "id must be an integer", None)
+
+    # Updated rows must exist
+    if updates:
+        found = _existing_ids(session, model, [item_id for _, item_id, _ in updates])
+        for index, item_id, _ in updates:
+            if item_id not in found:
+                fail(index, f"{model.__name__} {item_id} not found", item_id)
+
+    # Referenced rows must exist, one lookup per referenced table
+    pending = [(index, values) for index, values in creates] + [(index, values) for index, _, values in updates]
+    for field, referenced in references.items():
+        values = {values[field] for index, values in pending if values.get(field) is not None}
+        found = _existing_ids(session, referenced, values) if values else set()
+        for index, values in pending:
+            if values.get(field) is not None and values[field] not in found and statuses[index]["status"] != "error":
+                fail(index, f"{field}: {referenced.__name__} {values[field]} not found", statuses[index]["id"])
+
+    creates = [(index, values) for index, values in creates if statuses[index]["status"] != "error"]
+    updates = [(index, item_id, values) for index, item_id, values in updates if statuses[index]["status"] != "error"]
+
+    created = []
+    if creates:
+        rows = [prepare(values) if prepare else values for _, values in creates]
+        if session.get_bind().dialect.name == "sqlite":
+            # SQLite cannot order multi-row RETURNING, and SQLAlchemy would fall back
+            # to one INSERT per row. Rowids are assigned in VALUES order by the single
+            # writer, so the sorted ids line up with the rows.
+            ids = sorted(session.execute(insert(model).returning(model.id), rows).scalars().all())
+        else:
+            ids = session.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+        for (index, _), row, new_id in zip(creates, rows, ids):
+            statuses[index].update(status="created", id=new_id)
+            created.append({**row, "id": new_id})
+
+    updated = []
+    if updates:
+        previous = _snapshot(session, model, [item_id for _, item_id, _ in updates], snapshot_columns)
+        changes = []
+        for index, item_id, values in updates:
+            statuses[index].update(status="updated", id=item_id)
+            if values:
+                values = prepare(values) if prepare else values
+                changes.append({**values, "id": item_id})
+            updated.append((previous[item_id], values))
+        if changes:
+            session.execute(update(model), changes)
+
+    if created or updated:
+        run_ids = None
+        if run_column:
+            run_ids = {row.get(run_column) for row in created}
+            for previous, values in updated:
+                run_ids.update((previous[run_column], values.get(run_column, previous[run_column])))
+        mark_tables_changed(session, model.__tablename__, run_ids=run_ids)
+
+    return {
+        "response": {
+            "created": len(created),
+            "updated": len(updated),
+            "failed": sum(1 for status in statuses if status["status"] == "error"),
+            "items": statuses
+        },
+        "created": created,
+        "updated": updated
+    }
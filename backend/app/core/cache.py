@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from starlette.responses import Response
+
+from app.db.events import get_table_versions, on_tables_committed
+
+# Response cache bounds, overridable from the environment
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+# Argument types that identify a request; sessions and users are left out of the key
+_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with a TTL, where every entry is tagged with the
+    tables it was built from so writes can drop exactly the affected entries.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        """Cached value for key, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Any, value: Any, tables: Iterable[str]):
+        """Store a value built from the given tables, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        """Drop every entry built from any of the given tables"""
+        tables = set(tables)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[1] & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+response_cache = ResponseCache()
+
+# Committed writes invalidate the entries built from the tables they touched
+on_tables_committed(response_cache.invalidate_tables)
+
+
+def cached_response(
+    *tables: str,
+    model: Any = None,
+    when: Optional[Callable[[Any], bool]] = None
+):
+    """
+    Cache an endpoint's result, keyed on the endpoint, its request parameters
+    and the change counters of `tables`, until one of them changes or the TTL
+    expires. Table names may hold endpoint parameters, e.g.
+    "test_runs/{run_id}" for one run's own counter. The endpoint must take
+    its database session as `session`.
+
+    The counters live in the database, so every worker process derives the
+    same key for the same data: a body cached by one worker is never served
+    with another worker's newer ETag. Commits in this process also drop the
+    affected entries at once, to free their memory. A result is not cached
+    if the counters moved while it was being built, as it may predate the write.
+
+    With `model`, ORM results are converted to that response schema before
+    caching, so cached values never touch a database session. `when` can
+    restrict caching to some results, e.g. finished test runs.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        @wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            session = kwargs["session"]
+            names = [table.format(**kwargs) for table in tables]
+            versions = get_table_versions(session, names)
+            key = (endpoint.__module__, endpoint.__qualname__, tuple(sorted(
+                (name, value) for name, value in kwargs.items() if isinstance(value, _KEY_TYPES)
+            )), tuple(sorted(versions.items())))
+            cached = response_cache.get(key)
+            if cached is not None:
+                return cached
+
+            result = endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                # Streamed and other raw responses are sent as they are
+                return result
+            if when is not None and not when(result):
+                return result
+            if model is not None:
+                if isinstance(result, list):
+                    result = [model.from_orm(item) for item in result]
+                elif not isinstance(result, dict):
+                    result = model.from_orm(result)
+            if get_table_versions(session, names) != versions:
+                return result
+            response_cache.set(key, result, names)
+            return result
+        return wrapper
+    return decorator
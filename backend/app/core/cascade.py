@@ -0,0 +1,195 @@
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Union
+
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import Session, select
+
+from app.core.analytics import mark_results_stale
+from app.core.blob_store import delete_orphan_blobs
+from app.core.coverage import rebuild_coverage, specifications_of_requirements, specifications_of_test_cases
+from app.core.run_summary import record_results
+from app.db.events import mark_tables_changed
+from app.models.base import (
+    DUT, Capability, DUTCapability, FlakyCaseState, Requirement, RequirementSpecification,
+    RequirementTestCase, Specification, SpecificationCoverage, TestCase, TestCaseResult,
+    TestRun, TestRunTemplate, TestRunTemplateTestCase, TestSuite
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement and transaction, so no delete holds write locks for long
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "5000"))
+# Runs with more results than this are deleted by a background task
+BACKGROUND_DELETE_THRESHOLD = int(os.getenv("BACKGROUND_DELETE_THRESHOLD", "20000"))
+
+# Status shown on a run while a background task deletes it
+DELETING_STATUS = "Deleting"
+
+
+def _delete_results(session: Session, condition: ColumnElement, batch_size: int) -> int:
+    """
+    Delete the test case results matching a condition, one committed batch
+    at a time, taking each batch out of its run's summary counters, flagging
+    it for the flaky test and coverage analytics and dropping the blobs only
+    it referenced.
+    """
+    deleted = 0
+    while True:
+        rows = session.exec(
+            select(
+                TestCaseResult.id, TestCaseResult.test_run_id, TestCaseResult.test_case_id, TestCaseResult.result,
+                TestCaseResult.logs_hash, TestCaseResult.artifacts_hash
+            )
+            .where(condition)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return deleted
+
+        mark_results_stale(session, {(run_id, case_id) for _, run_id, case_id, _, _, _ in rows})
+        session.execute(delete(TestCaseResult).where(TestCaseResult.id.in_([row[0] for row in rows])))
+        delete_orphan_blobs(session, [digest for row in rows for digest in row[4:]])
+        by_run = defaultdict(list)
+        for _, run_id, _, result, _, _ in rows:
+            by_run[run_id].append(result)
+        for run_id, results in by_run.items():
+            record_results(session, run_id, results, sign=-1)
+        mark_tables_changed(session, TestCaseResult.__tablename__, run_ids=by_run)
+        session.commit()
+        deleted += len(rows)
+
+
+def delete_test_runs(session: Session, run_ids: List[int], batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Delete test runs and their results"""
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    results = _delete_results(session, TestCaseResult.test_run_id.in_(run_ids), batch_size)
+
+    runs = session.execute(delete(TestRun).where(TestRun.id.in_(run_ids))).rowcount
+    mark_tables_changed(session, TestRun.__tablename__, run_ids=run_ids)
+    session.commit()
+    return {"test_runs": runs, "test_case_results": results}
+
+
+def delete_test_cases(session: Session, case_ids: List[int], batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Delete test cases with their results (keeping run summaries in step),
+    template and requirement links and flaky test state, then recompute the
+    coverage of the specifications they covered
+    """
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    results = _delete_results(session, TestCaseResult.test_case_id.in_(case_ids), batch_size)
+
+    specification_ids = specifications_of_test_cases(session, case_ids)
+    session.execute(delete(TestRunTemplateTestCase).where(TestRunTemplateTestCase.test_case_id.in_(case_ids)))
+    session.execute(delete(RequirementTestCase).where(RequirementTestCase.test_case_id.in_(case_ids)))
+    session.execute(delete(FlakyCaseState).where(FlakyCaseState.test_case_id.in_(case_ids)))
+    cases = session.execute(delete(TestCase).where(TestCase.id.in_(case_ids))).rowcount
+    rebuild_coverage(session, specification_ids)
+    mark_tables_changed(
+        session, TestRunTemplateTestCase.__tablename__, RequirementTestCase.__tablename__,
+        FlakyCaseState.__tablename__, TestCase.__tablename__
+    )
+    session.commit()
+    return {"test_cases": cases, "test_case_results": results}
+
+
+def delete_test_suites(session: Session, suite_ids: List[int], batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Delete test suites and, through delete_test_cases, everything hanging off their test cases"""
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    deleted = {"test_suites": 0, "test_cases": 0, "test_case_results": 0}
+    while True:
+        case_ids = session.exec(
+            select(TestCase.id).where(TestCase.test_suite_id.in_(suite_ids)).limit(batch_size)
+        ).all()
+        if not case_ids:
+            break
+        counts = delete_test_cases(session, case_ids, batch_size)
+        deleted["test_cases"] += counts["test_cases"]
+        deleted["test_case_results"] += counts["test_case_results"]
+
+    deleted["test_suites"] = session.execute(delete(TestSuite).where(TestSuite.id.in_(suite_ids))).rowcount
+    mark_tables_changed(session, TestSuite.__tablename__)
+    session.commit()
+    return deleted
+
+
+def delete_duts(session: Session, dut_ids: List[int]) -> Dict[str, Any]:
+    """
+    Delete DUTs with their capability links, flaky test state and coverage
+    rollups. Test runs on the DUTs are kept, without a DUT.
+    """
+    runs = session.execute(
+        update(TestRun).where(TestRun.dut_id.in_(dut_ids)).values(dut_id=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    session.execute(delete(DUTCapability).where(DUTCapability.dut_id.in_(dut_ids)))
+    session.execute(delete(FlakyCaseState).where(FlakyCaseState.dut_id.in_(dut_ids)))
+    session.execute(delete(SpecificationCoverage).where(SpecificationCoverage.dut_id.in_(dut_ids)))
+    duts = session.execute(delete(DUT).where(DUT.id.in_(dut_ids))).rowcount
+    mark_tables_changed(
+        session, TestRun.__tablename__, DUTCapability.__tablename__, FlakyCaseState.__tablename__,
+        SpecificationCoverage.__tablename__, DUT.__tablename__
+    )
+    session.commit()
+    return {"duts": duts, "test_runs_detached": runs}
+
+
+def delete_capabilities(session: Session, capability_ids: List[int]) -> Dict[str, Any]:
+    """Delete capabilities and their DUT links"""
+    session.execute(delete(DUTCapability).where(DUTCapability.capability_id.in_(capability_ids)))
+    capabilities = session.execute(delete(Capability).where(Capability.id.in_(capability_ids))).rowcount
+    mark_tables_changed(session, DUTCapability.__tablename__, Capability.__tablename__)
+    session.commit()
+    return {"capabilities": capabilities}
+
+
+def delete_test_run_templates(session: Session, template_ids: List[int]) -> Dict[str, Any]:
+    """Delete test run templates and their test case links"""
+    session.execute(delete(TestRunTemplateTestCase).where(TestRunTemplateTestCase.template_id.in_(template_ids)))
+    templates = session.execute(delete(TestRunTemplate).where(TestRunTemplate.id.in_(template_ids))).rowcount
+    mark_tables_changed(session, TestRunTemplateTestCase.__tablename__, TestRunTemplate.__tablename__)
+    session.commit()
+    return {"test_run_templates": templates}
+
+
+def delete_specifications(session: Session, specification_ids: List[int]) -> Dict[str, Any]:
+    """Delete specifications with their requirement links and coverage rollups; requirements are kept"""
+    session.execute(
+        delete(RequirementSpecification).where(RequirementSpecification.specification_id.in_(specification_ids))
+    )
+    session.execute(delete(SpecificationCoverage).where(SpecificationCoverage.specification_id.in_(specification_ids)))
+    specifications = session.execute(delete(Specification).where(Specification.id.in_(specification_ids))).rowcount
+    mark_tables_changed(
+        session, RequirementSpecification.__tablename__, SpecificationCoverage.__tablename__,
+        Specification.__tablename__
+    )
+    session.commit()
+    return {"specifications": specifications}
+
+
+def delete_requirements(session: Session, requirement_ids: List[int]) -> Dict[str, Any]:
+    """
+    Delete requirements with their specification and test case links, then
+    recompute the coverage of the specifications they belonged to
+    """
+    specification_ids = specifications_of_requirements(session, requirement_ids)
+    session.execute(delete(RequirementSpecification).where(RequirementSpecification.requirement_id.in_(requirement_ids)))
+    session.execute(delete(RequirementTestCase).where(RequirementTestCase.requirement_id.in_(requirement_ids)))
+    requirements = session.execute(delete(Requirement).where(Requirement.id.in_(requirement_ids))).rowcount
+    rebuild_coverage(session, specification_ids)
+    mark_tables_changed(
+        session, RequirementSpecification.__tablename__, RequirementTestCase.__tablename__, Requirement.__tablename__
+    )
+    session.commit()
+    return {"requirements": requirements}
+
+
+def delete_test_runs_in_background(bind: Union[Engine, Connection], run_ids: List[int]):
+    """Background task body: delete runs in a session of its own"""
+    with Session(bind=bind) as session:
+        counts = delete_test_runs(session, run_ids)
+    logger.info("Deleted test runs %s: %s", run_ids, counts)
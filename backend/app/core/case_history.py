@@ -0,0 +1,126 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, select
+
+from app.core.archive import load_archived_case_results
+from app.core.streaming import iter_rows
+from app.models.base import DUT, TestCaseResult, TestOperator, TestRun
+
+
+def parse_history_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a "<test_run_id>:<result_id>" cursor; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    run_id, result_id = cursor.split(":")
+    return int(run_id), int(result_id)
+
+
+def _history_query(test_case_id: int, before: Optional[Tuple[int, int]] = None):
+    """Live results of a test case with their run, DUT and operator, newest run first"""
+    query = (
+        select(
+            TestCaseResult.id,
+            TestCaseResult.result,
+            TestCaseResult.comment,
+            TestCaseResult.test_run_id,
+            TestRun.name.label("test_run_name"),
+            TestRun.run_date,
+            TestRun.status,
+            TestRun.dut_id,
+            DUT.product_name.label("dut_name"),
+            TestRun.operator_id,
+            TestOperator.name.label("operator_name")
+        )
+        .join(TestRun, TestRun.id == TestCaseResult.test_run_id)
+        .outerjoin(DUT, DUT.id == TestRun.dut_id)
+        .outerjoin(TestOperator, TestOperator.id == TestRun.operator_id)
+        .where(TestCaseResult.test_case_id == test_case_id)
+    )
+    if before:
+        run_id, result_id = before
+        query = query.where(or_(
+            TestCaseResult.test_run_id < run_id,
+            and_(TestCaseResult.test_run_id == run_id, TestCaseResult.id < result_id)
+        ))
+    return query.order_by(TestCaseResult.test_run_id.desc(), TestCaseResult.id.desc())
+
+
+def _archived_entries(session: Session, archived: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """History entries for archived results, resolving names in one query each"""
+    if not archived:
+        return []
+    # Archived runs no longer exist in the database
+    dut_ids = {row["test_run"].get("dut_id") for row in archived}
+    operator_ids = {row["test_run"].get("operator_id") for row in archived}
+    dut_names = dict(session.exec(select(DUT.id, DUT.product_name).where(DUT.id.in_(dut_ids))).all())
+    operator_names = dict(session.exec(
+        select(TestOperator.id, TestOperator.name).where(TestOperator.id.in_(operator_ids))
+    ).all())
+    entries = []
+    for row in archived:
+        run = row["test_run"]
+        entries.append({
+            "id": row["id"],
+            "result": row["result"],
+            "comment": row["comment"],
+            "test_run_id": row["test_run_id"],
+            "test_run_name": run.get("name"),
+            "run_date": run.get("run_date"),
+            "status": run.get("status"),
+            "dut_id": run.get("dut_id"),
+            "dut_name": dut_names.get(run.get("dut_id")),
+            "operator_id": run.get("operator_id"),
+            "operator_name": operator_names.get(run.get("operator_id")),
+            "archived": True
+        })
+    return entries
+
+
+def get_test_case_history(
+    session: Session,
+    test_case_id: int,
+    before: Optional[Tuple[int, int]] = None,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """
+    One page of a test case's results across runs, newest run first.
+
+    Pages are keyset paginated on (test_run_id, id), which the
+    (test_case_id, test_run_id) index serves directly, so later pages cost
+    the same as the first. Results of archived runs are merged in.
+    """
+    rows = session.execute(_history_query(test_case_id, before).limit(limit + 1)).mappings().all()
+    entries = [{**row, "archived": False} for row in rows]
+
+    archived = load_archived_case_results(session, test_case_id, before=before, limit=limit + 1)
+    if archived:
+        entries.extend(_archived_entries(session, archived))
+        entries.sort(key=lambda entry: (entry["test_run_id"], entry["id"]), reverse=True)
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = None
+    if has_more:
+        last = entries[-1]
+        next_cursor = f"{last['test_run_id']}:{last['id']}"
+
+    return {"test_case_id": test_case_id, "results": entries, "next_cursor": next_cursor}
+
+
+def iter_test_case_history(
+    bind: Union[Engine, Connection],
+    test_case_id: int,
+    before: Optional[Tuple[int, int]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    A test case's whole history, without paging: live results newest run
+    first, read through a streaming cursor, followed by the archived ones.
+    Reads in sessions of its own, so it can outlive the request's session.
+    """
+    for row in iter_rows(bind, _history_query(test_case_id, before)):
+        yield {**row, "archived": False}
+    with Session(bind=bind) as session:
+        archived = load_archived_case_results(session, test_case_id, before=before, limit=None)
+        yield from _archived_entries(session, archived)
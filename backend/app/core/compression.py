@@ -0,0 +1,216 @@
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Bodies smaller than this are sent as they are; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Compression levels, overridable from the environment
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# Media types that are compressed already, or do not shrink
+INCOMPRESSIBLE_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/zstd",
+    "application/x-7z-compressed",
+    "application/vnd.openxmlformats-officedocument.",
+    "application/vnd.apache.parquet",
+)
+
+
+class Compressor(ABC):
+    """Incremental compressor for one response body"""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it, so a streaming client can decode it right away"""
+
+    @abstractmethod
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress the last chunk and end the stream"""
+
+
+class GzipCompressor(Compressor):
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(Compressor):
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdCompressor(Compressor):
+    def __init__(self, level: int = ZSTD_LEVEL):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# Supported encodings, in order of preference when the client weighs them equally
+COMPRESSORS: Dict[str, Callable[[], Compressor]] = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+COMPRESSORS["gzip"] = GzipCompressor
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: List[str]) -> Optional[str]:
+    """Best content coding for an Accept-Encoding header, or None to send the body as is"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return not content_type or not content_type.lower().startswith(INCOMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies with the best encoding the client accepts
+    (zstd, brotli or gzip).
+
+    Complete bodies below `minimum_size` and media types that are already
+    compressed are passed through. Streaming responses are compressed chunk
+    by chunk and flushed after each one, so NDJSON streams and exports keep
+    arriving incrementally.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), list(COMPRESSORS))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    """Compresses one response, deciding on its first body chunk"""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] < 200
+                or message["status"] in (204, 304)
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held back until the first chunk shows whether the body is worth compressing
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+
+            self.compressor = COMPRESSORS[self.encoding]()
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the identity representation
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+                body = self.compressor.compress(body)
+            else:
+                body = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(body))
+            await self.send(start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = self.compressor.compress(body) if more_body else self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,110 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+from sqlalchemy import and_, event, exists, func, or_, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+
+from app.models.base import TestCase
+
+# Columns that make up a test case's content. The identifier (case_id), the
+# suite, the version stamps and the database id are left out, so the same
+# case in two suite versions hashes the same unless its content changed.
+CONTENT_HASH_FIELDS = (
+    "title",
+    "description",
+    "steps",
+    "precondition",
+    "area",
+    "automatability",
+    "author",
+    "material",
+    "is_challenged",
+    "challenge_issue_url",
+    "applies_to",
+)
+
+
+def compute_content_hash(values: Mapping[str, Any]) -> str:
+    """SHA-256 over the content columns, in a fixed order"""
+    content = json.dumps(
+        [values.get(field) for field in CONTENT_HASH_FIELDS],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@event.listens_for(TestCase, "before_insert")
+@event.listens_for(TestCase, "before_update")
+def _set_content_hash(mapper, connection, target: TestCase):
+    """Keep the hash of test cases written through the ORM in step with their content"""
+    target.content_hash = compute_content_hash({field: getattr(target, field) for field in CONTENT_HASH_FIELDS})
+
+
+def update_content_hashes(
+    session: Session,
+    created: Iterable[Dict[str, Any]],
+    updated: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]
+):
+    """
+    Hash test cases written with Core statements, which bypass the ORM
+    listeners: the "created" rows and "updated" (previous values, changes)
+    pairs returned by bulk_write, with CONTENT_HASH_FIELDS as snapshot columns
+    """
+    rows = [{"id": row["id"], "content_hash": compute_content_hash(row)} for row in created]
+    rows += [
+        {"id": previous["id"], "content_hash": compute_content_hash({**previous, **values})}
+        for previous, values in updated
+    ]
+    if rows:
+        session.execute(update(TestCase), rows)
+
+
+def diff_test_suites(session: Session, base_suite_id: int, suite_id: int) -> Dict[str, Any]:
+    """
+    Compare the test cases of two suites by case_id and content hash: cases
+    only in `suite_id` are added, cases only in `base_suite_id` removed, and
+    cases in both with different hashes modified.
+
+    The comparison runs in the database as two passes over the
+    (test_suite_id, case_id, content_hash) index, so only the differences
+    are sent back.
+    """
+    base = aliased(TestCase)
+    target = aliased(TestCase)
+
+    added: List[Dict[str, Any]] = []
+    modified: List[Dict[str, Any]] = []
+    for case_id, test_case_id, base_id in session.exec(
+        select(target.case_id, target.id, base.id)
+        .outerjoin(base, and_(base.test_suite_id == base_suite_id, base.case_id == target.case_id))
+        .where(target.test_suite_id == suite_id)
+        .where(or_(base.id.is_(None), base.content_hash.is_distinct_from(target.content_hash)))
+        .order_by(target.case_id)
+    ).all():
+        if base_id is None:
+            added.append({"case_id": case_id, "id": test_case_id})
+        else:
+            modified.append({"case_id": case_id, "base_id": base_id, "id": test_case_id})
+
+    removed = [
+        {"case_id": case_id, "id": test_case_id}
+        for case_id, test_case_id in session.exec(
+            select(base.case_id, base.id)
+            .where(base.test_suite_id == base_suite_id)
+            .where(~exists().where(target.test_suite_id == suite_id, target.case_id == base.case_id))
+            .order_by(base.case_id)
+        ).all()
+    ]
+    total = session.exec(select(func.count()).select_from(TestCase).where(TestCase.test_suite_id == suite_id)).one()
+
+    return {
+        "base_suite_id": base_suite_id,
+        "suite_id": suite_id,
+        "added": added,
+        "removed": removed,
+        "modified": modified,
+        "unchanged_count": total - len(added) - len(modified)
+    }
@@ -0,0 +1,224 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, distinct, func, insert
+from sqlmodel import Session, select
+
+from app.core.analytics import (
+    ANALYTICS_BATCH_SIZE, claim_stale_cases, get_stale_cases, refresh_flaky_state, stale_cases, track_stale_cases
+)
+from app.db.events import mark_tables_changed
+from app.models.base import (
+    AnalyticsStaleCase, FlakyCaseState, Requirement, RequirementSpecification, RequirementTestCase,
+    SpecificationCoverage
+)
+
+COVERAGE_JOB = "specification_coverage"
+
+# The flaky test state flags the DUT/test case pairs it updates for the rollups
+track_stale_cases(COVERAGE_JOB)
+
+# Serializes refreshes within a process; claiming the flags does it across processes
+_refresh_lock = threading.Lock()
+
+# Latest verdict of a test case on a DUT: the last pass or fail in its flaky test history.
+# Other results (skipped, blocked, ...) do not hide an earlier pass.
+_verdicts = func.rtrim(FlakyCaseState.history, "O")
+_latest_code = func.substr(_verdicts, func.length(_verdicts), 1)
+
+
+def coverage_percent(passing_count: int, requirement_count: int) -> float:
+    return round(100.0 * passing_count / requirement_count, 2) if requirement_count else 0.0
+
+
+def rebuild_coverage(
+    session: Session,
+    specification_ids: Iterable[int],
+    dut_ids: Optional[Iterable[int]] = None
+):
+    """
+    Recompute the rollups of the given specifications, on the given DUTs
+    or on all of them, in the caller's transaction (not committed here).
+
+    A requirement is tested on a DUT when a linked test case has a result
+    there, and passing when the latest pass or fail of any linked test case
+    is a pass. Both counts come from one grouped query over the per DUT and test
+    case state kept by the flaky test analytics.
+    """
+    specification_ids = list(set(specification_ids))
+    dut_ids = list(set(dut_ids)) if dut_ids is not None else None
+    if not specification_ids or dut_ids == []:
+        return
+
+    requirement_counts = dict(session.exec(
+        select(RequirementSpecification.specification_id, func.count(RequirementSpecification.requirement_id))
+        .where(RequirementSpecification.specification_id.in_(specification_ids))
+        .group_by(RequirementSpecification.specification_id)
+    ).all())
+
+    query = (
+        select(
+            RequirementSpecification.specification_id,
+            FlakyCaseState.dut_id,
+            func.count(distinct(RequirementSpecification.requirement_id)),
+            func.count(distinct(case((_latest_code == "P", RequirementSpecification.requirement_id))))
+        )
+        .join(RequirementTestCase, RequirementTestCase.requirement_id == RequirementSpecification.requirement_id)
+        .join(FlakyCaseState, FlakyCaseState.test_case_id == RequirementTestCase.test_case_id)
+        .where(RequirementSpecification.specification_id.in_(specification_ids))
+        .group_by(RequirementSpecification.specification_id, FlakyCaseState.dut_id)
+    )
+    stale = delete(SpecificationCoverage).where(SpecificationCoverage.specification_id.in_(specification_ids))
+    if dut_ids is not None:
+        query = query.where(FlakyCaseState.dut_id.in_(dut_ids))
+        stale = stale.where(SpecificationCoverage.dut_id.in_(dut_ids))
+
+    rows = [
+        {
+            "specification_id": specification_id,
+            "dut_id": dut_id,
+            "requirement_count": requirement_counts.get(specification_id, 0),
+            "tested_count": tested,
+            "passing_count": passing
+        }
+        for specification_id, dut_id, tested, passing in session.exec(query).all()
+    ]
+
+    session.execute(stale)
+    if rows:
+        session.execute(insert(SpecificationCoverage), rows)
+    mark_tables_changed(session, SpecificationCoverage.__tablename__)
+
+
+def specifications_of_requirements(session: Session, requirement_ids: Iterable[int]) -> List[int]:
+    requirement_ids = list(set(requirement_ids))
+    if not requirement_ids:
+        return []
+    return session.exec(
+        select(RequirementSpecification.specification_id)
+        .where(RequirementSpecification.requirement_id.in_(requirement_ids))
+        .distinct()
+    ).all()
+
+
+def specifications_of_test_cases(session: Session, test_case_ids: Iterable[int]) -> List[int]:
+    test_case_ids = list(set(test_case_ids))
+    if not test_case_ids:
+        return []
+    return session.exec(
+        select(RequirementSpecification.specification_id)
+        .join(RequirementTestCase, RequirementTestCase.requirement_id == RequirementSpecification.requirement_id)
+        .where(RequirementTestCase.test_case_id.in_(test_case_ids))
+        .distinct()
+    ).all()
+
+
+def refresh_coverage(session: Session) -> int:
+    """
+    Bring the rollups up to date with the flaky test state they are built
+    from. Returns the number of DUT/test case pairs recomputed.
+
+    Only the specifications linked to the DUT/test case pairs whose state
+    changed since the last refresh are recomputed, and only on the DUTs
+    concerned. Like the flaky test state, refreshes claim the flags they
+    work on, so only one writer at a time recomputes rollups.
+    """
+    refresh_flaky_state(session)
+    refreshed = 0
+
+    with _refresh_lock:
+        while True:
+            stale = get_stale_cases(session, COVERAGE_JOB, limit=ANALYTICS_BATCH_SIZE)
+            if not stale:
+                break
+            if not claim_stale_cases(session, COVERAGE_JOB, stale):
+                session.rollback()
+                break
+
+            specification_ids = specifications_of_test_cases(session, {test_case_id for _, test_case_id, _ in stale})
+            rebuild_coverage(session, specification_ids, {dut_id for dut_id, _, _ in stale})
+            mark_tables_changed(session, AnalyticsStaleCase.__tablename__)
+            session.commit()
+            refreshed += len(stale)
+
+    return refreshed
+
+
+def reset_coverage(session: Session):
+    """Drop all rollups and pending flags, before a full rebuild (committed by the caller)"""
+    session.execute(delete(SpecificationCoverage))
+    session.execute(delete(stale_cases).where(stale_cases.c.job == COVERAGE_JOB))
+    mark_tables_changed(session, SpecificationCoverage.__tablename__, AnalyticsStaleCase.__tablename__)
+
+
+def get_coverage(
+    session: Session,
+    specification_id: Optional[int] = None,
+    dut_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Refresh, then read the rollups of a specification, a DUT or all of them"""
+    refresh_coverage(session)
+
+    query = select(SpecificationCoverage).order_by(SpecificationCoverage.specification_id, SpecificationCoverage.dut_id)
+    if specification_id is not None:
+        query = query.where(SpecificationCoverage.specification_id == specification_id)
+    if dut_id is not None:
+        query = query.where(SpecificationCoverage.dut_id == dut_id)
+
+    return [
+        {
+            "specification_id": rollup.specification_id,
+            "dut_id": rollup.dut_id,
+            "requirement_count": rollup.requirement_count,
+            "tested_count": rollup.tested_count,
+            "passing_count": rollup.passing_count,
+            "coverage": coverage_percent(rollup.passing_count, rollup.requirement_count)
+        }
+        for rollup in session.exec(query).all()
+    ]
+
+
+def get_requirement_coverage(session: Session, specification_id: int, dut_id: int) -> List[Dict[str, Any]]:
+    """Per requirement breakdown of a specification's rollup on one DUT"""
+    refresh_flaky_state(session)
+
+    status = dict(
+        (requirement_id, (tested, passing))
+        for requirement_id, tested, passing in session.exec(
+            select(
+                RequirementTestCase.requirement_id,
+                func.count(FlakyCaseState.test_case_id),
+                func.sum(case((_latest_code == "P", 1), else_=0))
+            )
+            .join(RequirementSpecification, RequirementSpecification.requirement_id == RequirementTestCase.requirement_id)
+            .join(FlakyCaseState, FlakyCaseState.test_case_id == RequirementTestCase.test_case_id)
+            .where(RequirementSpecification.specification_id == specification_id, FlakyCaseState.dut_id == dut_id)
+            .group_by(RequirementTestCase.requirement_id)
+        ).all()
+    )
+    linked = dict(session.exec(
+        select(RequirementTestCase.requirement_id, func.count(RequirementTestCase.test_case_id))
+        .join(RequirementSpecification, RequirementSpecification.requirement_id == RequirementTestCase.requirement_id)
+        .where(RequirementSpecification.specification_id == specification_id)
+        .group_by(RequirementTestCase.requirement_id)
+    ).all())
+
+    requirements = session.exec(
+        select(Requirement)
+        .join(RequirementSpecification, RequirementSpecification.requirement_id == Requirement.id)
+        .where(RequirementSpecification.specification_id == specification_id)
+        .order_by(Requirement.id)
+    ).all()
+    breakdown = []
+    for requirement in requirements:
+        tested, passing = status.get(requirement.id, (0, 0))
+        breakdown.append({
+            "requirement_id": requirement.id,
+            "name": requirement.name,
+            "field": requirement.field,
+            "test_case_count": linked.get(requirement.id, 0),
+            "tested_test_cases": tested,
+            "passing_test_cases": passing,
+            "passing": passing > 0
+        })
+    return breakdown
@@ -0,0 +1,18 @@
+import hashlib
+from typing import Dict, Optional
+
+
+def make_etag(versions: Dict[str, int], *parts: str) -> str:
+    """Strong ETag for a response that depends on the given table versions and request parts"""
+    key = "|".join([*parts, *(f"{table}={version}" for table, version in sorted(versions.items()))])
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates
+    )
@@ -0,0 +1,156 @@
+import csv
+import io
+import os
+import tempfile
+from typing import Any, Iterable, Iterator, List, Mapping, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import select
+
+from app.core.streaming import STREAM_BATCH_SIZE, iter_rows
+from app.models.base import DUT, TestCase, TestCaseResult, TestOperator, TestRun
+
+# Bytes read from the finished XLSX file per chunk sent to the client
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(1024 * 1024)))
+
+# Media type and file extension per export format
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+
+# Exported columns, in order, with their Parquet types
+EXPORT_SCHEMA = pa.schema([
+    pa.field("test_run_id", pa.int64()),
+    pa.field("test_run_name", pa.string()),
+    pa.field("run_date", pa.string()),
+    pa.field("status", pa.string()),
+    pa.field("dut_name", pa.string()),
+    pa.field("operator_name", pa.string()),
+    pa.field("result_id", pa.int64()),
+    pa.field("test_case_id", pa.int64()),
+    pa.field("case_id", pa.string()),
+    pa.field("test_case_title", pa.string()),
+    pa.field("result", pa.string()),
+    pa.field("comment", pa.string()),
+])
+EXPORT_COLUMNS = EXPORT_SCHEMA.names
+
+
+def export_query(run_ids: List[int]):
+    """One row per result of the given runs, in run order, with names resolved by joins"""
+    return (
+        select(
+            TestRun.id.label("test_run_id"),
+            TestRun.name.label("test_run_name"),
+            TestRun.run_date,
+            TestRun.status,
+            DUT.product_name.label("dut_name"),
+            TestOperator.name.label("operator_name"),
+            TestCaseResult.id.label("result_id"),
+            TestCaseResult.test_case_id,
+            TestCase.case_id,
+            TestCase.title.label("test_case_title"),
+            TestCaseResult.result,
+            TestCaseResult.comment
+        )
+        .join(TestRun, TestRun.id == TestCaseResult.test_run_id)
+        .outerjoin(TestCase, TestCase.id == TestCaseResult.test_case_id)
+        .outerjoin(DUT, DUT.id == TestRun.dut_id)
+        .outerjoin(TestOperator, TestOperator.id == TestRun.operator_id)
+        .where(TestCaseResult.test_run_id.in_(run_ids))
+        .order_by(TestCaseResult.test_run_id, TestCaseResult.id)
+    )
+
+
+def _batches(rows: Iterable[Mapping[str, Any]], size: int) -> Iterator[List[Mapping[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_csv(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """CSV with a header line, written a batch of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batches(rows, STREAM_BATCH_SIZE):
+        writer.writerows([[row[name] for name in EXPORT_COLUMNS] for row in batch])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_xlsx(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """
+    XLSX workbook with one sheet. The write-only workbook spools rows to a
+    temporary file instead of keeping cells in memory; the file is sent
+    once complete, since the zip directory comes last.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Results")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append([row[name] for name in EXPORT_COLUMNS])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class _ChunkSink:
+    """Writable file object collecting what Parquet writes until it is drained"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet(rows: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """Parquet file with one row group per batch, each sent as soon as it is written"""
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), EXPORT_SCHEMA)
+    for batch in _batches(rows, STREAM_BATCH_SIZE):
+        writer.write_batch(pa.RecordBatch.from_pylist([dict(row) for row in batch], schema=EXPORT_SCHEMA))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {"csv": export_csv, "xlsx": export_xlsx, "parquet": export_parquet}
+
+
+def export_test_runs(bind: Union[Engine, Connection], run_ids: List[int], export_format: str) -> Iterator[bytes]:
+    """Encoded export of the results of the given runs, streamed from a database cursor"""
+    return EXPORTERS[export_format](iter_rows(bind, export_query(run_ids)))
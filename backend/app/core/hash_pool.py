@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class HashPoolFull(Exception):
+    """Raised when a job is submitted while the pool already holds its maximum"""
+
+
+class HashPool:
+    """
+    Bounded thread pool for password hashing, so bcrypt never runs on the
+    event loop.
+
+    At most `workers` hashes run at once (bcrypt releases the GIL, so they
+    run in parallel), and at most `max_pending` jobs are running or queued;
+    further submissions are rejected at once instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run function(*args) on the pool and wait for its result without blocking the loop"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashPoolFull()
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+
+        def job():
+            with self._lock:
+                self.running += 1
+            try:
+                return function(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        def release(future):
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+        # The slot is released when the job itself finishes (or is cancelled before
+        # it starts), not when the caller stops waiting: a cancelled request must
+        # not free a slot while its hash still occupies a worker
+        future = self._executor.submit(job)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,28 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Table
+
+
+def parse_fields(
+    fields: Optional[str],
+    table: Table,
+    required: Iterable[str] = ("id",),
+    deferred: Iterable[str] = ()
+) -> List[str]:
+    """
+    Columns to select for a `fields=a,b,c` parameter, in table order.
+
+    Without a parameter every column except the deferred (large) ones is
+    returned. Required columns are always included. Raises ValueError for
+    names that are not columns of the table.
+    """
+    columns = [column.name for column in table.columns]
+    if fields:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(columns)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        requested = set(columns) - set(deferred)
+    requested |= set(required)
+    return [name for name in columns if name in requested]
@@ -0,0 +1,29 @@
+import inspect
+from typing import Optional, Type
+
+import fastapi.routing
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def fastapi_dumps_json() -> bool:
+    """Whether FastAPI serializes response models straight to JSON bytes with Pydantic"""
+    return "dump_json" in inspect.signature(fastapi.routing.serialize_response).parameters
+
+
+def fast_response_class() -> Optional[Type[JSONResponse]]:
+    """
+    Default response class to use instead of FastAPI's, or None to keep it.
+
+    Newer FastAPI versions serialize response models in Pydantic's Rust core,
+    but only with the default response class, so it is kept there. Older
+    versions encode to Python objects and then call json.dumps; there orjson,
+    when installed, takes over the json.dumps step.
+    """
+    if fastapi_dumps_json() or orjson is None:
+        return None
+    return ORJSONResponse
@@ -0,0 +1,32 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func
+
+# Summary buckets used for run statistics
+PASS = "pass"
+FAIL = "fail"
+OTHER = "other"
+
+# Placeholder result of a test case in a run created from a template, until a verdict is written
+PENDING_RESULT = "Pending"
+
+
+def result_category(result: Optional[str]) -> str:
+    """Map a free-text result to its summary bucket: pass, fail or other"""
+    value = (result or "").lower()
+    if value == PASS:
+        return PASS
+    if value == FAIL:
+        return FAIL
+    return OTHER
+
+
+def result_category_case(column, values: Optional[Dict[str, Any]] = None):
+    """SQL expression equivalent of result_category, optionally mapping buckets to other values"""
+    values = values or {PASS: PASS, FAIL: FAIL, OTHER: OTHER}
+    lowered = func.lower(column)
+    return case(
+        (lowered == PASS, values[PASS]),
+        (lowered == FAIL, values[FAIL]),
+        else_=values[OTHER]
+    )
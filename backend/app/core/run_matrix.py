@@ -0,0 +1,125 @@
+from itertools import chain
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlmodel import Session, select
+
+from app.core.result_utils import PASS, FAIL, OTHER, result_category_case
+from app.models.base import TestCase, TestCaseResult, TestRun
+
+# Integer codes used in the matrix; 0 means the case has no result in that run
+MISSING_CODE = 0
+RESULT_CODES = {PASS: 1, FAIL: 2, OTHER: 3}
+CODE_NAMES = ["missing", PASS, FAIL, OTHER]
+
+
+def _last_present(present: np.ndarray) -> np.ndarray:
+    """Column index of the last True value in each row (only valid where one exists)"""
+    return present.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+
+
+def build_regression_matrix(session: Session, runs: List[TestRun]) -> Dict[str, Any]:
+    """
+    Build a test case x run result matrix for the given runs, in their order.
+
+    All results are read with one query and encoded into an int8 matrix, so
+    per-run totals, first failures and pass/fail transitions are computed
+    with array operations rather than per-case Python loops.
+    """
+    run_ids = [run.id for run in runs]
+    rows = session.connection().execute(
+        select(
+            TestCaseResult.test_run_id,
+            TestCaseResult.test_case_id,
+            result_category_case(TestCaseResult.result, RESULT_CODES)
+        )
+        .where(TestCaseResult.test_run_id.in_(run_ids))
+        .where(TestCaseResult.test_case_id.is_not(None))
+        .order_by(TestCaseResult.id)
+    ).fetchall()
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+    run_col, case_col, code_col = data[:, 0], data[:, 1], data[:, 2].astype(np.int8)
+    n_runs = len(run_ids)
+
+    # Column position of each result, following the requested run order
+    order = np.argsort(run_ids)
+    sorted_run_ids = np.asarray(run_ids, dtype=np.int64)[order]
+    run_idx = order[np.searchsorted(sorted_run_ids, run_col)]
+
+    # Row position of each result
+    case_ids, case_idx = np.unique(case_col, return_inverse=True)
+
+    # Later results for the same case and run overwrite earlier ones
+    matrix = np.zeros((len(case_ids), n_runs), dtype=np.int8)
+    matrix[case_idx, run_idx] = code_col
+
+    present = matrix != MISSING_CODE
+    fails = matrix == RESULT_CODES[FAIL]
+
+    # First run in which each case failed
+    has_fail = fails.any(axis=1)
+    first_fail = np.argmax(fails, axis=1)
+
+    # Most recent result compared to the one before it
+    has_result = present.any(axis=1)
+    last = _last_present(present)
+    columns = np.arange(n_runs)
+    earlier = present & (columns[None, :] < last[:, None])
+    has_previous = earlier.any(axis=1)
+    previous = _last_present(earlier)
+    rows_idx = np.arange(len(case_ids))
+    last_code = matrix[rows_idx, last]
+    previous_code = matrix[rows_idx, previous]
+    changed = has_result & has_previous
+    newly_passing = changed & (last_code == RESULT_CODES[PASS]) & (previous_code == RESULT_CODES[FAIL])
+    newly_failing = changed & (last_code == RESULT_CODES[FAIL]) & (previous_code == RESULT_CODES[PASS])
+
+    # Per-run totals
+    totals = present.sum(axis=0)
+    counts = {
+        category: (matrix == code).sum(axis=0)
+        for category, code in RESULT_CODES.items()
+    }
+
+    # Single batched lookup for test case identifiers and titles
+    case_id_list = case_ids.tolist()
+    titles = {
+        test_case_id: (case_id, title)
+        for test_case_id, case_id, title in session.exec(
+            select(TestCase.id, TestCase.case_id, TestCase.title)
+            .where(TestCase.id.in_(case_id_list))
+        ).all()
+    }
+
+    matrix_rows = matrix.tolist()
+    first_fail_list = first_fail.tolist()
+    has_fail_list = has_fail.tolist()
+    test_cases = []
+    for i, test_case_id in enumerate(case_id_list):
+        case_id, title = titles.get(test_case_id, (None, None))
+        test_cases.append({
+            "test_case_id": test_case_id,
+            "case_id": case_id,
+            "test_case_title": title,
+            "results": matrix_rows[i],
+            "first_failing_run_id": run_ids[first_fail_list[i]] if has_fail_list[i] else None
+        })
+
+    return {
+        "codes": CODE_NAMES,
+        "runs": [
+            {
+                "id": run.id,
+                "name": run.name,
+                "run_date": run.run_date,
+                "total": int(totals[i]),
+                "pass_count": int(counts[PASS][i]),
+                "fail_count": int(counts[FAIL][i]),
+                "other_count": int(counts[OTHER][i])
+            }
+            for i, run in enumerate(runs)
+        ],
+        "test_cases": test_cases,
+        "newly_passing": case_ids[newly_passing].tolist(),
+        "newly_failing": case_ids[newly_failing].tolist()
+    }
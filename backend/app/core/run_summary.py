@@ -0,0 +1,75 @@
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.core.result_utils import PASS, FAIL, OTHER, result_category, result_category_case
+from app.db.events import mark_tables_changed
+from app.models.base import TestRun, TestCaseResult
+
+# Counter column on TestRun for each result bucket
+SUMMARY_COLUMNS = {PASS: "pass_count", FAIL: "fail_count", OTHER: "other_count"}
+
+
+def record_results(
+    session: Session,
+    run_id: Optional[int],
+    results: Iterable[str],
+    sign: int = 1
+):
+    """
+    Add (or with sign=-1 remove) results to a run's summary counters.
+
+    The counters are bumped with a single relative UPDATE, so concurrent
+    writers to the same run do not lose increments.
+    """
+    if run_id is None:
+        return
+
+    counts = Counter(result_category(result) for result in results)
+    total = sum(counts.values())
+    if not total:
+        return
+
+    values = {"total_count": TestRun.total_count + sign * total}
+    for category, count in counts.items():
+        column = SUMMARY_COLUMNS[category]
+        values[column] = getattr(TestRun, column) + sign * count
+
+    session.execute(
+        update(TestRun)
+        .where(TestRun.id == run_id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    mark_tables_changed(session, TestRun.__tablename__, run_ids=[run_id])
+
+
+def record_result(session: Session, run_id: Optional[int], result: str, sign: int = 1):
+    """Add (or with sign=-1 remove) one result to a run's summary counters"""
+    record_results(session, run_id, [result], sign)
+
+
+def rebuild_run_summaries(session: Session, run_ids: Optional[Iterable[int]] = None) -> int:
+    """Recount summary counters from test_case_results, for all runs or the given ones"""
+    def count(category: Optional[str] = None):
+        query = select(func.count()).where(TestCaseResult.test_run_id == TestRun.id)
+        if category:
+            query = query.where(result_category_case(TestCaseResult.result) == category)
+        return query.scalar_subquery()
+
+    statement = update(TestRun).values(
+        total_count=count(),
+        pass_count=count(PASS),
+        fail_count=count(FAIL),
+        other_count=count(OTHER)
+    )
+    if run_ids is not None:
+        run_ids = list(run_ids)
+        statement = statement.where(TestRun.id.in_(run_ids))
+
+    result = session.execute(statement.execution_options(synchronize_session=False))
+    mark_tables_changed(session, TestRun.__tablename__, run_ids=run_ids)
+    session.commit()
+    return result.rowcount
@@ -0,0 +1,137 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel, Session
+
+# Test case columns covered by the full-text index, with their bm25 weights
+SEARCH_COLUMNS = {
+    "case_id": 10.0,
+    "title": 5.0,
+    "description": 1.0,
+    "steps": 1.0,
+    "precondition": 1.0,
+}
+
+FTS_TABLE = "test_cases_fts"
+
+_column_list = ", ".join(SEARCH_COLUMNS)
+_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+# SQLite: external-content FTS5 table kept in sync by triggers, so every
+# writer (endpoints, importers, restores) updates the index
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_column_list}, content='test_cases', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON test_cases BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_column_list}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON test_cases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_column_list}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_column_list} ON test_cases BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_column_list}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {FTS_TABLE}(rowid, {_column_list}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+# PostgreSQL: expression GIN index, maintained by the database itself
+POSTGRES_VECTOR = "to_tsvector('english', " + " || ' ' || ".join(
+    f"coalesce({column}, '')" for column in SEARCH_COLUMNS
+) + ")"
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_test_cases_search ON test_cases USING GIN ({POSTGRES_VECTOR})",
+]
+
+
+def ensure_search_index(connection: Connection):
+    """Create the full-text index for test cases if it does not exist yet"""
+    dialect = connection.dialect.name
+
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            # Index test cases that were created before the index existed
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    ensure_search_index(connection)
+
+
+def _fts5_query(query: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: all terms, last one as prefix"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_test_cases(
+    session: Session,
+    query: str,
+    test_suite_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Search test cases, best matches first, with a highlighted snippet"""
+    dialect = session.get_bind().dialect.name
+    params: Dict[str, Any] = {"skip": skip, "limit": limit, "test_suite_id": test_suite_id}
+    suite_filter = "AND c.test_suite_id = :test_suite_id" if test_suite_id is not None else ""
+
+    if dialect == "sqlite":
+        params["query"] = _fts5_query(query)
+        if not params["query"]:
+            return []
+        weights = ", ".join(str(weight) for weight in SEARCH_COLUMNS.values())
+        statement = f"""
+            SELECT c.id, c.case_id, c.title, c.test_suite_id,
+                   -bm25({FTS_TABLE}, {weights}) AS rank,
+                   snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 16) AS snippet
+            FROM {FTS_TABLE} JOIN test_cases c ON c.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :query {suite_filter}
+            ORDER BY bm25({FTS_TABLE}, {weights})
+            LIMIT :limit OFFSET :skip
+        """
+    elif dialect == "postgresql":
+        params["query"] = query
+        statement = f"""
+            SELECT c.id, c.case_id, c.title, c.test_suite_id,
+                   ts_rank({POSTGRES_VECTOR}, q) AS rank,
+                   ts_headline('english',
+                               coalesce(c.title, '') || ' ' || coalesce(c.description, '') || ' ' ||
+                               coalesce(c.steps, '') || ' ' || coalesce(c.precondition, ''),
+                               q, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=16') AS snippet
+            FROM test_cases c, websearch_to_tsquery('english', :query) q
+            WHERE {POSTGRES_VECTOR} @@ q {suite_filter}
+            ORDER BY rank DESC
+            LIMIT :limit OFFSET :skip
+        """
+    else:
+        # No full-text support: unranked substring match on title
+        params["query"] = f"%{query}%"
+        statement = f"""
+            SELECT c.id, c.case_id, c.title, c.test_suite_id, 0.0 AS rank, NULL AS snippet
+            FROM test_cases c
+            WHERE (c.title LIKE :query OR c.case_id LIKE :query) {suite_filter}
+            ORDER BY c.id
+            LIMIT :limit OFFSET :skip
+        """
+
+    rows = session.execute(text(statement), params).mappings().all()
+    return [dict(row) for row in rows]
@@ -0,0 +1,96 @@
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+from fastapi import Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Select
+from sqlmodel import Session
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched from the database cursor, and written to the client, per chunk
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+
+def accepts_ndjson(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for newline-delimited JSON"""
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+def wants_ndjson(accept: Optional[str] = Header(None)) -> bool:
+    """Dependency telling an endpoint to stream its rows as NDJSON"""
+    return accepts_ndjson(accept)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def ndjson_line(row: Mapping[str, Any]) -> bytes:
+    """One NDJSON line for a row"""
+    if orjson is not None:
+        return orjson.dumps(dict(row), option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(dict(row), default=_default, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_rows(
+    bind: Union[Engine, Connection],
+    statement: Select,
+    batch_size: Optional[int] = None
+) -> Iterator[Mapping[str, Any]]:
+    """
+    Rows of a SELECT as mappings, fetched batch by batch through a
+    server-side cursor where the database supports one.
+
+    The rows are read in a session of their own, so a response can keep
+    streaming after the request's session is closed.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    with Session(bind=bind) as session:
+        result = session.execute(statement.execution_options(yield_per=batch_size))
+        for partition in result.mappings().partitions():
+            yield from partition
+
+
+def stream_ndjson(
+    rows: Iterable[Mapping[str, Any]],
+    transform: Optional[Callable[[Mapping[str, Any]], Dict[str, Any]]] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[bytes]:
+    """Encode rows as NDJSON, writing a chunk every batch_size rows"""
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    chunk = []
+    for row in rows:
+        chunk.append(ndjson_line(transform(row) if transform else row))
+        if len(chunk) >= batch_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def ndjson_response(
+    rows: Iterable[Mapping[str, Any]],
+    transform: Optional[Callable[[Mapping[str, Any]], Dict[str, Any]]] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> StreamingResponse:
+    """
+    Streaming NDJSON response, one line per row. Pass the headers of the
+    endpoint's injected Response (e.g. an ETag) as `headers`, since FastAPI
+    does not copy them onto responses returned directly.
+    """
+    return StreamingResponse(
+        stream_ndjson(rows, transform),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={**{name.lower(): value for name, value in (headers or {}).items()}, "vary": "Accept"}
+    )
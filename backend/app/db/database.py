@@ -12,9 +12,16 @@ connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite")
 engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=True)
 
 
+# Register the ORM listeners that keep table_versions up to date,
+import app.db.events  # noqa: E402,F401
+# and test case content hashes
+import app.core.content_hash  # noqa: E402,F401
+
+
 def create_db_and_tables():
-    """Create database tables from SQLModel models"""
-    SQLModel.metadata.create_all(engine)
+    """Create or migrate database tables, skipping all work when the schema is current"""
+    from app.db.migrations import run_migrations
+    run_migrations(engine)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -26,12 +33,13 @@ def get_session() -> Generator[Session, None, None]:
 def export_db_to_json(output_file: str) -> bool:
     """Export all database tables to a JSON file"""
     from sqlmodel import select
+    import base64
     import json
     from app.models.base import (
         TestSuite, TestRunTemplate, TestCase, Company, TestOperator, 
         TestCaseResult, TestRun, Specification, Requirement,
         Capability, DUT, TestRunTemplateTestCase, DUTCapability,
-        RequirementSpecification
+        RequirementSpecification, RequirementTestCase, ApiKey, ArchivedTestRun, ArchivedTestCaseRun, ArchivedBlob, Blob
     )
     
     try:
@@ -52,6 +60,15 @@ def export_db_to_json(output_file: str) -> bool:
                 "test_run_template_test_cases": [row.dict() for row in session.exec(select(TestRunTemplateTestCase)).all()],
                 "dut_capabilities": [row.dict() for row in session.exec(select(DUTCapability)).all()],
                 "requirement_specifications": [row.dict() for row in session.exec(select(RequirementSpecification)).all()],
+                "requirement_test_cases": [row.dict() for row in session.exec(select(RequirementTestCase)).all()],
+                "api_keys": [row.dict() for row in session.exec(select(ApiKey)).all()],
+                "archived_test_runs": [row.dict() for row in session.exec(select(ArchivedTestRun)).all()],
+                "archived_test_case_runs": [row.dict() for row in session.exec(select(ArchivedTestCaseRun)).all()],
+                "archived_blobs": [row.dict() for row in session.exec(select(ArchivedBlob)).all()],
+                "blobs": [
+                    {**row.dict(), "data": base64.b64encode(row.data).decode("ascii")}
+                    for row in session.exec(select(Blob)).all()
+                ],
             }
             
             # Write to JSON file
@@ -67,12 +84,17 @@ def export_db_to_json(output_file: str) -> bool:
 def import_db_from_json(input_file: str) -> bool:
     """Import database tables from a JSON file"""
     from sqlmodel import select
+    import base64
     import json
+    from sqlalchemy import delete
+    from app.core.analytics import reset_flaky_state
+    from app.core.coverage import reset_coverage
+    from app.db.events import mark_tables_changed
     from app.models.base import (
         TestSuite, TestRunTemplate, TestCase, Company, TestOperator, 
         TestCaseResult, TestRun, Specification, Requirement,
         Capability, DUT, TestRunTemplateTestCase, DUTCapability,
-        RequirementSpecification
+        RequirementSpecification, RequirementTestCase, ApiKey, ArchivedTestRun, ArchivedTestCaseRun, ArchivedBlob, Blob
     )
     
     try:
@@ -83,11 +105,13 @@ def import_db_from_json(input_file: str) -> bool:
         with Session(engine) as session:
             # Clear existing data (optional)
             for model in [
-                RequirementSpecification, DUTCapability, TestRunTemplateTestCase,
-                TestCaseResult, TestRun, TestCase, TestRunTemplate, TestSuite,
-                TestOperator, Company, Requirement, Specification, DUT, Capability
+                RequirementSpecification, RequirementTestCase, DUTCapability, TestRunTemplateTestCase,
+                TestCaseResult, TestRun, TestCase, TestRunTemplate, TestSuite, ApiKey,
+                TestOperator, Company, Requirement, Specification, DUT, Capability,
+                ArchivedTestRun, ArchivedTestCaseRun, ArchivedBlob, Blob
             ]:
-                session.exec(f"DELETE FROM {model.__tablename__}")
+                session.execute(delete(model))
+            mark_tables_changed(session, *SQLModel.metadata.tables)
             
             # Import data for each table
             for test_suite in data.get("test_suites", []):
@@ -132,8 +156,30 @@ def import_db_from_json(input_file: str) -> bool:
             for req_spec in data.get("requirement_specifications", []):
                 session.add(RequirementSpecification(**req_spec))
             
+            for req_case in data.get("requirement_test_cases", []):
+                session.add(RequirementTestCase(**req_case))
+            
+            for api_key in data.get("api_keys", []):
+                session.add(ApiKey(**api_key))
+            
+            for archived_run in data.get("archived_test_runs", []):
+                session.add(ArchivedTestRun(**archived_run))
+            
+            for archived_case_run in data.get("archived_test_case_runs", []):
+                session.add(ArchivedTestCaseRun(**archived_case_run))
+            
+            for archived_blob in data.get("archived_blobs", []):
+                session.add(ArchivedBlob(**archived_blob))
+            
+            for blob in data.get("blobs", []):
+                session.add(Blob(**{**blob, "data": base64.b64decode(blob["data"])}))
+            
             session.commit()
             
+            # Flaky test state and coverage rollups are derived: rebuild them from the restored results
+            reset_coverage(session)
+            reset_flaky_state(session)
+            
             return True
     except Exception as e:
         print(f"Error importing database from JSON: {e}")
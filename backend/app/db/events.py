@@ -0,0 +1,152 @@
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from app.models.base import TableVersion, TestCaseResult, TestRun
+
+table_versions = TableVersion.__table__
+
+# Besides the table-wide counters, each test run has one of its own,
+# "test_runs/<id>", bumped by writes to the run or its results. A run's
+# detail depends on that counter instead of on every write to test_runs and
+# test_case_results. Writes that do not say which runs they touched bump
+# ALL_TEST_RUNS, which every run's detail depends on as well.
+RUN_TABLES = {TestRun.__tablename__, TestCaseResult.__tablename__}
+ALL_TEST_RUNS = "test_runs/*"
+
+# Called with the set of changed tables after each commit (e.g. cache invalidation)
+_commit_callbacks: List[Callable[[set], None]] = []
+
+
+def on_tables_committed(callback: Callable[[set], None]):
+    """Register a callback that receives the tables each committed transaction changed"""
+    _commit_callbacks.append(callback)
+
+
+def _record_changed(session: Session, tables: Iterable[str]):
+    """
+    Note tables written in the session's transaction. Their counters are
+    bumped once, just before commit (see _bump_changed_tables), so the
+    counter rows are locked for the commit only, not from the first write.
+    """
+    tables = set(tables)
+    session.info.setdefault("changed_tables", set()).update(tables)
+    session.info.setdefault("unbumped_tables", set()).update(tables)
+
+
+def bump_table_versions(connection: Connection, tables: Iterable[str]):
+    """Increment the change counter of each table, creating counters on first use"""
+    tables = sorted(set(tables) - {table_versions.name})
+    if not tables:
+        return
+
+    dialect = connection.dialect.name
+    for table in tables:
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            statement = insert(table_versions).values(table_name=table, version=1)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table_versions.c.table_name],
+                set_={"version": table_versions.c.version + 1}
+            ))
+        else:
+            result = connection.execute(
+                update(table_versions)
+                .where(table_versions.c.table_name == table)
+                .values(version=table_versions.c.version + 1)
+            )
+            if not result.rowcount:
+                connection.execute(table_versions.insert().values(table_name=table, version=1))
+
+
+def test_run_scope(run_id: int) -> str:
+    """Name of the change counter of a single test run"""
+    return f"test_runs/{run_id}"
+
+
+def _run_scopes(tables: Iterable[str], run_ids: Optional[Iterable[int]]) -> set:
+    if not RUN_TABLES & set(tables):
+        return set()
+    if run_ids is None:
+        return {ALL_TEST_RUNS}
+    return {test_run_scope(run_id) for run_id in run_ids if run_id is not None}
+
+
+def mark_tables_changed(session: Session, *tables: str, run_ids: Optional[Iterable[int]] = None):
+    """
+    Record changes made with Core statements (bulk UPDATE/DELETE, INSERT ...
+    SELECT), which the flush listener below does not see. Writes to
+    test_runs or test_case_results should pass the `run_ids` they touched;
+    without them every run counts as changed.
+    """
+    tables = set(tables) | _run_scopes(tables, run_ids)
+    _record_changed(session, tables)
+
+
+def get_table_versions(session: Session, tables: Iterable[str]) -> Dict[str, int]:
+    """Current change counter of each table; tables never changed are at 0"""
+    tables = list(tables)
+    versions = dict(session.exec(
+        select(TableVersion.table_name, TableVersion.version)
+        .where(TableVersion.table_name.in_(tables))
+    ).all())
+    return {table: versions.get(table, 0) for table in tables}
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    """Record every table an ORM flush wrote to, for the bump at commit"""
+    tables = {
+        instance.__table__.name
+        for instance in chain(session.new, session.deleted)
+        if hasattr(instance, "__table__")
+    }
+    dirty = [
+        instance for instance in session.dirty
+        if hasattr(instance, "__table__") and session.is_modified(instance)
+    ]
+    tables.update(instance.__table__.name for instance in dirty)
+
+    # Runs whose rows or results were written, including the run a result moved away from
+    for instance in chain(session.new, session.deleted, dirty):
+        if isinstance(instance, TestRun):
+            tables.add(test_run_scope(instance.id))
+        elif isinstance(instance, TestCaseResult):
+            tables.update(
+                test_run_scope(run_id)
+                for run_id in inspect(instance).attrs.test_run_id.history.sum()
+                if run_id is not None
+            )
+    _record_changed(session, tables)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_changed_tables(session):
+    """Bump the counter of every table the transaction changed, once, in the same transaction"""
+    # Pending ORM changes would otherwise be flushed after this hook
+    session.flush()
+    tables = session.info.pop("unbumped_tables", None)
+    if tables:
+        bump_table_versions(session.connection(), tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed_tables(session):
+    """Hand the tables changed by the committed transaction to the registered callbacks"""
+    tables = session.info.pop("changed_tables", None)
+    if tables:
+        for callback in _commit_callbacks:
+            callback(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session):
+    """Changes that were rolled back never happened"""
+    session.info.pop("changed_tables", None)
+    session.info.pop("unbumped_tables", None)
@@ -1,6 +1,179 @@
 import os
-import subprocess
+from datetime import datetime
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.util import CommandError
+from sqlalchemy import Column, Integer, String, Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, SQLModel
+
+import app.models.base  # noqa: F401 - registers all tables on SQLModel.metadata
+from app.models.base import TestCase, TestCaseResult
+from app.core.analytics import reset_flaky_state
+from app.core.archive import rebuild_archive_index
+from app.core.content_hash import CONTENT_HASH_FIELDS, compute_content_hash
+from app.core.run_summary import SUMMARY_COLUMNS, rebuild_run_summaries
+from app.core.search import ensure_search_index
+from app.db.events import ALL_TEST_RUNS, bump_table_versions
+
+# Rows hashed per statement when backfilling test case content hashes
+BACKFILL_BATCH_SIZE = 5000
+
+# Single-row table holding the schema version the database was migrated to
+schema_version_table = Table(
+    "schema_version",
+    SQLModel.metadata,
+    Column("version", Integer, nullable=False),
+    Column("applied_at", String, nullable=True),
+)
+
+
+def _add_column(connection: Connection, table: str, column: str, ddl_type: str):
+    """Add a column to an existing table unless it is already there"""
+    existing = {c["name"] for c in inspect(connection).get_columns(table)}
+    if column not in existing:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _add_result_blob_columns(connection: Connection):
+    for field in ("logs", "artifacts"):
+        _add_column(connection, "test_case_results", f"{field}_hash", "VARCHAR")
+        _add_column(connection, "test_case_results", f"{field}_size", "INTEGER")
+
+
+def _add_run_summary_counters(connection: Connection):
+    for column in ("total_count", *SUMMARY_COLUMNS.values()):
+        _add_column(connection, "test_runs", column, "INTEGER NOT NULL DEFAULT 0")
+    with Session(bind=connection) as session:
+        rebuild_run_summaries(session)
+
+
+def _index_result_history(connection: Connection):
+    for index in TestCaseResult.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _hash_test_cases(connection: Connection, missing_only: bool = False):
+    """Compute test case content hashes in batches; later writes are hashed by the ORM listeners and bulk endpoints"""
+    columns = [TestCase.__table__.c[field] for field in CONTENT_HASH_FIELDS]
+    last_id = 0
+    while True:
+        query = (
+            select(TestCase.__table__.c.id, *columns)
+            .where(TestCase.__table__.c.id > last_id)
+            .order_by(TestCase.__table__.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        )
+        if missing_only:
+            query = query.where(TestCase.__table__.c.content_hash.is_(None))
+        rows = connection.execute(query).mappings().all()
+        if not rows:
+            break
+        connection.execute(
+            update(TestCase.__table__)
+            .where(TestCase.__table__.c.id == bindparam("row_id"))
+            .values(content_hash=bindparam("hash")),
+            [{"row_id": row["id"], "hash": compute_content_hash(row)} for row in rows]
+        )
+        last_id = rows[-1]["id"]
+
+
+def _add_test_case_content_hash(connection: Connection):
+    _add_column(connection, "test_cases", "content_hash", "VARCHAR")
+    for index in TestCase.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    _hash_test_cases(connection, missing_only=True)
+
+
+def _rebuild_archive_index(connection: Connection):
+    with Session(bind=connection) as session:
+        rebuild_archive_index(session)
+        session.commit()
+
+
+def _rebuild_analytics(connection: Connection):
+    # Results missed by the old result id watermark are recovered by a full rebuild
+    with Session(bind=connection) as session:
+        reset_flaky_state(session)
+
+
+# Ordered schema migrations. New tables are created by create_all before the
+# steps run; steps handle what create_all cannot (new columns, indexes,
+# backfills) and must be idempotent, because databases created before
+# versioning existed run all of them once.
+MIGRATIONS: List[Tuple[int, str, Optional[Callable[[Connection], None]]]] = [
+    (1, "Initial schema", None),
+    (2, "Blob store references on test case results", _add_result_blob_columns),
+    (3, "Full-text search index for test cases", ensure_search_index),
+    (4, "Summary counters on test runs", _add_run_summary_counters),
+    (5, "Flaky test analytics state", None),
+    (6, "Index test case results by test case and run", _index_result_history),
+    (7, "Table change counters for ETags", None),
+    (8, "Requirement test case links and coverage rollups", None),
+    (9, "Content hashes for test cases", _add_test_case_content_hash),
+    (10, "API keys", None),
+    (11, "Stale DUT/test case markers for analytics", None),
+    (12, "Index archived runs by test case", _rebuild_archive_index),
+    (13, "Queue new results for analytics in the inserting transaction", _rebuild_analytics),
+    (14, "Index blobs referenced by archived results", _rebuild_archive_index),
+    (15, "Leave version stamps out of test case content hashes", _hash_test_cases),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection: Connection) -> Optional[int]:
+    """Return the stamped schema version, or None for an unversioned database"""
+    if not inspect(connection).has_table(schema_version_table.name):
+        return None
+    return connection.execute(
+        schema_version_table.select().with_only_columns(schema_version_table.c.version)
+    ).scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Bring the database schema up to date in-process.
+
+    On an up-to-date database this is a single version lookup. Creating
+    tables and running migration steps only happens when one is pending.
+    """
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        if version == SCHEMA_VERSION:
+            return version
+        if version is not None and version > SCHEMA_VERSION:
+            print(f"Database schema version {version} is newer than this application ({SCHEMA_VERSION})")
+            return version
+
+        print(f"Migrating database schema from version {version} to {SCHEMA_VERSION}")
+        SQLModel.metadata.create_all(connection)
+
+        for step_version, description, upgrade in MIGRATIONS:
+            if version is not None and step_version <= version:
+                continue
+            if upgrade:
+                print(f"Applying migration {step_version}: {description}")
+                upgrade(connection)
+
+        # Steps may have rewritten data: invalidate every ETag handed out before
+        bump_table_versions(connection, [*SQLModel.metadata.tables, ALL_TEST_RUNS])
+
+        connection.execute(schema_version_table.delete())
+        connection.execute(schema_version_table.insert().values(
+            version=SCHEMA_VERSION,
+            applied_at=datetime.utcnow().isoformat()
+        ))
+
+    return SCHEMA_VERSION
+
+
+def _alembic_config() -> Config:
+    """Alembic configuration for running commands in-process"""
+    return Config("alembic.ini")
 
 
 def initialize_migrations():
@@ -8,7 +181,7 @@ def initialize_migrations():
     # Create alembic directory structure
     alembic_dir = Path("alembic")
     if not alembic_dir.exists():
-        subprocess.run(["alembic", "init", "alembic"], check=True)
+        command.init(_alembic_config(), "alembic")
     
     # Update alembic.ini with correct database URL
     alembic_ini = Path("alembic.ini")
@@ -54,10 +227,10 @@ def initialize_migrations():
 def create_migration(message="database-update"):
     """Create a new database migration"""
     try:
-        subprocess.run(["alembic", "revision", "--autogenerate", "-m", message], check=True)
+        command.revision(_alembic_config(), message=message, autogenerate=True)
         print(f"Created new migration with message: {message}")
         return True
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print(f"Error creating migration: {e}")
         return False
 
@@ -65,10 +238,10 @@ def create_migration(message="database-update"):
 def upgrade_database(revision="head"):
     """Upgrade the database to a specific revision"""
     try:
-        subprocess.run(["alembic", "upgrade", revision], check=True)
+        command.upgrade(_alembic_config(), revision)
         print(f"Database upgraded to revision: {revision}")
         return True
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print(f"Error upgrading database: {e}")
         return False
 
@@ -76,9 +249,9 @@ def upgrade_database(revision="head"):
 def downgrade_database(revision="-1"):
     """Downgrade the database to a previous revision"""
     try:
-        subprocess.run(["alembic", "downgrade", revision], check=True)
+        command.downgrade(_alembic_config(), revision)
         print(f"Database downgraded to revision: {revision}")
         return True
-    except subprocess.CalledProcessError as e:
+    except CommandError as e:
         print(f"Error downgrading database: {e}")
         return False
\ No newline at end of file
@@ -7,13 +7,20 @@ import sys
 from app.api.api import api_router
 from app.db.database import create_db_and_tables, get_session
 from app.core.auth import get_password_hash
+from app.core.compression import CompressionMiddleware
+from app.core.responses import fast_response_class
 from app.models.base import TestOperator, Company
 
+# Use the fastest JSON serialization available for large responses
+response_class = fast_response_class()
+app_options = {"default_response_class": response_class} if response_class else {}
+
 # Create FastAPI app
 app = FastAPI(
     title="QA Database API",
     description="API for managing QA testing and results",
-    version="1.0.0"
+    version="1.0.0",
+    **app_options
 )
 
 # Configure CORS
@@ -25,6 +32,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses with gzip, brotli or zstd
+app.add_middleware(CompressionMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api")
 
@@ -1,4 +1,5 @@
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 
@@ -51,11 +52,18 @@ class TestCaseBase(SQLModel):
 
 class TestCase(TestCaseBase, table=True):
     __tablename__ = "test_cases"
+    __table_args__ = (
+        # Covers suite diffs, which compare case identifiers and content hashes only
+        Index("ix_test_cases_suite_case_hash", "test_suite_id", "case_id", "content_hash"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True, alias="TestCase_ID")
     test_suite_id: Optional[int] = Field(default=None, foreign_key="test_suites.id")
     test_suite: Optional[TestSuite] = Relationship(back_populates="test_cases")
     
+    # SHA-256 of the content columns, maintained on write, see app/core/content_hash.py
+    content_hash: Optional[str] = None
+    
     template_links: List["TestRunTemplateTestCase"] = Relationship(back_populates="test_case")
     test_case_results: List["TestCaseResult"] = Relationship(back_populates="test_case")
 
@@ -103,6 +111,21 @@ class TestOperator(TestOperatorBase, table=True):
     test_runs: List["TestRun"] = Relationship(back_populates="operator")
 
 
+class ApiKey(SQLModel, table=True):
+    __tablename__ = "api_keys"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    operator_id: int = Field(foreign_key="test_operators.id", index=True)
+    name: str
+    # Lookup part of the key, kept in clear; the full key is only stored as an HMAC, see app/core/api_keys.py
+    prefix: str = Field(index=True, unique=True)
+    key_hash: str
+    scope: str
+    created_at: str
+    expires_at: Optional[str] = None
+    revoked_at: Optional[str] = None
+
+
 class TestCaseResultBase(SQLModel):
     result: str
     logs: Optional[str] = None
@@ -112,12 +135,22 @@ class TestCaseResultBase(SQLModel):
 
 class TestCaseResult(TestCaseResultBase, table=True):
     __tablename__ = "test_case_results"
+    __table_args__ = (
+        # Per test case result history, newest run first
+        Index("ix_test_case_results_case_run", "test_case_id", "test_run_id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True, alias="TestCaseResult_ID")
     test_run_id: Optional[int] = Field(default=None, foreign_key="test_runs.id")
     test_run: Optional["TestRun"] = Relationship(back_populates="test_case_results")
     test_case_id: Optional[int] = Field(default=None, foreign_key="test_cases.id")
     test_case: Optional[TestCase] = Relationship(back_populates="test_case_results")
+    
+    # Large logs and artifacts live in the blob store; only the reference is kept here
+    logs_hash: Optional[str] = Field(default=None, foreign_key="blobs.hash")
+    logs_size: Optional[int] = None
+    artifacts_hash: Optional[str] = Field(default=None, foreign_key="blobs.hash")
+    artifacts_size: Optional[int] = None
 
 
 class TestRunBase(SQLModel):
@@ -135,6 +168,12 @@ class TestRun(TestRunBase, table=True):
     operator_id: Optional[int] = Field(default=None, foreign_key="test_operators.id")
     operator: Optional[TestOperator] = Relationship(back_populates="test_runs")
     test_case_results: List[TestCaseResult] = Relationship(back_populates="test_run")
+    
+    # Result totals maintained on write, see app/core/run_summary.py
+    total_count: int = Field(default=0)
+    pass_count: int = Field(default=0)
+    fail_count: int = Field(default=0)
+    other_count: int = Field(default=0)
 
 
 class SpecificationBase(SQLModel):
@@ -177,6 +216,24 @@ class RequirementSpecification(SQLModel, table=True):
     specification: "Specification" = Relationship(back_populates="requirements")
 
 
+class RequirementTestCase(SQLModel, table=True):
+    __tablename__ = "requirement_test_cases"
+
+    requirement_id: int = Field(foreign_key="requirements.id", primary_key=True)
+    test_case_id: int = Field(foreign_key="test_cases.id", primary_key=True, index=True)
+
+
+class SpecificationCoverage(SQLModel, table=True):
+    __tablename__ = "specification_coverage"
+
+    # Rollup of a specification's requirements on one DUT, see app/core/coverage.py
+    specification_id: int = Field(primary_key=True)
+    dut_id: int = Field(primary_key=True)
+    requirement_count: int = 0
+    tested_count: int = 0
+    passing_count: int = 0
+
+
 class CapabilityBase(SQLModel):
     name: str
     category: str
@@ -217,4 +274,69 @@ class DUTCapability(SQLModel, table=True):
     )
     
     dut: "DUT" = Relationship(back_populates="capabilities")
-    capability: "Capability" = Relationship(back_populates="duts")
\ No newline at end of file
+    capability: "Capability" = Relationship(back_populates="duts")
+
+class ArchivedTestRun(SQLModel, table=True):
+    __tablename__ = "archived_test_runs"
+
+    id: int = Field(primary_key=True)
+    run_date: Optional[str] = None
+    partition: str
+    result_count: int = 0
+    archived_at: str
+
+
+class ArchivedTestCaseRun(SQLModel, table=True):
+    __tablename__ = "archived_test_case_runs"
+
+    # Archived runs holding results of each test case; the primary key serves history lookups
+    test_case_id: int = Field(primary_key=True)
+    test_run_id: int = Field(primary_key=True)
+
+
+class ArchivedBlob(SQLModel, table=True):
+    __tablename__ = "archived_blobs"
+
+    # Blobs referenced by archived results, so deletes in the database do not drop them
+    hash: str = Field(primary_key=True)
+
+
+class Blob(SQLModel, table=True):
+    __tablename__ = "blobs"
+
+    hash: str = Field(primary_key=True)
+    size: int
+    codec: str
+    data: bytes
+
+
+class AnalyticsNewResult(SQLModel, table=True):
+    __tablename__ = "analytics_new_results"
+
+    # Results not yet folded into the analytics, queued by the inserting transaction
+    result_id: int = Field(primary_key=True)
+
+
+class FlakyCaseState(SQLModel, table=True):
+    __tablename__ = "flaky_case_states"
+
+    dut_id: int = Field(primary_key=True)
+    test_case_id: int = Field(primary_key=True)
+    last_run_id: Optional[int] = None
+    history: str = ""
+
+
+class AnalyticsStaleCase(SQLModel, table=True):
+    __tablename__ = "analytics_stale_cases"
+
+    job: str = Field(primary_key=True)
+    dut_id: int = Field(primary_key=True)
+    test_case_id: int = Field(primary_key=True)
+    stamp: int = 0
+
+
+class TableVersion(SQLModel, table=True):
+    __tablename__ = "table_versions"
+
+    table_name: str = Field(primary_key=True)
+    version: int = 0
@@ -53,6 +53,15 @@ class TestRunTemplateWithCases(TestRunTemplateRead):
     test_cases: List[Any] = []
 
 
+class TestRunTemplateInstantiate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    status: str = "Scheduled"
+    run_date: Optional[str] = None
+    dut_id: Optional[int] = None
+    operator_id: Optional[int] = None
+
+
 # TestCase schemas
 class TestCaseCreate(TestCaseBase):
     test_suite_id: int
@@ -79,6 +88,7 @@ class TestCaseUpdate(BaseModel):
 class TestCaseRead(TestCaseBase):
     id: int
     test_suite_id: Optional[int] = None
+    content_hash: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -88,6 +98,73 @@ class TestCaseWithSuite(TestCaseRead):
     test_suite: Optional[TestSuiteRead] = None
 
 
+# Test case list rows carry only the selected columns
+class TestCaseListItem(BaseModel):
+    id: int
+    case_id: Optional[str] = None
+    title: Optional[str] = None
+    version: Optional[int] = None
+    version_string: Optional[str] = None
+    description: Optional[str] = None
+    steps: Optional[str] = None
+    precondition: Optional[str] = None
+    area: Optional[str] = None
+    automatability: Optional[str] = None
+    author: Optional[str] = None
+    material: Optional[str] = None
+    is_challenged: Optional[bool] = None
+    challenge_issue_url: Optional[str] = None
+    applies_to: Optional[str] = None
+    test_suite_id: Optional[int] = None
+    content_hash: Optional[str] = None
+
+
+class TestCaseSearchResult(BaseModel):
+    id: int
+    case_id: str
+    title: str
+    test_suite_id: Optional[int] = None
+    rank: float
+    snippet: Optional[str] = None
+
+
+class TestCaseHistoryEntry(BaseModel):
+    id: int
+    result: str
+    comment: Optional[str] = None
+    test_run_id: int
+    test_run_name: Optional[str] = None
+    run_date: Optional[str] = None
+    status: Optional[str] = None
+    dut_id: Optional[int] = None
+    dut_name: Optional[str] = None
+    operator_id: Optional[int] = None
+    operator_name: Optional[str] = None
+    archived: bool = False
+
+
+class TestCaseHistory(BaseModel):
+    test_case_id: int
+    results: List[TestCaseHistoryEntry] = []
+    next_cursor: Optional[str] = None
+
+
+# Suite diff schemas
+class TestCaseDiffItem(BaseModel):
+    case_id: str
+    id: int
+    base_id: Optional[int] = None
+
+
+class TestSuiteDiff(BaseModel):
+    base_suite_id: int
+    suite_id: int
+    added: List[TestCaseDiffItem] = []
+    removed: List[TestCaseDiffItem] = []
+    modified: List[TestCaseDiffItem] = []
+    unchanged_count: int = 0
+
+
 # Company schemas
 class CompanyCreate(CompanyBase):
     pass
@@ -151,6 +228,10 @@ class TestCaseResultRead(TestCaseResultBase):
     id: int
     test_case_id: int
     test_run_id: Optional[int] = None
+    logs_hash: Optional[str] = None
+    logs_size: Optional[int] = None
+    artifacts_hash: Optional[str] = None
+    artifacts_size: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -178,6 +259,10 @@ class TestRunUpdate(BaseModel):
 class TestRunRead(TestRunBase):
     id: int
     operator_id: int
+    total_count: int = 0
+    pass_count: int = 0
+    fail_count: int = 0
+    other_count: int = 0
 
     class Config:
         orm_mode = True
@@ -186,6 +271,7 @@ class TestRunRead(TestRunBase):
 class TestRunWithResults(TestRunRead):
     test_case_results: List[TestCaseResultRead] = []
     operator: Optional[TestOperatorRead] = None
+    archived: bool = False
 
 
 # Specification schemas
@@ -228,6 +314,38 @@ class RequirementWithSpecifications(RequirementRead):
     specifications: List[SpecificationRead] = []
 
 
+class RequirementDetail(RequirementWithSpecifications):
+    test_case_ids: List[int] = []
+
+
+class SpecificationWithRequirements(SpecificationRead):
+    requirements: List[RequirementRead] = []
+
+
+# Coverage schemas
+class SpecificationCoverageRead(BaseModel):
+    specification_id: int
+    dut_id: int
+    requirement_count: int
+    tested_count: int
+    passing_count: int
+    coverage: float
+
+
+class RequirementCoverageRead(BaseModel):
+    requirement_id: int
+    name: Optional[str] = None
+    field: Optional[str] = None
+    test_case_count: int
+    tested_test_cases: int
+    passing_test_cases: int
+    passing: bool
+
+
+class SpecificationCoverageDetail(SpecificationCoverageRead):
+    requirements: List[RequirementCoverageRead] = []
+
+
 # Capability schemas
 class CapabilityCreate(CapabilityBase):
     pass
@@ -271,6 +389,13 @@ class DUTWithCapabilities(DUTRead):
     capabilities: List[CapabilityRead] = []
 
 
+class DUTCapabilityMatrix(BaseModel):
+    duts: List[DUTRead] = []
+    capabilities: List[CapabilityRead] = []
+    # For each DUT, positions in `capabilities` of the capabilities it has
+    capability_indexes: List[List[int]] = []
+
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
@@ -281,6 +406,31 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+# API key schemas
+class ApiKeyCreate(BaseModel):
+    name: str
+    expires_in_days: Optional[int] = None
+    operator_id: Optional[int] = None
+
+
+class ApiKeyRead(BaseModel):
+    id: int
+    operator_id: int
+    name: str
+    prefix: str
+    scope: str
+    created_at: str
+    expires_at: Optional[str] = None
+    revoked_at: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class ApiKeyCreated(ApiKeyRead):
+    key: str
+
+
 # File Upload schemas
 class FileUploadResponse(BaseModel):
     filename: str
@@ -292,4 +442,17 @@ class FileUploadResponse(BaseModel):
 class StandardResponse(BaseModel):
     success: bool
     message: str
-    data: Optional[Any] = None
\ No newline at end of file
+    data: Optional[Any] = None
+
+class BulkItemStatus(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    items: List[BulkItemStatus] = []
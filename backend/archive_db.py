@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from sqlmodel import Session
+from app.db.database import engine
+from app.core.archive import archive_old_runs, ARCHIVE_MAX_AGE_DAYS, ARCHIVE_BATCH_SIZE
+
+if __name__ == "__main__":
+    # Add current directory to Python path to find modules
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    
+    parser = argparse.ArgumentParser(description="Archive old test runs to Parquet files")
+    parser.add_argument(
+        "--older-than-days", "-d",
+        type=int,
+        default=ARCHIVE_MAX_AGE_DAYS,
+        help=f"Archive runs older than this many days (default: {ARCHIVE_MAX_AGE_DAYS})"
+    )
+    parser.add_argument(
+        "--batch-size", "-b",
+        type=int,
+        default=ARCHIVE_BATCH_SIZE,
+        help=f"Number of runs moved per transaction (default: {ARCHIVE_BATCH_SIZE})"
+    )
+    
+    args = parser.parse_args()
+    
+    print(f"Archiving test runs older than {args.older_than_days} days...")
+    with Session(engine) as session:
+        counts = archive_old_runs(
+            session,
+            older_than_days=args.older_than_days,
+            batch_size=args.batch_size
+        )
+    
+    print(f"Archived {counts['archived_runs']} test runs with {counts['archived_results']} results")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression: CPU time against bytes saved.
+
+Compresses a large test run detail, a compare_test_runs response and an
+NDJSON stream of the same results with every encoding the compression
+middleware supports, at several levels. Streams are compressed the way the
+middleware does it, flushing after every chunk.
+
+Usage: python benchmarks/compression.py [--results 20000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.compression import (
+    BROTLI_QUALITY, GZIP_LEVEL, ZSTD_LEVEL, BrotliCompressor, GzipCompressor, ZstdCompressor, brotli
+)
+from app.core.streaming import ndjson_line
+
+from serialization import build_comparison, build_run, measure
+
+# Levels compared per encoding
+LEVELS = {
+    "gzip": (GzipCompressor, (1, 6, 9)),
+    "br": (BrotliCompressor, (1, 4, 6, 9)),
+    "zstd": (ZstdCompressor, (1, 3, 9, 12)),
+}
+if brotli is None:
+    del LEVELS["br"]
+
+# Levels the middleware uses, marked in the output
+DEFAULT_LEVELS = {"gzip": GZIP_LEVEL, "br": BROTLI_QUALITY, "zstd": ZSTD_LEVEL}
+
+
+def compress_body(compressor_class, level: int, body: bytes) -> bytes:
+    return compressor_class(level).finish(body)
+
+
+def compress_stream(compressor_class, level: int, chunks) -> bytes:
+    compressor = compressor_class(level)
+    return b"".join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compression of large responses")
+    parser.add_argument("--results", type=int, default=20000, help="Results in the test run (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement (default: 3)")
+    parser.add_argument("--chunk", type=int, default=1000, help="Rows per streamed chunk (default: 1000)")
+    args = parser.parse_args()
+
+    run = build_run(args.results)
+    lines = [ndjson_line(result.dict()) for result in run.test_case_results]
+    chunks = [b"".join(lines[i:i + args.chunk]) for i in range(0, len(lines), args.chunk)]
+    payloads = {
+        "TestRunWithResults": (json.dumps(run.dict()).encode("utf-8"), None),
+        "compare_test_runs": (json.dumps(build_comparison(args.results)).encode("utf-8"), None),
+        "NDJSON stream": (b"".join(chunks), chunks),
+    }
+
+    for name, (body, stream) in payloads.items():
+        print(f"{name} with {args.results} results, {len(body) / 1024:.0f} KiB:")
+        for encoding, (compressor_class, levels) in LEVELS.items():
+            for level in levels:
+                if stream is None:
+                    function = lambda: compress_body(compressor_class, level, body)
+                else:
+                    function = lambda: compress_stream(compressor_class, level, stream)
+                elapsed = measure(function, args.repeat)
+                size = len(function())
+                marker = "*" if level == DEFAULT_LEVELS[encoding] else " "
+                print(
+                    f"  {encoding:4s} level {level:2d}{marker} {elapsed:8.1f} ms"
+                    f"  {size / 1024:8.0f} KiB  ({len(body) / size:5.1f}x smaller,"
+                    f" {len(body) / 1024 / 1024 / (elapsed / 1000):6.0f} MiB/s)"
+                )
+    print("* default level")
+
+
+if __name__ == "__main__":
+    main()
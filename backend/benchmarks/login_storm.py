@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Load test: latency of other endpoints during a login storm.
+
+Runs the API in-process on one event loop, as uvicorn does with a single
+worker, against a scratch SQLite database. Measures the latency of a cheap
+probe endpoint while idle, then while `--logins` clients log in at once
+(a CI fleet starting up). With --inline, bcrypt runs on the event loop as
+it did before the password pool, for comparison.
+
+Usage: python benchmarks/login_storm.py [--logins 50] [--probes 200] [--inline]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# A scratch database, set before the app creates its engine
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_database.name}"
+
+import httpx
+from sqlmodel import Session
+
+from app.core import auth
+from app.db import database
+from app.main import app
+from app.models.base import TestOperator
+
+USERNAME = "storm"
+PASSWORD = "storm-password"
+
+
+class InlinePool:
+    """Runs hashing on the calling thread, i.e. on the event loop"""
+
+    async def run(self, function, *args):
+        return function(*args)
+
+    def stats(self):
+        return {}
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def probe(client: httpx.AsyncClient, count: int, interval: float, stop: asyncio.Event = None):
+    """Latency in ms of GET / requests, until `count` are done or `stop` is set"""
+    latencies = []
+    while len(latencies) < count and not (stop and stop.is_set()):
+        start = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login(client: httpx.AsyncClient) -> int:
+    response = await client.post("/api/auth/token", data={"username": USERNAME, "password": PASSWORD})
+    return response.status_code
+
+
+def report(name: str, latencies):
+    print(
+        f"  {name:14s} {len(latencies):5d} requests  p50 {statistics.median(latencies):7.1f} ms"
+        f"  p95 {percentile(latencies, 0.95):7.1f} ms  max {max(latencies):7.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure endpoint latency during a login storm")
+    parser.add_argument("--logins", type=int, default=50, help="Concurrent logins (default: 50)")
+    parser.add_argument("--probes", type=int, default=200, help="Idle probe requests (default: 200)")
+    parser.add_argument("--interval", type=float, default=0.005, help="Seconds between probes (default: 0.005)")
+    parser.add_argument("--inline", action="store_true", help="Verify passwords on the event loop, as before")
+    args = parser.parse_args()
+
+    database.engine.echo = False
+    database.create_db_and_tables()
+    with Session(database.engine) as session:
+        session.add(TestOperator(
+            name="Storm", mail="storm@example.com", login=USERNAME, access_rights="user",
+            hashed_password=auth.get_password_hash(PASSWORD)
+        ))
+        session.commit()
+    if args.inline:
+        auth.password_pool = InlinePool()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        idle = await probe(client, args.probes, args.interval)
+
+        stop = asyncio.Event()
+        probes = asyncio.ensure_future(probe(client, sys.maxsize, args.interval, stop))
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(login(client) for _ in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        storm = await probes
+
+    mode = "inline on the event loop" if args.inline else f"pool of {auth.PASSWORD_HASH_WORKERS} workers"
+    print(f"{args.logins} concurrent logins, bcrypt {mode}:")
+    report("idle", idle)
+    report("during storm", storm)
+    print(
+        f"  logins: {statuses.count(200)} ok, {statuses.count(503)} rejected (503)"
+        f" in {elapsed:.2f} s, {args.logins / elapsed:.1f} logins/s"
+    )
+    if not args.inline:
+        print(f"  pool: {auth.password_pool.stats()}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        os.unlink(_database.name)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization of a large test run response.
+
+Compares the serialization paths FastAPI can take for TestRunWithResults
+and for a compare_test_runs style dict:
+
+- jsonable_encoder + json.dumps  (JSONResponse on older FastAPI)
+- jsonable_encoder + orjson      (ORJSONResponse on older FastAPI)
+- Pydantic dump_json             (default on newer FastAPI with a response model)
+
+Usage: python benchmarks/serialization.py [--results 20000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models.base import TestRun, TestCaseResult
+from app.models.schemas import TestCaseResultRead, TestRunRead, TestRunWithResults
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def build_run(count: int) -> TestRunWithResults:
+    """A completed run with `count` results, validated like an endpoint response"""
+    run = TestRun(id=1, status="Completed", name="Benchmark", run_date="2024-01-01", operator_id=1)
+    results = [
+        TestCaseResult(
+            id=i,
+            result="Pass" if i % 10 else "Fail",
+            logs="step passed\n" * 5,
+            comment=None if i % 3 else "Checked manually",
+            test_case_id=i,
+            test_run_id=1
+        )
+        for i in range(1, count + 1)
+    ]
+    return TestRunWithResults(
+        **TestRunRead.from_orm(run).dict(),
+        test_case_results=[TestCaseResultRead.from_orm(result) for result in results]
+    )
+
+
+def build_comparison(count: int) -> dict:
+    """A compare_test_runs style response for `count` test cases"""
+    return {
+        "run1": {"id": 1, "pass_count": count, "fail_count": 0, "other_count": 0, "total": count},
+        "run2": {"id": 2, "pass_count": count - 10, "fail_count": 10, "other_count": 0, "total": count},
+        "test_cases": [
+            {
+                "test_case_id": i,
+                "test_case_title": f"Test case {i}",
+                "run1_result": "Pass",
+                "run2_result": "Fail" if i % 1000 == 0 else "Pass"
+            }
+            for i in range(count)
+        ],
+        "differences": []
+    }
+
+
+def measure(function, repeat: int) -> float:
+    """Best wall time of `repeat` calls, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of large responses")
+    parser.add_argument("--results", type=int, default=20000, help="Results in the test run (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement (default: 5)")
+    args = parser.parse_args()
+
+    payloads = {
+        "TestRunWithResults": (build_run(args.results), TypeAdapter(TestRunWithResults)),
+        "compare_test_runs": (build_comparison(args.results), TypeAdapter(dict)),
+    }
+
+    for name, (payload, adapter) in payloads.items():
+        print(f"{name} with {args.results} results:")
+        timings = {
+            "jsonable_encoder + json.dumps": lambda: json.dumps(jsonable_encoder(payload)).encode("utf-8"),
+            "pydantic dump_json": lambda: adapter.dump_json(payload),
+        }
+        if orjson is not None:
+            timings["jsonable_encoder + orjson"] = lambda: orjson.dumps(jsonable_encoder(payload))
+        baseline = None
+        for label, function in timings.items():
+            elapsed = measure(function, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:32s} {elapsed:8.1f} ms  ({baseline / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+import os
+import sys
+from sqlmodel import Session
+from app.db.database import engine
+from app.core.run_summary import rebuild_run_summaries
+
+if __name__ == "__main__":
+    # Add current directory to Python path to find modules
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    
+    print("Rebuilding test run summary counters...")
+    with Session(engine) as session:
+        count = rebuild_run_summaries(session)
+    
+    print(f"Rebuilt summary counters for {count} test runs")
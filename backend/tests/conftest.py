@@ -10,7 +10,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from app.main import app
 from app.db.database import get_session
-from app.core.auth import get_password_hash
+from app.core.auth import get_password_hash, identity_cache
+from app.core.cache import response_cache
 from app.models.base import Company, TestOperator
 
 
@@ -46,6 +47,10 @@ def client_fixture(session):
     
     app.dependency_overrides[get_session] = get_test_session
     
+    # Each test has its own database, so responses cached by others are stale
+    response_cache.clear()
+    identity_cache.clear()
+    
     # Create test client
     with TestClient(app) as client:
         yield client
@@ -0,0 +1,337 @@
+from sqlmodel import select
+from app.db import database
+from app.core.analytics import FLAKY_JOB, claim_stale_cases, get_stale_cases, mark_cases_stale, refresh_flaky_state
+from app.models.base import (
+    DUT, AnalyticsNewResult, FlakyCaseState, RequirementTestCase, SpecificationCoverage, TestCase, TestCaseResult,
+    TestRun, TestRunTemplate, TestRunTemplateTestCase, TestSuite
+)
+
+
+def _add_runs(session, test_admin, dut_id, results_by_case):
+    """Create one run per position with each case's result at that position"""
+    run_count = len(results_by_case[0][1])
+    for i in range(run_count):
+        run = TestRun(status="Completed", name=f"Run {i}", operator_id=test_admin.id, dut_id=dut_id)
+        session.add(run)
+        session.commit()
+        session.refresh(run)
+        for case, results in results_by_case:
+            session.add(TestCaseResult(result=results[i], test_case_id=case.id, test_run_id=run.id))
+        session.commit()
+
+
+def test_flaky_tests(client, admin_headers, session, test_admin):
+    """Test that flaky cases are ranked by flip rate and state is updated incrementally"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    cases = []
+    for i in range(3):
+        case = TestCase(case_id=f"TC{i}", title=f"Test {i}", version=1, version_string="1.0", test_suite_id=suite.id)
+        session.add(case)
+        cases.append(case)
+    session.commit()
+    stable, flaky, broken = cases
+    
+    _add_runs(session, test_admin, 1, [
+        (stable, ["Pass"] * 6),
+        (flaky, ["Pass", "Fail", "Pass", "Fail", "Pass", "Fail"]),
+        (broken, ["Pass", "Pass", "Pass", "Fail", "Fail", "Fail"])
+    ])
+    # Another DUT on which the flaky case is stable
+    _add_runs(session, test_admin, 2, [(flaky, ["Pass"] * 6)])
+    
+    response = client.get("/api/analytics/flaky-tests", headers=admin_headers)
+    assert response.status_code == 200
+    ranked = response.json()["test_cases"]
+    assert [(item["dut_id"], item["case_id"]) for item in ranked] == [(1, "TC1"), (1, "TC2")]
+    assert ranked[0]["flip_rate"] == 1.0
+    assert ranked[0]["history"] == "PFPFPF"
+    assert ranked[1]["failure_rate"] == 0.5
+    assert ranked[1]["current_streak"] == {"result": "F", "length": 3}
+    assert ranked[1]["longest_fail_streak"] == 3
+    
+    assert session.exec(select(AnalyticsNewResult)).all() == []
+    
+    # New results are appended to the stored history
+    _add_runs(session, test_admin, 1, [(stable, ["Fail"]), (flaky, ["Fail"]), (broken, ["Fail"])])
+    response = client.get("/api/analytics/flaky-tests?dut_id=1&window=3&min_runs=3", headers=admin_headers)
+    ranked = response.json()["test_cases"]
+    assert [item["case_id"] for item in ranked] == ["TC1", "TC0"]
+    assert ranked[0]["history"] == "PFF"
+    
+    # A reset rebuilds the same state from scratch
+    response = client.post("/api/analytics/flaky-tests/reset", headers=admin_headers)
+    assert response.status_code == 200
+    assert session.exec(select(FlakyCaseState)).all() == []
+    response = client.get("/api/analytics/flaky-tests?dut_id=1&window=3&min_runs=3", headers=admin_headers)
+    assert [item["case_id"] for item in response.json()["test_cases"]] == ["TC1", "TC0"]
+
+
+def test_flaky_state_follows_result_changes(client, admin_headers, session, test_admin):
+    """Test that edited, moved and deleted results are replayed into the flaky test state"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC0", title="Test 0", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    
+    _add_runs(session, test_admin, 1, [(case, ["Pass", "Fail", "Pass"])])
+    results = session.exec(select(TestCaseResult).order_by(TestCaseResult.id)).all()
+    run_ids = [result.test_run_id for result in results]
+    
+    def history(dut_id):
+        refresh_flaky_state(session)
+        session.expire_all()
+        state = session.get(FlakyCaseState, (dut_id, case.id))
+        return state.history if state else None
+    
+    assert history(1) == "PFP"
+    
+    # An edited result replaces its code in the history
+    response = client.patch(f"/api/test-runs/results/{results[1].id}", json={"result": "Pass"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert history(1) == "PPP"
+    
+    # Moving a run to another DUT moves its results along
+    response = client.patch(f"/api/test-runs/{run_ids[0]}", json={"dut_id": 2}, headers=admin_headers)
+    assert response.status_code == 200
+    assert (history(1), history(2)) == ("PP", "P")
+    
+    # Deleting the run empties that DUT's history
+    response = client.delete(f"/api/test-runs/{run_ids[0]}", headers=admin_headers)
+    assert response.status_code == 200
+    assert (history(1), history(2)) == ("PP", None)
+    
+    # Only one of two refreshes reading the same flags gets to write
+    mark_cases_stale(session, [(1, case.id)])
+    session.commit()
+    stale = get_stale_cases(session, FLAKY_JOB)
+    assert claim_stale_cases(session, FLAKY_JOB, stale)
+    assert not claim_stale_cases(session, FLAKY_JOB, stale)
+    session.rollback()
+
+
+def test_flaky_state_after_reused_result_ids(client, admin_headers, session, test_admin):
+    """Test that results inserted after a delete are folded in even when their ids are reused"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC0", title="Test 0", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    
+    _add_runs(session, test_admin, 1, [(case, ["Pass", "Fail", "Pass", "Fail", "Pass"])])
+    refresh_flaky_state(session)
+    last = session.exec(select(TestCaseResult).order_by(TestCaseResult.id.desc())).first()
+    last_id = last.id
+    
+    response = client.delete(f"/api/test-runs/{last.test_run_id}", headers=admin_headers)
+    assert response.status_code == 200
+    refresh_flaky_state(session)
+    session.expire_all()
+    assert session.get(FlakyCaseState, (1, case.id)).history == "PFPF"
+    
+    # SQLite hands the deleted id out again
+    _add_runs(session, test_admin, 1, [(case, ["Fail", "Fail"])])
+    assert last_id in session.exec(select(TestCaseResult.id)).all()
+    refresh_flaky_state(session)
+    session.expire_all()
+    assert session.get(FlakyCaseState, (1, case.id)).history == "PFPFFF"
+
+
+def test_specification_coverage(client, admin_headers, session, test_admin):
+    """Test requirement links and that coverage rollups follow new results and link changes"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    cases = []
+    for i in range(3):
+        case = TestCase(case_id=f"TC{i}", title=f"Test {i}", version=1, version_string="1.0", test_suite_id=suite.id)
+        session.add(case)
+        cases.append(case)
+    dut = DUT(product_name="Router", make="Acme", model="R1")
+    session.add(dut)
+    session.commit()
+    
+    response = client.post("/api/specifications/", json={"name": "Spec", "version": "1.0"}, headers=admin_headers)
+    assert response.status_code == 200
+    spec_id = response.json()["id"]
+    requirement_ids = []
+    for i in range(4):
+        response = client.post(
+            "/api/specifications/requirements",
+            json={"Field": "Wi-Fi", "name": f"REQ{i}"},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["Field"] == "Wi-Fi"
+        requirement_ids.append(response.json()["id"])
+        client.post(f"/api/specifications/{spec_id}/requirements/{requirement_ids[-1]}", headers=admin_headers)
+    
+    # REQ0 and REQ1 share TC0, REQ2 has TC1 and TC2, REQ3 has no tests
+    for requirement_id, case in [(0, 0), (1, 0), (2, 1), (2, 2)]:
+        response = client.post(
+            f"/api/specifications/requirements/{requirement_ids[requirement_id]}/test-cases/{cases[case].id}",
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+    
+    response = client.get(f"/api/specifications/requirements/{requirement_ids[2]}", headers=admin_headers)
+    assert response.json()["test_case_ids"] == [cases[1].id, cases[2].id]
+    assert [spec["id"] for spec in response.json()["specifications"]] == [spec_id]
+    
+    _add_runs(session, test_admin, dut.id, [(cases[0], ["Pass"]), (cases[1], ["Fail"]), (cases[2], ["Fail"])])
+    response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    assert response.json() == [{
+        "specification_id": spec_id,
+        "dut_id": dut.id,
+        "requirement_count": 4,
+        "tested_count": 3,
+        "passing_count": 2,
+        "coverage": 50.0
+    }]
+    
+    # Only the latest result counts, and only the affected rollups are recomputed
+    _add_runs(session, test_admin, dut.id, [(cases[2], ["Pass"])])
+    response = client.get(f"/api/specifications/coverage?dut_id={dut.id}", headers=admin_headers)
+    assert response.json()[0]["passing_count"] == 3
+    
+    response = client.get(f"/api/specifications/{spec_id}/coverage/{dut.id}", headers=admin_headers)
+    detail = response.json()
+    assert detail["coverage"] == 75.0
+    assert [item["passing"] for item in detail["requirements"]] == [True, True, True, False]
+    assert detail["requirements"][2]["tested_test_cases"] == 2
+    assert detail["requirements"][2]["passing_test_cases"] == 1
+    
+    # Link changes and deletes refresh the rollups right away
+    client.delete(f"/api/specifications/{spec_id}/requirements/{requirement_ids[3]}", headers=admin_headers)
+    response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    assert response.json()[0]["coverage"] == 100.0
+    
+    response = client.delete(f"/api/test-cases/{cases[0].id}", headers=admin_headers)
+    assert response.status_code == 200
+    response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    assert response.json()[0]["passing_count"] == 1
+    assert session.exec(select(RequirementTestCase)).all() != []
+    
+    response = client.post("/api/specifications/coverage/rebuild", headers=admin_headers)
+    assert response.status_code == 200
+    response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    assert (response.json()[0]["requirement_count"], response.json()[0]["passing_count"]) == (3, 1)
+    
+    response = client.delete(f"/api/specifications/{spec_id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert session.exec(select(SpecificationCoverage)).all() == []
+
+
+def test_coverage_follows_result_changes(client, admin_headers, session, test_admin):
+    """Test that coverage rollups follow edited, moved and deleted results"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC0", title="Test 0", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    
+    spec_id = client.post("/api/specifications/", json={"name": "Spec", "version": "1.0"}, headers=admin_headers).json()["id"]
+    response = client.post("/api/specifications/requirements", json={"Field": "Wi-Fi", "name": "REQ0"}, headers=admin_headers)
+    requirement_id = response.json()["id"]
+    client.post(f"/api/specifications/{spec_id}/requirements/{requirement_id}", headers=admin_headers)
+    client.post(f"/api/specifications/requirements/{requirement_id}/test-cases/{case.id}", headers=admin_headers)
+    
+    _add_runs(session, test_admin, 1, [(case, ["Pending"])])
+    result = session.exec(select(TestCaseResult)).one()
+    
+    def rollups():
+        response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+        return [(rollup["dut_id"], rollup["tested_count"], rollup["passing_count"]) for rollup in response.json()]
+    
+    # A pending result is no verdict yet
+    assert rollups() == []
+    
+    # An edited result updates the rollup without any new result being uploaded
+    response = client.patch(f"/api/test-runs/results/{result.id}", json={"result": "Pass"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert rollups() == [(1, 1, 1)]
+    
+    # Moving the run to another DUT moves its coverage along
+    response = client.patch(f"/api/test-runs/{result.test_run_id}", json={"dut_id": 2}, headers=admin_headers)
+    assert response.status_code == 200
+    assert rollups() == [(2, 1, 1)]
+    
+    # Deleting the result drops the rollup
+    response = client.delete(f"/api/test-runs/results/{result.id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert rollups() == []
+    
+    # New results count even when they reuse the deleted id, and a skip does not hide a pass
+    _add_runs(session, test_admin, 2, [(case, ["Pass", "Skipped"])])
+    assert result.id in session.exec(select(TestCaseResult.id)).all()
+    assert rollups() == [(2, 1, 1)]
+
+
+def test_flaky_state_skips_pending_placeholders(client, admin_headers, session, test_admin):
+    """Test that template runs do not add their pending placeholders to the flaky test history"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC0", title="Test 0", version=1, version_string="1.0", test_suite_id=suite.id)
+    template = TestRunTemplate(template_id="T1", name="Smoke")
+    dut = DUT(product_name="Router", make="Acme", model="R1")
+    session.add_all([case, template, dut])
+    session.commit()
+    session.add(TestRunTemplateTestCase(template_id=template.id, test_case_id=case.id))
+    session.commit()
+    
+    _add_runs(session, test_admin, dut.id, [(case, ["Fail", "Fail"])])
+    response = client.post(f"/api/test-run-templates/{template.id}/instantiate", json={"dut_id": dut.id}, headers=admin_headers)
+    assert response.status_code == 200
+    
+    def history():
+        refresh_flaky_state(session)
+        session.expire_all()
+        return session.get(FlakyCaseState, (dut.id, case.id)).history
+    
+    assert history() == "FF"
+    
+    # The verdict written later joins the history
+    result = session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == response.json()["id"])).one()
+    response = client.patch(f"/api/test-runs/results/{result.id}", json={"result": "Fail"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert history() == "FFF"
+
+
+def test_restore_rebuilds_analytics(client, admin_headers, session, test_admin, test_db_engine, tmp_path, monkeypatch):
+    """Test that a JSON backup keeps requirement links and a restore rebuilds flaky test state and coverage"""
+    monkeypatch.setattr(database, "engine", test_db_engine)
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC0", title="Test 0", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    
+    spec_id = client.post("/api/specifications/", json={"name": "Spec", "version": "1.0"}, headers=admin_headers).json()["id"]
+    response = client.post("/api/specifications/requirements", json={"Field": "Wi-Fi", "name": "REQ0"}, headers=admin_headers)
+    requirement_id = response.json()["id"]
+    client.post(f"/api/specifications/{spec_id}/requirements/{requirement_id}", headers=admin_headers)
+    client.post(f"/api/specifications/requirements/{requirement_id}/test-cases/{case.id}", headers=admin_headers)
+    _add_runs(session, test_admin, 1, [(case, ["Fail", "Pass"])])
+    client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    
+    backup = str(tmp_path / "backup.json")
+    assert database.export_db_to_json(backup)
+    # State that does not match the backup is dropped on restore
+    session.get(FlakyCaseState, (1, case.id)).history = "FFFF"
+    session.commit()
+    assert database.import_db_from_json(backup)
+    session.expire_all()
+    
+    assert session.exec(select(RequirementTestCase)).all() == [
+        RequirementTestCase(requirement_id=requirement_id, test_case_id=case.id)
+    ]
+    response = client.get(f"/api/specifications/{spec_id}/coverage", headers=admin_headers)
+    assert response.json()[0]["passing_count"] == 1
+    assert session.get(FlakyCaseState, (1, case.id)).history == "FP"
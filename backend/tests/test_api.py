@@ -1,5 +1,8 @@
 import pytest
-from app.models.base import TestSuite, TestCase
+from sqlalchemy import event
+from sqlmodel import Session, select
+from app.db.events import get_table_versions, mark_tables_changed
+from app.models.base import TestSuite, TestCase, DUT, Capability, DUTCapability
 
 
 # Test Suite API Tests
@@ -138,4 +141,363 @@ def test_get_test_cases(client, admin_headers, session):
     
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 0
\ No newline at end of file
+    assert len(data) == 0
+
+
+def test_search_test_cases(client, admin_headers, session):
+    """Test full-text search over test cases"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    session.refresh(suite)
+    
+    session.add(TestCase(
+        case_id="org.hbbtv_MSR09010",
+        title="Media source playback",
+        version=1,
+        version_string="1.0",
+        steps="Start DASH playback and seek",
+        test_suite_id=suite.id
+    ))
+    session.add(TestCase(
+        case_id="org.hbbtv_APP00010",
+        title="Application launch",
+        version=1,
+        version_string="1.0",
+        description="Launch a broadcast related application",
+        test_suite_id=suite.id
+    ))
+    session.commit()
+    
+    response = client.get("/api/test-cases/search?q=dash", headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["case_id"] == "org.hbbtv_MSR09010"
+    assert "<mark>DASH</mark>" in data[0]["snippet"]
+    
+    # Prefix match on the case ID
+    response = client.get("/api/test-cases/search?q=APP0001", headers=admin_headers)
+    assert [hit["case_id"] for hit in response.json()] == ["org.hbbtv_APP00010"]
+    
+    # Updates and deletes keep the index in sync
+    case = session.exec(select(TestCase).where(TestCase.case_id == "org.hbbtv_APP00010")).first()
+    case.title = "Teletext rendering"
+    session.add(case)
+    session.commit()
+    
+    response = client.get("/api/test-cases/search?q=teletext", headers=admin_headers)
+    assert len(response.json()) == 1
+    
+    session.delete(case)
+    session.commit()
+    
+    response = client.get("/api/test-cases/search?q=teletext", headers=admin_headers)
+    assert response.json() == []
+
+
+def test_dut_capability_matrix(client, admin_headers, session):
+    """Test loading DUT capabilities with a join and as a compact matrix"""
+    duts = [DUT(product_name=f"TV {i}", make="Make", model="Model") for i in range(3)]
+    capabilities = [
+        Capability(name=name, category="Video", version=1, version_string="1.0")
+        for name in ("HDR", "UHD")
+    ]
+    session.add_all(duts + capabilities)
+    session.commit()
+    session.add(DUTCapability(dut_id=duts[0].id, capability_id=capabilities[0].id))
+    session.add(DUTCapability(dut_id=duts[0].id, capability_id=capabilities[1].id))
+    session.add(DUTCapability(dut_id=duts[2].id, capability_id=capabilities[1].id))
+    session.commit()
+    
+    response = client.get(f"/api/duts/{duts[0].id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert [cap["name"] for cap in response.json()["capabilities"]] == ["HDR", "UHD"]
+    
+    response = client.get("/api/duts/capability-matrix", headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [dut["product_name"] for dut in data["duts"]] == ["TV 0", "TV 1", "TV 2"]
+    assert [cap["name"] for cap in data["capabilities"]] == ["HDR", "UHD"]
+    assert data["capability_indexes"] == [[0, 1], [], [1]]
+
+
+def test_conditional_get(client, admin_headers, session, test_db_engine):
+    """Test ETags change with the table version and If-None-Match skips the endpoint"""
+    response = client.get("/api/test-suites/", headers=admin_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    
+    statements = []
+    
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(test_db_engine, "before_cursor_execute", record_statement)
+    try:
+        response = client.get("/api/test-suites/", headers={**admin_headers, "If-None-Match": etag})
+    finally:
+        event.remove(test_db_engine, "before_cursor_execute", record_statement)
+    
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert not any("FROM test_suites" in statement for statement in statements)
+    
+    # Other query parameters are tagged separately
+    response = client.get("/api/test-suites/?limit=5", headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    
+    # A write to the table changes the tag
+    client.post(
+        "/api/test-suites/",
+        json={"name": "New", "format": "HTML", "version": 1, "version_string": "1.0"},
+        headers=admin_headers
+    )
+    response = client.get("/api/test-suites/", headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()) == 1
+
+
+def test_table_versions_bumped_once_per_commit(session, test_db_engine):
+    """Test that change counters are bumped at commit, once however often the transaction flushed"""
+    before = get_table_versions(session, ["test_suites"])["test_suites"]
+    for name in ("First", "Second"):
+        session.add(TestSuite(name=name, format="HTML", version=1, version_string="1.0"))
+        session.flush()
+    mark_tables_changed(session, "test_suites")
+    
+    # Nothing is written to the counters before commit
+    with Session(test_db_engine) as other:
+        assert get_table_versions(other, ["test_suites"])["test_suites"] == before
+    session.commit()
+    assert get_table_versions(session, ["test_suites"])["test_suites"] == before + 1
+
+
+def test_response_cache(client, admin_headers, session):
+    """Test cached list responses are reused until a write to their table"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    
+    def stats():
+        return client.get("/api/admin/cache-stats", headers=admin_headers).json()["data"]
+    
+    before = stats()
+    for _ in range(2):
+        response = client.get("/api/test-suites/", headers=admin_headers)
+        assert [item["name"] for item in response.json()] == ["Suite"]
+    after = stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+    assert after["entries"] == 1
+    
+    # Committing a change to test_suites drops the cached list
+    suite.name = "Renamed"
+    session.add(suite)
+    session.commit()
+    response = client.get("/api/test-suites/", headers=admin_headers)
+    assert [item["name"] for item in response.json()] == ["Renamed"]
+    assert stats()["invalidations"] - after["invalidations"] == 1
+
+
+def test_cached_response_skips_results_built_during_a_write(session):
+    """Test a result is not cached when its tables changed while it was being built"""
+    from app.core.cache import cached_response, response_cache
+    
+    calls = []
+    
+    @cached_response("test_suites")
+    def endpoint(session):
+        calls.append(1)
+        if len(calls) == 1:
+            # A write committed by another request while this one reads
+            session.add(TestSuite(name="Suite", format="HTML", version=1, version_string="1.0"))
+            session.commit()
+        return {"calls": len(calls)}
+    
+    assert endpoint(session=session) == {"calls": 1}
+    assert response_cache.stats()["entries"] == 0
+    assert endpoint(session=session) == {"calls": 2}
+    assert endpoint(session=session) == {"calls": 2}
+
+
+def test_response_cache_bounds():
+    """Test LRU eviction and TTL expiry of the response cache"""
+    from app.core.cache import ResponseCache
+    
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("a", 1, ["t1"])
+    cache.set("b", 2, ["t2"])
+    assert cache.get("a") == 1
+    cache.set("c", 3, ["t2"])
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    
+    cache.invalidate_tables({"t2"})
+    assert cache.get("c") is None
+    assert cache.get("a") == 1
+    
+    expired = ResponseCache(max_entries=2, ttl=0)
+    expired.set("a", 1, ["t1"])
+    assert expired.get("a") is None
+
+
+def test_test_case_list_fields(client, admin_headers, session):
+    """Test large text columns are deferred in lists and fields= selects columns"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    session.add(TestCase(
+        case_id="TC001", title="Test 1", version=1, version_string="1.0",
+        description="Long description", steps="1. Do things", test_suite_id=suite.id
+    ))
+    session.commit()
+    
+    response = client.get("/api/test-cases/", headers=admin_headers)
+    assert response.status_code == 200
+    item = response.json()[0]
+    assert item["case_id"] == "TC001"
+    assert "description" not in item and "steps" not in item
+    
+    response = client.get("/api/test-cases/?fields=title,steps", headers=admin_headers)
+    assert response.json() == [{"id": item["id"], "title": "Test 1", "steps": "1. Do things"}]
+    
+    # Every column that can be requested is returned
+    response = client.get("/api/test-cases/?fields=content_hash", headers=admin_headers)
+    assert response.json() == [{"id": item["id"], "content_hash": item["content_hash"]}]
+    assert len(item["content_hash"]) == 64
+    
+    response = client.get("/api/test-cases/?fields=title,password", headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_bulk_write_test_cases(client, admin_headers, session, test_db_engine):
+    """Test creating and updating many test cases in one request with per-item status"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    
+    items = [
+        {"Id": f"TC{i:05d}", "title": f"Test {i}", "version": 1, "version_string": "1.0", "test_suite_id": suite.id}
+        for i in range(2500)
+    ]
+    items.append({"Id": "BAD", "title": "No version", "test_suite_id": suite.id})
+    items.append({"Id": "ORPHAN", "title": "T", "version": 1, "version_string": "1.0", "test_suite_id": 999})
+    
+    statements = []
+    
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(test_db_engine, "before_cursor_execute", record_statement)
+    try:
+        response = client.post("/api/test-cases/bulk", json=items, headers=admin_headers)
+    finally:
+        event.remove(test_db_engine, "before_cursor_execute", record_statement)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["updated"], data["failed"]) == (2500, 0, 2)
+    assert data["items"][2500]["status"] == "error"
+    assert data["items"][2500]["error"].startswith("version")
+    assert "not found" in data["items"][2501]["error"]
+    ids = [item["id"] for item in data["items"][:2500]]
+    
+    # Rows are inserted in a few multi-row statements, not one per item
+    inserts = [statement for statement in statements if statement.startswith("INSERT INTO test_cases")]
+    assert 0 < len(inserts) <= 5
+    
+    # Returned ids line up with the items they were created for
+    case = session.get(TestCase, ids[1234])
+    assert case.case_id == "TC01234"
+    
+    response = client.post(
+        "/api/test-cases/bulk",
+        json=[{"id": ids[0], "title": "Renamed"}, {"id": 999999, "title": "Missing"}],
+        headers=admin_headers
+    )
+    data = response.json()
+    assert (data["created"], data["updated"], data["failed"]) == (0, 1, 1)
+    session.expire_all()
+    assert session.get(TestCase, ids[0]).title == "Renamed"
+    
+    response = client.post("/api/test-cases/bulk", json=[{}] * 10001, headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_bulk_write_duts_and_capabilities(client, admin_headers, session):
+    """Test the bulk DUT and capability endpoints"""
+    response = client.post(
+        "/api/duts/bulk",
+        json=[{"product_name": f"TV {i}", "make": "Make", "model": f"M{i}"} for i in range(3)],
+        headers=admin_headers
+    )
+    data = response.json()
+    assert data["created"] == 3
+    
+    response = client.post(
+        "/api/duts/bulk",
+        json=[{"id": data["items"][0]["id"], "model": "Updated"}, {"product_name": "Missing make"}],
+        headers=admin_headers
+    )
+    data = response.json()
+    assert [item["status"] for item in data["items"]] == ["updated", "error"]
+    assert session.exec(select(DUT).where(DUT.model == "Updated")).first() is not None
+    
+    response = client.post(
+        "/api/duts/capabilities/bulk",
+        json=[{"name": "HDR", "category": "Video", "version": 1, "version_string": "1.0"}],
+        headers=admin_headers
+    )
+    assert response.json()["created"] == 1
+    assert session.exec(select(Capability).where(Capability.name == "HDR")).first() is not None
+
+
+def test_test_suite_diff(client, admin_headers, session):
+    """Test diffing two suite versions by content hash"""
+    old = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    new = TestSuite(name="Suite", format="HTML", version=2, version_string="2.0")
+    session.add_all([old, new])
+    session.commit()
+    
+    def case(suite, case_id, steps="Step 1"):
+        return TestCase(case_id=case_id, title=f"Test {case_id}", version=suite.version,
+                        version_string=suite.version_string, steps=steps, test_suite_id=suite.id)
+    
+    session.add_all([case(old, "TC1"), case(old, "TC2"), case(old, "TC3")])
+    session.add_all([case(new, "TC1"), case(new, "TC2", steps="Step 2"), case(new, "TC4")])
+    session.commit()
+    
+    cases = session.exec(select(TestCase).order_by(TestCase.id)).all()
+    assert cases[0].content_hash == cases[3].content_hash
+    assert cases[1].content_hash != cases[4].content_hash
+    
+    response = client.get(f"/api/test-suites/{old.id}/diff/{new.id}", headers=admin_headers)
+    assert response.status_code == 200
+    diff = response.json()
+    assert [item["case_id"] for item in diff["added"]] == ["TC4"]
+    assert [item["case_id"] for item in diff["removed"]] == ["TC3"]
+    assert diff["modified"] == [{"case_id": "TC2", "base_id": cases[1].id, "id": cases[4].id}]
+    assert diff["unchanged_count"] == 1
+    
+    # Bulk updates bypass the ORM and are hashed too
+    response = client.post(
+        "/api/test-cases/bulk", json=[{"id": cases[4].id, "steps": "Step 1"}], headers=admin_headers
+    )
+    assert response.json()["updated"] == 1
+    response = client.get(f"/api/test-suites/{old.id}/diff/{new.id}", headers=admin_headers)
+    assert response.json()["modified"] == []
+    assert response.json()["unchanged_count"] == 2
+    
+    # ORM updates are hashed by the listener
+    cases[3].title = "Renamed"
+    session.add(cases[3])
+    session.commit()
+    response = client.get(f"/api/test-suites/{old.id}/diff/{new.id}", headers=admin_headers)
+    assert [item["case_id"] for item in response.json()["modified"]] == ["TC1"]
+    
+    response = client.get(f"/api/test-suites/{old.id}/diff/999", headers=admin_headers)
+    assert response.status_code == 404
@@ -0,0 +1,77 @@
+import pytest
+from sqlmodel import select
+from app.core import archive
+from app.models.base import TestSuite, TestCase, TestRun, TestCaseResult, ArchivedTestRun, ArchivedTestCaseRun
+
+
+def test_archive_old_runs(client, admin_headers, session, test_admin, tmp_path, monkeypatch):
+    """Test moving old runs to the Parquet archive and reading them back"""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    session.refresh(suite)
+
+    case = TestCase(case_id="TC001", title="Test 1", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    session.refresh(case)
+
+    old_run = TestRun(status="Completed", name="Old", run_date="2020-01-15", operator_id=test_admin.id)
+    new_run = TestRun(status="Completed", name="New", run_date="2999-01-01", operator_id=test_admin.id)
+    session.add(old_run)
+    session.add(new_run)
+    session.commit()
+    session.refresh(old_run)
+    session.refresh(new_run)
+    old_run_id = old_run.id
+
+    for run in (old_run, new_run):
+        session.add(TestCaseResult(result="Pass", logs="ok", test_case_id=case.id, test_run_id=run.id))
+    session.commit()
+
+    counts = archive.archive_old_runs(session, older_than_days=30)
+    assert counts == {"archived_runs": 1, "archived_results": 1}
+
+    # The old run is gone from the hot tables but indexed as archived
+    session.expire_all()
+    assert session.get(TestRun, old_run_id) is None
+    assert session.get(TestRun, new_run.id) is not None
+    assert session.get(ArchivedTestRun, old_run_id).partition == "run_month=2020-01"
+    assert (tmp_path / "test_case_results" / "run_month=2020-01" / f"run-{old_run_id}.parquet").exists()
+    
+    # History lookups find the run through the test case index, which can be rebuilt from the files
+    index = [(row.test_case_id, row.test_run_id) for row in session.exec(select(ArchivedTestCaseRun)).all()]
+    assert index == [(case.id, old_run_id)]
+    assert archive.rebuild_archive_index(session) == 1
+    session.commit()
+    assert [(row.test_case_id, row.test_run_id) for row in session.exec(select(ArchivedTestCaseRun)).all()] == index
+
+    response = client.get(f"/api/test-runs/{old_run_id}?result_fields=logs", headers=admin_headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["archived"] is True
+    assert data["name"] == "Old"
+    assert len(data["test_case_results"]) == 1
+    assert data["test_case_results"][0]["result"] == "Pass"
+    assert data["test_case_results"][0]["logs"] == "ok"
+
+
+def test_archived_run_files_missing(client, admin_headers, session, test_admin, tmp_path, monkeypatch):
+    """Test that an archived run whose Parquet files are gone reads as 410, not 500"""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+
+    run = TestRun(status="Completed", name="Old", run_date="2020-01-15", operator_id=test_admin.id)
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    run_id = run.id
+
+    archive.archive_old_runs(session, older_than_days=30)
+    (tmp_path / "test_runs" / "run_month=2020-01" / f"run-{run_id}.parquet").unlink()
+
+    response = client.get(f"/api/test-runs/{run_id}", headers=admin_headers)
+
+    assert response.status_code == 410
@@ -1,5 +1,13 @@
+import asyncio
+import threading
+
 import pytest
-from app.models.base import TestOperator
+from sqlalchemy import event
+from app.core import auth
+from app.core.api_keys import hash_api_key
+from app.core.auth import identity_cache
+from app.core.hash_pool import HashPool, HashPoolFull
+from app.models.base import ApiKey, TestCase, TestOperator, TestRun, TestSuite
 
 
 def test_login(client, test_admin):
@@ -66,4 +74,142 @@ def test_create_user(client, admin_headers, session, test_company):
         "/api/auth/token",
         data={"username": user_data["login"], "password": user_data["password"]}
     )
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_identity_cache(client, admin_headers, session, test_admin, test_db_engine):
+    """Test that authenticated requests skip the user query until a user changes"""
+    statements = []
+    
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    def user_queries():
+        return [statement for statement in statements if "FROM test_operators" in statement]
+    
+    event.listen(test_db_engine, "before_cursor_execute", record_statement)
+    try:
+        for _ in range(5):
+            assert client.get("/api/analytics/flaky-tests", headers=admin_headers).status_code == 200
+        assert len(user_queries()) <= 1
+        
+        # Changing access rights takes effect on the next request
+        test_admin.access_rights = "user"
+        session.add(test_admin)
+        session.commit()
+        assert client.post("/api/analytics/flaky-tests/reset", headers=admin_headers).status_code == 403
+        assert identity_cache.get(test_admin.login)["access_rights"] == "user"
+        
+        # So does deleting the user
+        session.delete(test_admin)
+        session.commit()
+        assert client.get("/api/analytics/flaky-tests", headers=admin_headers).status_code == 401
+    finally:
+        event.remove(test_db_engine, "before_cursor_execute", record_statement)
+
+
+def test_password_pool_bounds():
+    """Test that the hashing pool caps running and queued jobs and reports its depth"""
+    pool = HashPool(workers=1, max_pending=2)
+    release = threading.Event()
+    
+    async def storm():
+        jobs = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        stats = pool.stats()
+        assert (stats["running"], stats["queued"]) == (1, 1)
+        with pytest.raises(HashPoolFull):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*jobs)
+    
+    asyncio.run(storm())
+    stats = pool.stats()
+    assert (stats["completed"], stats["rejected"], stats["peak_pending"]) == (2, 1, 2)
+
+
+def test_password_pool_keeps_cancelled_jobs_slot():
+    """Test that a cancelled caller's slot stays taken until its hash finishes"""
+    pool = HashPool(workers=1, max_pending=1)
+    release = threading.Event()
+    
+    async def cancel():
+        job = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        # The hash is still running on the worker, so the pool is still full
+        assert pool.stats()["running"] == 1
+        with pytest.raises(HashPoolFull):
+            await asyncio.wait_for(pool.run(release.wait), 1)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await pool.run(lambda: "done") == "done"
+    
+    try:
+        asyncio.run(cancel())
+    finally:
+        release.set()
+    assert pool.stats()["completed"] == 2
+
+
+def test_login_when_password_pool_is_full(client, test_admin, monkeypatch):
+    """Test that logins beyond the pool's capacity are turned away with 503"""
+    monkeypatch.setattr(auth, "password_pool", HashPool(workers=1, max_pending=0))
+    response = client.post(
+        "/api/auth/token",
+        data={"username": test_admin.login, "password": "password123"}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_api_keys(client, admin_headers, session, test_admin):
+    """Test creating, using and revoking an API key for result uploads"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    case = TestCase(case_id="TC1", title="Test", version=1, version_string="1.0", test_suite_id=suite.id)
+    run = TestRun(status="Running", name="CI run", operator_id=test_admin.id)
+    session.add_all([case, run])
+    session.commit()
+    
+    response = client.post("/api/auth/api-keys", json={"name": "CI bot", "expires_in_days": 30}, headers=admin_headers)
+    assert response.status_code == 200
+    created = response.json()
+    key = created["key"]
+    assert key.startswith(f"qa_{created['prefix']}_")
+    
+    # Only an HMAC of the key is stored, and listings never show it
+    stored = session.get(ApiKey, created["id"])
+    assert stored.key_hash == hash_api_key(key) and key not in stored.key_hash
+    response = client.get("/api/auth/api-keys", headers=admin_headers)
+    assert [item["id"] for item in response.json()] == [created["id"]]
+    assert "key" not in response.json()[0] and "key_hash" not in response.json()[0]
+    
+    results = [{"result": "Pass", "test_case_id": case.id, "test_run_id": run.id}]
+    response = client.post("/api/test-runs/results/bulk", json=results, headers={"X-API-Key": key})
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    
+    # Keys only open upload endpoints, and must match exactly
+    assert client.get("/api/auth/users", headers={"X-API-Key": key}).status_code == 401
+    response = client.post(
+        "/api/uploads/import-local-file", params={"file_path": "/etc/passwd"}, headers={"X-API-Key": key}
+    )
+    assert response.status_code == 401
+    tampered = key[:-1] + ("A" if key[-1] != "A" else "B")
+    response = client.post("/api/test-runs/results/bulk", json=results, headers={"X-API-Key": tampered})
+    assert response.status_code == 401
+    response = client.post("/api/test-runs/results/bulk", json=results, headers={"X-API-Key": "not-a-key"})
+    assert response.status_code == 401
+    
+    response = client.delete(f"/api/auth/api-keys/{created['id']}", headers=admin_headers)
+    assert response.status_code == 200
+    response = client.post("/api/test-runs/results/bulk", json=results, headers={"X-API-Key": key})
+    assert response.status_code == 401
+    
+    # Bearer tokens still work on upload endpoints
+    response = client.post("/api/test-runs/results/bulk", json=results, headers=admin_headers)
+    assert response.status_code == 200
@@ -0,0 +1,107 @@
+import gzip
+import json
+
+import pytest
+
+from app.core.compression import COMPRESSORS, negotiate_encoding
+from app.models.base import TestCase, TestCaseResult, TestRun, TestSuite
+
+
+def test_negotiate_encoding():
+    """Test picking a content coding from Accept-Encoding"""
+    available = ["zstd", "br", "gzip"]
+    assert negotiate_encoding(None, available) is None
+    assert negotiate_encoding("gzip, deflate", available) == "gzip"
+    assert negotiate_encoding("gzip, br, zstd", available) == "zstd"
+    assert negotiate_encoding("gzip;q=1.0, zstd;q=0.5", available) == "gzip"
+    assert negotiate_encoding("zstd;q=0, gzip", available) == "gzip"
+    assert negotiate_encoding("*", available) == "zstd"
+    assert negotiate_encoding("identity", available) is None
+
+
+def test_optional_codecs(monkeypatch):
+    """Test that zstd is not offered when zstandard is not installed"""
+    import importlib
+    import sys
+    from app.core import compression
+
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    try:
+        importlib.reload(compression)
+        assert "zstd" not in compression.COMPRESSORS
+        assert negotiate_encoding("zstd, gzip", list(compression.COMPRESSORS)) == "gzip"
+    finally:
+        monkeypatch.undo()
+        importlib.reload(compression)
+
+
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+def test_streaming_compressor(encoding):
+    """Test that flushed chunks concatenate into one valid stream"""
+    compressor = COMPRESSORS[encoding]()
+    chunks = [compressor.compress(b"line %d\n" % i * 50) for i in range(10)]
+    assert all(chunks)
+    data = b"".join(chunks) + compressor.finish()
+
+    expected = b"".join(b"line %d\n" % i * 50 for i in range(10))
+    if encoding == "gzip":
+        assert gzip.decompress(data) == expected
+    elif encoding == "zstd":
+        import zstandard
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(data) == expected
+    else:
+        import brotli
+        assert brotli.decompress(data) == expected
+
+
+def test_compressed_responses(client, admin_headers, session, test_admin):
+    """Test that large and streamed responses are compressed and small ones are not"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    cases = [
+        TestCase(case_id=f"TC{i:04d}", title=f"Test case {i}", version=1, version_string="1.0", test_suite_id=suite.id)
+        for i in range(200)
+    ]
+    session.add_all(cases)
+    run = TestRun(status="Completed", name="Run", operator_id=test_admin.id)
+    session.add(run)
+    session.commit()
+    session.add_all([
+        TestCaseResult(result="Pass", test_case_id=case.id, test_run_id=run.id) for case in cases
+    ])
+    session.commit()
+
+    gzip_headers = {**admin_headers, "Accept-Encoding": "gzip"}
+    response = client.get("/api/test-cases/?limit=200", headers=gzip_headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"].startswith("W/")
+    assert len(response.json()) == 200
+
+    # A weak ETag from a compressed response still validates
+    response = client.get(
+        "/api/test-cases/?limit=200",
+        headers={**gzip_headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+    response = client.get("/api/test-cases/?limit=1", headers=gzip_headers)
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/api/test-cases/?limit=200", headers={**admin_headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+    # Streams are compressed chunk by chunk without a Content-Length
+    encoding = next(iter(COMPRESSORS))
+    response = client.get(
+        f"/api/test-runs/{run.id}",
+        headers={**admin_headers, "Accept": "application/x-ndjson", "Accept-Encoding": encoding}
+    )
+    assert response.headers["content-encoding"] == encoding
+    assert "content-length" not in response.headers
+    assert len([json.loads(line) for line in response.text.splitlines()]) == 200
+
+    # Exports that are compressed already are left alone
+    response = client.get(f"/api/test-runs/{run.id}/export?format=xlsx", headers=gzip_headers)
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+from app.core.content_hash import compute_content_hash
+from app.db import migrations
+
+
+@pytest.fixture(name="empty_engine")
+def empty_engine_fixture():
+    """Create an engine for an empty in-memory database"""
+    return create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+
+
+def test_run_migrations_stamps_fresh_database(empty_engine, monkeypatch):
+    """Test that a fresh database is created and stamped, then only version-checked"""
+    assert migrations.run_migrations(empty_engine) == migrations.SCHEMA_VERSION
+    
+    with empty_engine.connect() as connection:
+        assert migrations.get_schema_version(connection) == migrations.SCHEMA_VERSION
+        assert inspect(connection).has_table("test_case_results")
+    
+    # Up-to-date databases must not be reflected or created again
+    def fail_create_all(*args, **kwargs):
+        raise AssertionError("create_all should not run on an up-to-date database")
+    
+    monkeypatch.setattr(SQLModel.metadata, "create_all", fail_create_all)
+    assert migrations.run_migrations(empty_engine) == migrations.SCHEMA_VERSION
+
+
+def test_run_migrations_upgrades_unversioned_database(empty_engine):
+    """Test that a database from before versioning gets missing columns added"""
+    with empty_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE test_case_results (id INTEGER PRIMARY KEY, result VARCHAR NOT NULL, "
+            "logs VARCHAR, comment VARCHAR, artifacts VARCHAR, test_run_id INTEGER, test_case_id INTEGER)"
+        ))
+    
+    migrations.run_migrations(empty_engine)
+    
+    with empty_engine.connect() as connection:
+        columns = {c["name"] for c in inspect(connection).get_columns("test_case_results")}
+        assert {"logs_hash", "logs_size", "artifacts_hash", "artifacts_size"} <= columns
+        assert migrations.get_schema_version(connection) == migrations.SCHEMA_VERSION
+
+
+def test_run_migrations_backfills_content_hashes(empty_engine):
+    """Test that test cases from before content hashing get their hash"""
+    with empty_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE test_cases (id INTEGER PRIMARY KEY, case_id VARCHAR NOT NULL, title VARCHAR NOT NULL, "
+            "version INTEGER NOT NULL, version_string VARCHAR NOT NULL, description VARCHAR, steps VARCHAR, "
+            "precondition VARCHAR, area VARCHAR, automatability VARCHAR, author VARCHAR, material VARCHAR, "
+            "is_challenged BOOLEAN, challenge_issue_url VARCHAR, applies_to VARCHAR, test_suite_id INTEGER)"
+        ))
+        connection.execute(text(
+            "INSERT INTO test_cases (id, case_id, title, version, version_string, steps, is_challenged) "
+            "VALUES (1, 'TC1', 'Title', 2, '2.0', 'Step 1', 0)"
+        ))
+    
+    migrations.run_migrations(empty_engine)
+    
+    with empty_engine.connect() as connection:
+        assert connection.execute(text("SELECT content_hash FROM test_cases")).scalar() == compute_content_hash(
+            {"title": "Title", "version": 2, "version_string": "2.0", "steps": "Step 1", "is_challenged": False}
+        )
+        indexes = {index["name"] for index in inspect(connection).get_indexes("test_cases")}
+        assert "ix_test_cases_suite_case_hash" in indexes
@@ -0,0 +1,543 @@
+import csv
+import io
+import json
+import pyarrow.parquet as pq
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import event
+from sqlmodel import select
+from app.core import archive
+from app.models.base import (
+    TestSuite, TestCase, TestRun, TestCaseResult, Blob, DUT,
+    TestRunTemplate, TestRunTemplateTestCase
+)
+
+
+@pytest.fixture(name="test_case")
+def test_case_fixture(session):
+    """Create a test case in a test suite"""
+    suite = TestSuite(name="Suite", format="HTML", version=1, version_string="1.0")
+    session.add(suite)
+    session.commit()
+    session.refresh(suite)
+
+    case = TestCase(case_id="TC001", title="Test 1", version=1, version_string="1.0", test_suite_id=suite.id)
+    session.add(case)
+    session.commit()
+    session.refresh(case)
+    return case
+
+
+@pytest.fixture(name="test_run")
+def test_run_fixture(session, test_admin):
+    """Create an empty test run"""
+    run = TestRun(status="Completed", name="Run", operator_id=test_admin.id)
+    session.add(run)
+    session.commit()
+    session.refresh(run)
+    return run
+
+
+def test_large_logs_are_stored_as_blobs(client, admin_headers, session, test_case, test_run):
+    """Test that large logs are deduplicated into the blob store and fetched lazily"""
+    logs = "step passed\n" * 1000
+    
+    ids = []
+    for _ in range(2):
+        response = client.post(
+            "/api/test-runs/results",
+            json={"result": "Pass", "logs": logs, "test_case_id": test_case.id, "test_run_id": test_run.id},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["logs"] is None
+        assert data["logs_size"] == len(logs)
+        ids.append(data["id"])
+    
+    # Both results share one compressed blob
+    blobs = session.exec(select(Blob)).all()
+    assert len(blobs) == 1
+    assert len(blobs[0].data) < len(logs)
+    
+    response = client.get(f"/api/test-runs/results/{ids[0]}/logs", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.text == logs
+    
+    # Small logs stay inline
+    response = client.patch(
+        f"/api/test-runs/results/{ids[0]}",
+        json={"logs": "short"},
+        headers=admin_headers
+    )
+    assert response.json()["logs"] == "short"
+    assert response.json()["logs_hash"] is None
+
+
+def test_deleting_results_drops_orphan_blobs(client, admin_headers, session, test_admin, test_case, tmp_path, monkeypatch):
+    """Test that deleting results removes the blobs no other result, live or archived, references"""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    shared, own = "shared step\n" * 1000, "own step\n" * 1000
+    old_run = TestRun(status="Completed", name="Old", run_date="2020-01-15", operator_id=test_admin.id)
+    run = TestRun(status="Completed", name="Run", operator_id=test_admin.id)
+    session.add_all([old_run, run])
+    session.commit()
+    
+    for run_id, logs in [(old_run.id, shared), (run.id, shared), (run.id, own), (run.id, own)]:
+        response = client.post(
+            "/api/test-runs/results",
+            json={"result": "Pass", "logs": logs, "test_case_id": test_case.id, "test_run_id": run_id},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        result_id = response.json()["id"]
+    assert len(session.exec(select(Blob)).all()) == 2
+    archive.archive_old_runs(session, older_than_days=30)
+    
+    # A blob another result still uses is kept
+    response = client.delete(f"/api/test-runs/results/{result_id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert len(session.exec(select(Blob)).all()) == 2
+    
+    # The shared blob is still referenced by the archived run
+    response = client.delete(f"/api/test-runs/{run.id}", headers=admin_headers)
+    assert response.status_code == 200
+    session.expire_all()
+    blobs = session.exec(select(Blob)).all()
+    assert [blob.size for blob in blobs] == [len(shared)]
+
+
+def test_compare_test_runs(client, admin_headers, session, test_admin, test_db_engine):
+    """Test comparing two runs with a fixed number of queries"""
+    cases = []
+    for i in range(5):
+        case = TestCase(case_id=f"TC{i}", title=f"Test {i}", version=1, version_string="1.0")
+        session.add(case)
+        cases.append(case)
+    run1 = TestRun(status="Completed", name="Run 1", operator_id=test_admin.id)
+    run2 = TestRun(status="Completed", name="Run 2", operator_id=test_admin.id)
+    session.add(run1)
+    session.add(run2)
+    session.commit()
+    
+    for i, case in enumerate(cases):
+        session.add(TestCaseResult(result="Pass", test_case_id=case.id, test_run_id=run1.id))
+        session.add(TestCaseResult(result="Fail" if i == 0 else "Pass", test_case_id=case.id, test_run_id=run2.id))
+    session.commit()
+    
+    statements = []
+    
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(test_db_engine, "before_cursor_execute", record_statement)
+    try:
+        response = client.get(f"/api/test-runs/compare/{run1.id}/{run2.id}", headers=admin_headers)
+    finally:
+        event.remove(test_db_engine, "before_cursor_execute", record_statement)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["run1"] == {"id": run1.id, "pass_count": 5, "fail_count": 0, "other_count": 0, "total": 5}
+    assert data["run2"]["fail_count"] == 1
+    assert len(data["test_cases"]) == 5
+    assert data["differences"] == [{
+        "test_case_id": cases[0].id,
+        "test_case_title": "Test 0",
+        "run1_result": "Pass",
+        "run2_result": "Fail"
+    }]
+    assert not [s for s in statements if "FROM test_cases" in s and "JOIN" not in s]
+    
+    response = client.get(
+        f"/api/test-runs/compare/{run1.id}/{run2.id}?only_differences=true",
+        headers=admin_headers
+    )
+    assert [c["test_case_id"] for c in response.json()["test_cases"]] == [cases[0].id]
+
+
+def test_regression_matrix(client, admin_headers, session, test_admin):
+    """Test the multi-run result matrix"""
+    cases = []
+    for i in range(3):
+        case = TestCase(case_id=f"TC{i}", title=f"Test {i}", version=1, version_string="1.0")
+        session.add(case)
+        cases.append(case)
+    runs = []
+    for i in range(3):
+        run = TestRun(status="Completed", name=f"Nightly {i}", operator_id=test_admin.id)
+        session.add(run)
+        runs.append(run)
+    session.commit()
+    
+    # TC0 fails then recovers, TC1 regresses, TC2 is only in the first run
+    outcomes = {
+        0: ["Fail", "Fail", "Pass"],
+        1: ["Pass", "Pass", "Fail"],
+        2: ["Skipped", None, None],
+    }
+    for case_index, results in outcomes.items():
+        for run, result in zip(runs, results):
+            if result:
+                session.add(TestCaseResult(result=result, test_case_id=cases[case_index].id, test_run_id=run.id))
+    session.commit()
+    
+    run_ids = [run.id for run in runs]
+    response = client.get(
+        "/api/test-runs/matrix",
+        params={"run_ids": run_ids},
+        headers=admin_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [run["id"] for run in data["runs"]] == run_ids
+    assert [run["total"] for run in data["runs"]] == [3, 2, 2]
+    assert data["runs"][0]["other_count"] == 1
+    
+    matrix = {row["test_case_id"]: row for row in data["test_cases"]}
+    assert matrix[cases[0].id]["results"] == [2, 2, 1]
+    assert matrix[cases[0].id]["first_failing_run_id"] == runs[0].id
+    assert matrix[cases[1].id]["first_failing_run_id"] == runs[2].id
+    assert matrix[cases[2].id]["results"] == [3, 0, 0]
+    assert data["newly_passing"] == [cases[0].id]
+    assert data["newly_failing"] == [cases[1].id]
+    
+    response = client.get("/api/test-runs/matrix?run_ids=999", headers=admin_headers)
+    assert response.status_code == 404
+
+
+def test_run_summary_counters(client, admin_headers, session, test_case, test_run):
+    """Test that run totals follow result creates, updates and deletes"""
+    def create(result):
+        response = client.post(
+            "/api/test-runs/results",
+            json={"result": result, "test_case_id": test_case.id, "test_run_id": test_run.id},
+            headers=admin_headers
+        )
+        return response.json()["id"]
+    
+    def summary():
+        data = client.get("/api/test-runs/", headers=admin_headers).json()[0]
+        return [data[key] for key in ("total_count", "pass_count", "fail_count", "other_count")]
+    
+    pass_id = create("Pass")
+    fail_id = create("FAIL")
+    create("Skipped")
+    assert summary() == [3, 1, 1, 1]
+    
+    # The counter UPDATE is a Core statement, so it has to bump the run list ETag itself
+    etag = client.get("/api/test-runs/", headers=admin_headers).headers["etag"]
+    client.patch(f"/api/test-runs/results/{fail_id}", json={"result": "Pass"}, headers=admin_headers)
+    assert summary() == [3, 2, 0, 1]
+    assert client.get("/api/test-runs/", headers=admin_headers).headers["etag"] != etag
+    
+    client.delete(f"/api/test-runs/results/{pass_id}", headers=admin_headers)
+    assert summary() == [2, 1, 0, 1]
+    
+    # A rebuild recounts from the result rows
+    session.exec(select(TestRun)).first().pass_count = 99
+    session.commit()
+    response = client.post("/api/admin/rebuild-run-summaries", headers=admin_headers)
+    assert response.status_code == 200
+    assert summary() == [2, 1, 0, 1]
+
+
+def test_test_case_history(client, admin_headers, session, test_admin, test_case, tmp_path, monkeypatch):
+    """Test paging through a test case's results, including archived runs"""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    dut = DUT(product_name="TV 1", make="Make", model="Model")
+    session.add(dut)
+    session.commit()
+    
+    run_dates = ["2020-01-15", "2999-01-01", "2999-02-01"]
+    for i, run_date in enumerate(run_dates):
+        run = TestRun(status="Completed", name=f"Run {i}", run_date=run_date, operator_id=test_admin.id, dut_id=dut.id)
+        session.add(run)
+        session.commit()
+        session.add(TestCaseResult(result="Fail" if i == 0 else "Pass", test_case_id=test_case.id, test_run_id=run.id))
+        session.commit()
+    archive.archive_old_runs(session, older_than_days=30)
+    
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"before": cursor} if cursor else {})}
+        response = client.get(f"/api/test-cases/{test_case.id}/history", params=params, headers=admin_headers)
+        assert response.status_code == 200
+        data = response.json()
+        pages.append(data["results"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    
+    assert [len(page) for page in pages] == [2, 1]
+    entries = [entry for page in pages for entry in page]
+    assert [entry["test_run_name"] for entry in entries] == ["Run 2", "Run 1", "Run 0"]
+    assert [entry["archived"] for entry in entries] == [False, False, True]
+    assert entries[2]["result"] == "Fail"
+    assert {entry["dut_name"] for entry in entries} == {"TV 1"}
+    assert {entry["operator_name"] for entry in entries} == {"Test Admin"}
+    
+    response = client.get(f"/api/test-cases/{test_case.id}/history?before=bad", headers=admin_headers)
+    assert response.status_code == 400
+    
+    # The streamed history is not paged
+    response = client.get(
+        f"/api/test-cases/{test_case.id}/history",
+        headers={**admin_headers, "Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == entries
+
+
+def test_stream_run_results(client, admin_headers, session, test_case, test_run):
+    """Test streaming a run's results and the test case list as NDJSON"""
+    results = ["Pass", "Fail", "Pass", "Skip"] * 600
+    session.add_all([
+        TestCaseResult(result=result, logs="log", test_case_id=test_case.id, test_run_id=test_run.id)
+        for result in results
+    ])
+    session.commit()
+    
+    ndjson_headers = {**admin_headers, "Accept": "application/x-ndjson"}
+    response = client.get(f"/api/test-runs/{test_run.id}", headers=ndjson_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["result"] for line in lines] == results
+    assert "logs" not in lines[0]
+    
+    response = client.get(f"/api/test-runs/{test_run.id}?result_fields=logs", headers=ndjson_headers)
+    assert json.loads(response.text.splitlines()[0])["logs"] == "log"
+    response = client.get(
+        f"/api/test-runs/{test_run.id}?result_fields=logs",
+        headers={**ndjson_headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+    
+    # The JSON and NDJSON representations have their own ETags
+    json_response = client.get("/api/test-cases/?fields=title", headers=admin_headers)
+    response = client.get("/api/test-cases/?fields=title", headers=ndjson_headers)
+    assert json_response.headers["etag"] != response.headers["etag"]
+    assert "Accept" in response.headers["vary"]
+    assert [json.loads(line) for line in response.text.splitlines()] == json_response.json()
+
+
+def test_instantiate_test_run_template(client, admin_headers, session, test_admin, test_case):
+    """Test creating a test run with pending results from a template"""
+    other_case = TestCase(case_id="TC002", title="Test 2", version=1, version_string="1.0", test_suite_id=test_case.test_suite_id)
+    template = TestRunTemplate(template_id="T1", name="Smoke")
+    session.add_all([other_case, template])
+    session.commit()
+    for case in (test_case, other_case):
+        session.add(TestRunTemplateTestCase(template_id=template.id, test_case_id=case.id))
+    session.commit()
+    
+    response = client.post(f"/api/test-run-templates/{template.id}/instantiate", json={}, headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["name"] == "Smoke"
+    assert data["status"] == "Scheduled"
+    assert data["operator_id"] == test_admin.id
+    assert (data["total_count"], data["other_count"]) == (2, 2)
+    
+    results = session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == data["id"])).all()
+    assert sorted(result.test_case_id for result in results) == [test_case.id, other_case.id]
+    assert {result.result for result in results} == {"Pending"}
+    
+    response = client.post("/api/test-run-templates/999/instantiate", json={}, headers=admin_headers)
+    assert response.status_code == 404
+    
+    response = client.post(f"/api/test-run-templates/{template.id}/instantiate", json={"dut_id": 999}, headers=admin_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "DUT not found"
+
+
+def test_export_test_runs(client, admin_headers, session, test_admin, test_case):
+    """Test exporting one or several runs as csv, xlsx and parquet"""
+    runs = []
+    for i in range(2):
+        run = TestRun(status="Completed", name=f"Run {i}", operator_id=test_admin.id)
+        session.add(run)
+        session.commit()
+        session.add_all([
+            TestCaseResult(result=result, comment="ok", test_case_id=test_case.id, test_run_id=run.id)
+            for result in ["Pass", "Fail", "Pass"]
+        ])
+        session.commit()
+        runs.append(run.id)
+    
+    response = client.get(f"/api/test-runs/{runs[0]}/export?format=csv", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="test-run-' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["result"] for row in rows] == ["Pass", "Fail", "Pass"]
+    assert rows[0]["case_id"] == "TC001"
+    assert rows[0]["operator_name"] == "Test Admin"
+    
+    response = client.get(
+        "/api/test-runs/export", params={"run_ids": runs, "format": "parquet"}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 6
+    assert table.column("test_run_name").to_pylist() == ["Run 0"] * 3 + ["Run 1"] * 3
+    
+    response = client.get(f"/api/test-runs/{runs[1]}/export?format=xlsx", headers=admin_headers)
+    assert response.status_code == 200
+    sheet = load_workbook(io.BytesIO(response.content), read_only=True)["Results"]
+    values = list(sheet.values)
+    assert values[0][0] == "test_run_id"
+    assert [row[values[0].index("result")] for row in values[1:]] == ["Pass", "Fail", "Pass"]
+    
+    response = client.get(f"/api/test-runs/{runs[0]}/export?format=pdf", headers=admin_headers)
+    assert response.status_code == 400
+    response = client.get("/api/test-runs/export", params={"run_ids": [runs[0], 9999]}, headers=admin_headers)
+    assert response.status_code == 404
+
+
+def test_bulk_write_results(client, admin_headers, session, test_case, test_run):
+    """Test that bulk result writes keep summary counters and the blob store in step"""
+    items = [{"result": "Pass", "test_case_id": test_case.id, "test_run_id": test_run.id} for _ in range(3)]
+    items.append({"result": "Fail", "logs": "step failed\n" * 1000, "test_case_id": test_case.id, "test_run_id": test_run.id})
+    items.append({"result": "Pass", "test_case_id": 999, "test_run_id": test_run.id})
+    
+    response = client.post("/api/test-runs/results/bulk", json=items, headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"]) == (4, 1)
+    
+    session.refresh(test_run)
+    assert [test_run.total_count, test_run.pass_count, test_run.fail_count] == [4, 3, 1]
+    
+    failed = session.get(TestCaseResult, data["items"][3]["id"])
+    assert failed.logs is None and failed.logs_hash
+    
+    # Turning a pass into a fail moves it between counters
+    response = client.post(
+        "/api/test-runs/results/bulk",
+        json=[{"id": data["items"][0]["id"], "result": "Fail"}, {"id": data["items"][1]["id"], "comment": "ok"}],
+        headers=admin_headers
+    )
+    assert response.json()["updated"] == 2
+    session.refresh(test_run)
+    assert [test_run.total_count, test_run.pass_count, test_run.fail_count] == [4, 2, 2]
+
+
+def test_cascading_deletes(client, admin_headers, session, test_admin, test_case, monkeypatch):
+    """Test that deletes remove dependent rows in batches and keep run counters in step"""
+    from app.api.endpoints import test_runs
+    from app.core import cascade
+    monkeypatch.setattr(cascade, "DELETE_BATCH_SIZE", 7)
+    
+    other_case = TestCase(case_id="TC002", title="Test 2", version=1, version_string="1.0", test_suite_id=test_case.test_suite_id)
+    dut = DUT(product_name="TV 1", make="Make", model="Model")
+    session.add_all([other_case, dut])
+    session.commit()
+    
+    runs = []
+    for i in range(3):
+        run = TestRun(status="Completed", name=f"Run {i}", operator_id=test_admin.id, dut_id=dut.id)
+        session.add(run)
+        session.commit()
+        items = [{"result": "Pass", "test_case_id": test_case.id, "test_run_id": run.id} for _ in range(20)]
+        items.append({"result": "Fail", "test_case_id": other_case.id, "test_run_id": run.id})
+        client.post("/api/test-runs/results/bulk", json=items, headers=admin_headers)
+        runs.append(run.id)
+    
+    def results_of(run_id):
+        return session.exec(select(TestCaseResult).where(TestCaseResult.test_run_id == run_id)).all()
+    
+    response = client.delete(f"/api/test-runs/{runs[0]}", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["data"] == {"test_runs": 1, "test_case_results": 21}
+    assert session.get(TestRun, runs[0]) is None
+    assert results_of(runs[0]) == []
+    
+    # Large runs are deleted by a background task
+    monkeypatch.setattr(test_runs, "BACKGROUND_DELETE_THRESHOLD", 10)
+    response = client.delete(f"/api/test-runs/{runs[1]}", headers=admin_headers)
+    assert response.json()["data"] == {"background": True}
+    session.expire_all()
+    assert session.get(TestRun, runs[1]) is None
+    assert results_of(runs[1]) == []
+    
+    # Deleting a test case takes its results out of the run counters
+    response = client.delete(f"/api/test-cases/{other_case.id}", headers=admin_headers)
+    assert response.json()["data"] == {"test_cases": 1, "test_case_results": 1}
+    session.expire_all()
+    run = session.get(TestRun, runs[2])
+    assert [run.total_count, run.pass_count, run.fail_count] == [20, 20, 0]
+    
+    # Runs survive their DUT
+    response = client.delete(f"/api/duts/{dut.id}", headers=admin_headers)
+    assert response.json()["data"] == {"duts": 1, "test_runs_detached": 1}
+    session.expire_all()
+    assert session.get(TestRun, runs[2]).dut_id is None
+    
+    response = client.delete(f"/api/test-suites/{test_case.test_suite_id}", headers=admin_headers)
+    assert response.json()["data"] == {"test_suites": 1, "test_cases": 1, "test_case_results": 20}
+    session.expire_all()
+    assert session.get(TestRun, runs[2]).total_count == 0
+    assert session.exec(select(TestCase)).all() == []
+
+
+def test_get_test_run_operator(client, admin_headers, session, test_admin, test_case):
+    """Test a finished run's detail carries its operator as plain data, also when cached"""
+    run = TestRun(status="Completed", name="Run", operator_id=test_admin.id)
+    session.add(run)
+    session.commit()
+    session.add(TestCaseResult(result="Pass", test_case_id=test_case.id, test_run_id=run.id))
+    session.commit()
+    
+    from app.core.cache import response_cache
+    
+    for _ in range(2):
+        response = client.get(f"/api/test-runs/{run.id}", headers=admin_headers)
+        assert response.status_code == 200
+        operator = response.json()["operator"]
+        assert (operator["id"], operator["login"], operator["Access_Rights"]) == (test_admin.id, "testadmin", "admin")
+        assert "hashed_password" not in operator
+    
+    cached = [entry[2] for entry in response_cache._entries.values()]
+    assert len(cached) == 1
+    assert type(cached[0]["operator"]) is dict
+
+
+def test_run_detail_cache_is_per_run(client, admin_headers, session, test_admin, test_case):
+    """Test a write to one run's results leaves the other runs' cached details and ETags alone"""
+    runs = []
+    for i in range(2):
+        run = TestRun(status="Completed", name=f"Run {i}", operator_id=test_admin.id)
+        session.add(run)
+        session.commit()
+        session.add(TestCaseResult(result="Pass", test_case_id=test_case.id, test_run_id=run.id))
+        session.commit()
+        runs.append(run.id)
+    
+    def get(run_id):
+        return client.get(f"/api/test-runs/{run_id}", headers=admin_headers)
+    
+    def hits():
+        return client.get("/api/admin/cache-stats", headers=admin_headers).json()["data"]["hits"]
+    
+    etags = [get(run_id).headers["etag"] for run_id in runs]
+    
+    response = client.post(
+        "/api/test-runs/results",
+        json={"result": "Fail", "test_case_id": test_case.id, "test_run_id": runs[1]},
+        headers=admin_headers
+    )
+    assert response.status_code == 200
+    
+    before = hits()
+    response = get(runs[0])
+    assert response.headers["etag"] == etags[0]
+    assert hits() - before == 1
+    
+    response = get(runs[1])
+    assert response.headers["etag"] != etags[1]
+    assert [result["result"] for result in response.json()["test_case_results"]] == ["Pass", "Fail"]
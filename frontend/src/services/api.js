@@ -139,6 +139,10 @@ export default {
     return api.delete(`/test-run-templates/${templateId}/test_cases/${testCaseId}`)
   },
   
+  instantiateTestRunTemplate(id, data = {}) {
+    return api.post(`/test-run-templates/${id}/instantiate`, data)
+  },
+  
   // Test Runs
   getTestRuns(params = {}) {
     return api.get('/test-runs/', { params })
@@ -164,6 +168,10 @@ export default {
     return api.get(`/test-runs/compare/${id1}/${id2}`)
   },
   
+  exportTestRun(id, format = 'xlsx') {
+    return api.get(`/test-runs/${id}/export`, { params: { format }, responseType: 'blob' })
+  },
+  
   // Test Case Results
   getTestCaseResult(id) {
     return api.get(`/test-runs/results/${id}`)
@@ -177,6 +185,14 @@ export default {
     return api.patch(`/test-runs/results/${id}`, data)
   },
   
+  getTestCaseResultLogs(id) {
+    return api.get(`/test-runs/results/${id}/logs`, { responseType: 'text' })
+  },
+  
+  getTestCaseResultArtifacts(id) {
+    return api.get(`/test-runs/results/${id}/artifacts`, { responseType: 'text' })
+  },
+  
   // DUTs and Capabilities
   getDUTs() {
     return api.get('/duts/')
@@ -186,6 +202,10 @@ export default {
     return api.get(`/duts/${id}`)
   },
   
+  getCapabilityMatrix() {
+    return api.get('/duts/capability-matrix')
+  },
+  
   createDUT(data) {
     return api.post('/duts/', data)
   },